@@ -0,0 +1,21 @@
+from .corpus import SyntheticCorpus
+from .server import LocalSite
+from .suite import (
+    run_suite,
+    save_results,
+    compare_results,
+    RssSampler,
+    latency_percentiles,
+    flatten_throughputs
+)
+
+__all__ = [
+    'SyntheticCorpus',
+    'LocalSite',
+    'run_suite',
+    'save_results',
+    'compare_results',
+    'RssSampler',
+    'latency_percentiles',
+    'flatten_throughputs'
+]
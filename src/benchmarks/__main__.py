@@ -0,0 +1,63 @@
+import argparse
+import json
+import sys
+
+from .suite import run_suite, save_results, compare_results, flatten_throughputs
+
+# 吞吐量下降超過這個比例時標示為退步
+REGRESSION_THRESHOLD = 0.10
+
+
+def _workers(value):
+    try:
+        workers = tuple(int(item) for item in value.split(",") if item.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"並行數必須是以逗號分隔的整數，例如 1,2,4：{value}")
+    if not workers or min(workers) < 1:
+        raise argparse.ArgumentTypeError("並行數至少為 1")
+    return workers
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="對本機替身伺服器與合成語料執行爬蟲、清理與斷詞的基準測試，不會連到 technews.tw。",
+    )
+    parser.add_argument("--articles", type=int, default=200, help="合成語料的文章數")
+    parser.add_argument("--workers", type=_workers, default=(1, 2, 4), help="要比較的並行數，例如 1,2,4")
+    parser.add_argument("--latency", type=float, default=0.0, help="本機伺服器每個請求額外延遲的秒數")
+    parser.add_argument("--jieba-articles", type=int, default=20, help="斷詞測試使用的文章數")
+    parser.add_argument("--seed", type=int, default=0, help="語料的亂數種子")
+    parser.add_argument("--output", help="結果 JSON 的路徑，預設寫入 data/benchmarks/")
+    parser.add_argument("--compare", help="與之前的結果 JSON 比較吞吐量")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run_suite(articles=args.articles, workers=args.workers, latency=args.latency,
+                       jieba_articles=args.jieba_articles, seed=args.seed)
+    path = save_results(report, args.output)
+    print(f"結果已寫入 {path}")
+
+    for name, throughput in flatten_throughputs(report['results']).items():
+        print(f"  {name:<44} {throughput:>10.1f} 篇/秒")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = 0
+        print(f"與 {args.compare} 比較：")
+        for name, before, after, change in compare_results(previous, report):
+            flag = ""
+            if change is not None and change < -REGRESSION_THRESHOLD:
+                flag = "  <-- 退步"
+                regressions += 1
+            change_text = f"{change:+.1%}" if change is not None else "-"
+            print(f"  {name:<44} {before:>10.1f} -> {after:>10.1f} 篇/秒  {change_text}{flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import html
+import os
+import random
+from string import Template
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(current_dir, "fixtures")
+STOCK_DICT_PATH = os.path.join(current_dir, "..", "utils", "stock_dict.txt")
+
+# 與爬蟲解析的格式相同，例如 "2024 年 06 月 28 日 10:00"
+ARTICLE_DATE_FORMAT = '%Y 年 %m 月 %d 日 %H:%M'
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _dictionary_words():
+    companies, trends = [], []
+    with open(STOCK_DICT_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3:
+                (companies if parts[2] == 'stock' else trends).append(parts[0])
+    return companies, trends
+
+
+# `SyntheticCorpus` 產生可重現的合成文章語料，用於離線基準測試。
+# 每篇文章由 fixtures/sentences.txt 的句子組成，並隨機插入 stock_dict.txt 中的公司名稱與趨勢關鍵字，
+# 讓斷詞與分析的工作量接近真實的 technews.tw 文章；相同的 `seed` 永遠產生相同的語料。
+#
+# 參數:
+# `articles`: 文章數。
+# `start_date`: 第一篇文章的日期，文章平均分布在 `days` 天之內。
+# `days`: 文章分布的天數，跨越多個月份時會產生多個月份的 sitemap。
+# `paragraphs`: 每篇文章的段落數。
+# `sentences_per_paragraph`: 每個段落的句子數。
+# `seed`: 亂數種子。
+class SyntheticCorpus:
+    def __init__(self, articles=200, start_date='2024-01-01', days=60, paragraphs=8,
+                 sentences_per_paragraph=4, seed=0):
+        self.size = articles
+        self.start_date = pd.Timestamp(start_date)
+        self.days = max(days, 1)
+        self.paragraphs = paragraphs
+        self.sentences_per_paragraph = sentences_per_paragraph
+        self.seed = seed
+        self.sentences = [line.strip() for line in load_fixture("sentences.txt").splitlines() if line.strip()]
+        self.companies, self.trends = _dictionary_words()
+        self.articles = [self._make_article(i, random.Random(f"{seed}-{i}")) for i in range(articles)]
+
+    def __len__(self):
+        return len(self.articles)
+
+    def _sentence(self, rng):
+        sentence = rng.choice(self.sentences)
+        # 大約一半的句子提到公司，三分之一提到趨勢關鍵字
+        if rng.random() < 0.5:
+            sentence = f"{rng.choice(self.companies)}{sentence}"
+        if rng.random() < 0.33:
+            sentence = sentence.rstrip('。') + f"，{rng.choice(self.trends)}幅度受到關注。"
+        return sentence
+
+    def _make_article(self, index, rng):
+        published = self.start_date + pd.Timedelta(days=index * self.days // max(self.size, 1),
+                                                   minutes=rng.randrange(24 * 60))
+        company = rng.choice(self.companies)
+        paragraphs = [''.join(self._sentence(rng) for _ in range(self.sentences_per_paragraph))
+                      for _ in range(self.paragraphs)]
+        return {
+            'post_id': 100000 + index,
+            'path': f"/{published:%Y/%m/%d}/article-{index:06d}/",
+            'title': f"{company}{rng.choice(self.trends)}，{rng.choice(self.sentences)[:12]}",
+            'author': f"記者{index % 17:02d}",
+            'published': published,
+            'paragraphs': paragraphs,
+            'tags': rng.sample(self.companies, 3),
+        }
+
+    def months(self):
+        return sorted({(a['published'].year, a['published'].month) for a in self.articles})
+
+    def month_articles(self, year, month):
+        return [a for a in self.articles if (a['published'].year, a['published'].month) == (year, month)]
+
+    def date_range(self):
+        dates = [a['published'] for a in self.articles]
+        return min(dates).normalize(), max(dates).normalize()
+
+    # `render_article` 以 fixtures/article.html 產生與 technews.tw 相同結構的文章頁面
+    def render_article(self, article, base_url):
+        paragraphs = '\n'.join(f"      <p>{html.escape(p)}</p>" for p in article['paragraphs'])
+        tags = ' '.join(f'<a href="/tag/{html.escape(t)}/" rel="tag">{html.escape(t)}</a>' for t in article['tags'])
+        return Template(load_fixture("article.html")).substitute(
+            title=html.escape(article['title']),
+            url=base_url + article['path'],
+            post_id=article['post_id'],
+            author=html.escape(article['author']),
+            date=article['published'].strftime(ARTICLE_DATE_FORMAT),
+            paragraphs=paragraphs,
+            tags=tags,
+        )
+
+    # `render_sitemap_index` 產生 sitemap 索引，除了每月的文章 sitemap 之外也包含其他類型，與正式站相同
+    def render_sitemap_index(self, base_url):
+        locations = [f"{base_url}/sitemap-pt-post-{year}-{month:02d}.xml" for year, month in self.months()]
+        locations += [f"{base_url}/sitemap-pt-page-2019-01.xml", f"{base_url}/sitemap-tax-category.xml"]
+        entries = '\n'.join(f"  <sitemap><loc>{loc}</loc></sitemap>" for loc in locations)
+        return Template(load_fixture("sitemap_index.xml")).substitute(entries=entries)
+
+    def render_month_sitemap(self, year, month, base_url):
+        entries = '\n'.join(
+            f"  <url><loc>{base_url}{a['path']}</loc>"
+            f"<lastmod>{a['published']:%Y-%m-%dT%H:%M:%S}+08:00</lastmod></url>"
+            for a in self.month_articles(year, month)
+        )
+        return Template(load_fixture("sitemap_month.xml")).substitute(entries=entries)
+
+    # `to_dataframe` 回傳與爬蟲輸出相同欄位的 DataFrame，供不經過網路的清理與分析基準測試使用
+    def to_dataframe(self, base_url="https://technews.tw"):
+        return pd.DataFrame({
+            'Title': [a['title'] for a in self.articles],
+            'Date': [a['published'].strftime(ARTICLE_DATE_FORMAT) for a in self.articles],
+            'Author': [a['author'] for a in self.articles],
+            'Content': [' '.join(a['paragraphs']) for a in self.articles],
+            'URL': [base_url + a['path'] for a in self.articles],
+        })
@@ -0,0 +1,90 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_MONTH_SITEMAP = re.compile(r'^/sitemap-pt-post-(\d{4})-(\d{2})\.xml$')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # 使用 HTTP/1.1 才能保持連線，與正式站相同地測試連線重用
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        site = self.server.site
+        if site.latency:
+            time.sleep(site.latency)
+        body, content_type = site.pages.get(self.path.split('?', 1)[0], (None, None))
+        site.requests += 1
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# `LocalSite` 在本機啟動一個替身 HTTP 伺服器，以 `SyntheticCorpus` 提供 sitemap 索引、
+# 每月的文章 sitemap 與文章頁面，網址結構與 technews.tw 相同，爬蟲可以完全離線執行。
+# 所有頁面在啟動前就已產生好，伺服器本身的負擔很小，量測到的主要是爬蟲端的成本。
+#
+# 參數:
+# `corpus`: `SyntheticCorpus`。
+# `latency`: 每個請求額外延遲的秒數，用於模擬網路延遲，觀察並行數的影響。
+class LocalSite:
+    def __init__(self, corpus, latency=0.0, host="127.0.0.1", port=0):
+        self.corpus = corpus
+        self.latency = latency
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.site = self
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self.pages = self._render()
+        self.thread = None
+
+    def _render(self):
+        xml = "application/xml; charset=utf-8"
+        pages = {"/sitemap.xml": (self.corpus.render_sitemap_index(self.base_url).encode('utf-8'), xml)}
+        for year, month in self.corpus.months():
+            path = f"/sitemap-pt-post-{year}-{month:02d}.xml"
+            pages[path] = (self.corpus.render_month_sitemap(year, month, self.base_url).encode('utf-8'), xml)
+        for article in self.corpus.articles:
+            pages[article['path']] = (self.corpus.render_article(article, self.base_url).encode('utf-8'),
+                                      "text/html; charset=UTF-8")
+        return pages
+
+    @property
+    def sitemap_url(self):
+        return self.base_url + "/sitemap.xml"
+
+    def month_sitemap_urls(self):
+        return [self.base_url + path for path in self.pages if _MONTH_SITEMAP.match(path)]
+
+    def article_urls(self):
+        return [self.base_url + article['path'] for article in self.corpus.articles]
+
+    def article_pages(self):
+        return [self.pages[article['path']][0] for article in self.corpus.articles]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="benchmark-site", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,308 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+from scraping import (parse_sitemap, get_article_urls, scrape_article, fetch_concurrently, configure_cache,
+                      configure_transport, extract_article, compare_extractors)
+from scraping.extractor import EXTRACTORS
+from utils import clean_data, extract_entities, segment_articles, get_company_matcher
+from utils.ContentAnalysis import load_dictionaries
+from .corpus import SyntheticCorpus
+from .server import LocalSite
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_DIR = os.path.join(current_dir, "..", "..", "data", "benchmarks")
+
+# 結果檔的格式版本，欄位有不相容的改變時需要遞增
+SUITE_VERSION = 1
+
+
+def _current_rss():
+    if HAS_PSUTIL:
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# `RssSampler` 在背景執行緒中定期取樣記憶體用量，記錄區塊執行期間的最高值 (MB)。
+# 有安裝 psutil 時包含子行程（例如斷詞的行程池），否則只計算目前的行程；無法取得時為 None。
+class RssSampler:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = _current_rss()
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1) if self.peak is not None else None
+
+
+def latency_percentiles(durations):
+    if not durations:
+        return None
+    milliseconds = np.asarray(durations) * 1000
+    return {
+        'p50': round(float(np.percentile(milliseconds, 50)), 3),
+        'p90': round(float(np.percentile(milliseconds, 90)), 3),
+        'p99': round(float(np.percentile(milliseconds, 99)), 3),
+        'max': round(float(milliseconds.max()), 3),
+    }
+
+
+def _result(items, seconds, durations=None, rss=None, **extra):
+    return {
+        'items': items,
+        'seconds': round(seconds, 4),
+        'articles_per_second': round(items / seconds, 2) if seconds > 0 else None,
+        'latency_ms': latency_percentiles(durations or []),
+        'peak_rss_mb': rss.peak_mb if rss is not None else None,
+        **extra,
+    }
+
+
+# `measure_each` 逐一對 `items` 呼叫 `func`，量測總耗時、每個項目的延遲與記憶體高峰
+def measure_each(func, items):
+    durations = []
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        for item in items:
+            t = time.perf_counter()
+            func(item)
+            durations.append(time.perf_counter() - t)
+        seconds = time.perf_counter() - started
+    return _result(len(items), seconds, durations, rss)
+
+
+def bench_parse_sitemap(site, repeats=5):
+    start, end = site.corpus.date_range()
+    return measure_each(lambda _: parse_sitemap(site.sitemap_url, start, end), range(repeats))
+
+
+def bench_article_urls(site):
+    urls = site.month_sitemap_urls()
+    counts = []
+    result = measure_each(lambda url: counts.append(len(get_article_urls(url))), urls)
+    # 以文章 URL 數計算吞吐量，延遲則是每個月份 sitemap 的解析時間
+    result['urls'] = sum(counts)
+    result['articles_per_second'] = round(sum(counts) / result['seconds'], 2) if result['seconds'] else None
+    return result
+
+
+def bench_scrape(site, workers_list):
+    urls = site.article_urls()
+    scaling = []
+    for workers in workers_list:
+        durations = []
+        lock = threading.Lock()
+
+        def timed_scrape(url):
+            t = time.perf_counter()
+            article = scrape_article(url)
+            with lock:
+                durations.append(time.perf_counter() - t)
+            return article
+
+        configure_transport(pool_maxsize=max(workers, 1))
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            # 速率限制設為極大值，只量測爬蟲本身的成本
+            for _ in fetch_concurrently(urls, timed_scrape, max_workers=workers,
+                                        requests_per_second=1e9, burst=workers):
+                pass
+            seconds = time.perf_counter() - started
+        scaling.append(_result(len(urls), seconds, durations, rss, workers=workers))
+    return {'scaling': scaling}
+
+
+def bench_extract(pages):
+    results = {}
+    for backend in EXTRACTORS:
+        results[backend] = measure_each(lambda page: extract_article(page, backend=backend), pages)
+    mismatches = sum(1 for page in pages if compare_extractors(page))
+    results['parity_mismatches'] = mismatches
+    return results
+
+
+def bench_clean(df, repeats=3):
+    runs = []
+    for _ in range(repeats):
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            clean_data(df)
+            runs.append((time.perf_counter() - started, rss))
+    # 取最快的一次，降低其他程式干擾的影響
+    seconds, rss = min(runs, key=lambda run: run[0])
+    return _result(len(df), seconds, None, rss, repeats=repeats)
+
+
+def bench_entities(texts, workers_list):
+    started = time.perf_counter()
+    load_dictionaries()
+    load_seconds = time.perf_counter() - started
+
+    single = measure_each(extract_entities, texts)
+    scaling = []
+    df = pd.DataFrame({'Content': texts})
+    for workers in workers_list:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            segment_articles(df, workers=workers, batch_size=max(1, len(texts) // (workers * 2)))
+            seconds = time.perf_counter() - started
+        scaling.append(_result(len(texts), seconds, None, rss, workers=workers))
+    return {'dictionary_load_seconds': round(load_seconds, 4), 'single': single, 'scaling': scaling}
+
+
+def bench_matcher(texts):
+    matcher = get_company_matcher()
+    return measure_each(matcher.count, texts)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=current_dir, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# `run_suite` 執行完整的基準測試並回傳結果字典。
+# 爬蟲相關的測試對本機的 `LocalSite` 執行，不會連到 technews.tw；執行期間會停用 HTTP 快取，
+# 確保每次都真正經過 HTTP 請求與解析。
+#
+# 參數:
+# `articles`: 合成語料的文章數。
+# `workers`: 要比較的並行數，例如 (1, 2, 4)。
+# `latency`: 本機伺服器每個請求額外延遲的秒數。
+# `jieba_articles`: 斷詞測試使用的文章數（jieba 很慢，通常只取一部分）。
+# `seed`: 語料的亂數種子。
+# `log`: 接收進度訊息的函數，預設印到呼叫時的 stdout。
+def run_suite(articles=200, workers=(1, 2, 4), latency=0.0, jieba_articles=20, seed=0, log=None):
+    if log is None:
+        stream = sys.stdout
+        log = lambda message: print(message, file=stream, flush=True)
+    corpus = SyntheticCorpus(articles=articles, seed=seed)
+    configure_cache(enabled=False)
+    results = {}
+
+    # 各模組的 print 不混入基準測試的輸出
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with LocalSite(corpus, latency=latency) as site:
+        log(f"本機替身伺服器：{site.base_url}，{len(corpus)} 篇文章，{len(corpus.months())} 個月份")
+        with quiet:
+            log("量測 parse_sitemap ...")
+            results['parse_sitemap'] = bench_parse_sitemap(site)
+            log("量測 get_article_urls ...")
+            results['get_article_urls'] = bench_article_urls(site)
+            log("量測 scrape_article ...")
+            results['scrape_article'] = bench_scrape(site, workers)
+            log("量測 extract_article ...")
+            results['extract_article'] = bench_extract(site.article_pages())
+
+    df = corpus.to_dataframe()
+    log("量測 clean_data ...")
+    results['clean_data'] = bench_clean(df)
+
+    texts = clean_data(df)['Content'].tolist()[:jieba_articles]
+    log("量測 extract_entities (jieba) ...")
+    with quiet:
+        results['extract_entities'] = bench_entities(texts, workers)
+    log("量測 CompanyMatcher ...")
+    results['company_matcher'] = bench_matcher(clean_data(df)['Content'].tolist())
+
+    return {
+        'suite_version': SUITE_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {'articles': articles, 'workers': list(workers), 'latency': latency,
+                   'jieba_articles': jieba_articles, 'seed': seed},
+        'results': results,
+    }
+
+
+def save_results(report, path=None):
+    if path is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(DEFAULT_RESULTS_DIR, f"benchmark-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def flatten_throughputs(node, prefix=""):
+    # 攤平成 {"scrape_article.workers=4": 每秒文章數}，方便兩次結果逐項比較
+    found = {}
+    if isinstance(node, dict):
+        if node.get('articles_per_second') is not None:
+            found[prefix] = node['articles_per_second']
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                found.update(flatten_throughputs(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(node, list):
+        for item in node:
+            label = f"workers={item.get('workers')}" if isinstance(item, dict) else str(item)
+            found.update(flatten_throughputs(item, f"{prefix}.{label}"))
+    return found
+
+
+# `compare_results` 比較兩份結果的吞吐量。
+#
+# 回傳:
+# `list`: `(項目, 舊的每秒文章數, 新的每秒文章數, 變化比例)`，變化比例為負代表變慢。
+def compare_results(old, new):
+    before, after = flatten_throughputs(old['results']), flatten_throughputs(new['results'])
+    rows = []
+    for name in sorted(set(before) & set(after)):
+        change = (after[name] - before[name]) / before[name] if before[name] else None
+        rows.append((name, before[name], after[name], change))
+    return rows
@@ -0,0 +1,21 @@
+from .article_store import (
+    ArticleStore,
+    save_articles,
+    load_articles
+)
+from .analysis_cache import AnalysisCache
+from .rollup_store import RollupStore
+from .dedup_index import DedupIndex
+from .snapshot import ArticleSnapshot, load_snapshot, HAS_PYARROW
+
+__all__ = [
+    'ArticleStore',
+    'save_articles',
+    'load_articles',
+    'AnalysisCache',
+    'RollupStore',
+    'DedupIndex',
+    'ArticleSnapshot',
+    'load_snapshot',
+    'HAS_PYARROW'
+]
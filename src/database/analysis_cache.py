@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(current_dir, "..", "..", "data", "analysis_cache.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    content_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, version)
+) WITHOUT ROWID;
+"""
+
+# SQLite 單一查詢可綁定的參數數量有限，批次查詢時每次最多帶這麼多個雜湊值
+QUERY_BATCH = 500
+
+
+# `AnalysisCache` 保存每篇文章的斷詞標註結果，鍵值是「清理後內文的雜湊值 + 字典版本」。
+# 內文沒有改變的舊文章直接取用上次的結果；修改 stock_dict.txt 或 jieba 字典後版本改變，
+# 所有文章都會重新分析。`stats` 記錄命中與未命中的次數。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class AnalysisCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+
+    # `get_many` 一次查詢多篇文章的結果。
+    #
+    # 回傳:
+    # `dictionary`: `{內文雜湊值: 結果}`，只包含有快取的文章。
+    def get_many(self, content_hashes, version):
+        content_hashes = list(dict.fromkeys(content_hashes))
+        found = {}
+        with self.lock:
+            for i in range(0, len(content_hashes), QUERY_BATCH):
+                batch = content_hashes[i:i + QUERY_BATCH]
+                rows = self.conn.execute(
+                    f"SELECT content_hash, result FROM entities "
+                    f"WHERE version = ? AND content_hash IN ({', '.join('?' * len(batch))})",
+                    [version] + batch,
+                )
+                for content_hash, result in rows:
+                    found[content_hash] = json.loads(result)
+        self.stats['hits'] += len(found)
+        self.stats['misses'] += len(content_hashes) - len(found)
+        return found
+
+    # `put_many` 以單一交易寫入 `{內文雜湊值: 結果}`，結果必須可以轉成 JSON
+    def put_many(self, results, version):
+        now = time.time()
+        records = [(content_hash, version, json.dumps(result, ensure_ascii=False), now)
+                   for content_hash, result in results.items()]
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO entities (content_hash, version, result, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    records,
+                )
+        self.stats['stored'] += len(records)
+
+    # `prune` 刪除其他字典版本的結果，回傳刪除的筆數
+    def prune(self, keep_version):
+        with self.lock:
+            with self.conn:
+                cursor = self.conn.execute("DELETE FROM entities WHERE version != ?", (keep_version,))
+        return cursor.rowcount
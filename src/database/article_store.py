@@ -0,0 +1,272 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(current_dir, "..", "..", "data", "articles.sqlite3")
+
+# 爬蟲原始的日期格式，例如 "2024 年 06 月 28 日 10:00"
+SCRAPED_DATE_FORMAT = '%Y 年 %m 月 %d 日 %H:%M'
+# 資料庫中以 ISO 格式字串保存日期，字串順序與時間順序一致，可以直接用索引做範圍查詢
+STORED_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# SQLite 單一查詢可綁定的參數數量有限，以 URL 批次查詢時每次最多帶這麼多個
+QUERY_BATCH = 500
+
+COLUMN_MAP = {
+    'URL': 'url',
+    'Title': 'title',
+    'Date': 'date',
+    'Author': 'author',
+    'Content': 'content',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    title TEXT,
+    date TEXT,
+    author TEXT,
+    content TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_date ON articles(date);
+CREATE INDEX IF NOT EXISTS idx_articles_date_updated ON articles(date, updated_at);
+CREATE INDEX IF NOT EXISTS idx_articles_author ON articles(author);
+"""
+
+# 全文索引使用外部內容表 (external content)，文字只存一份，由觸發器保持同步
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, content, content='articles', content_rowid='rowid', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, content)
+    VALUES ('delete', old.rowid, old.title, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, content)
+    VALUES ('delete', old.rowid, old.title, old.content);
+    INSERT INTO articles_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+END;
+"""
+
+
+def _fts_tokenizer(conn):
+    # 中文沒有空白分詞，unicode61 會把整段中文視為一個詞；trigram (SQLite 3.34+) 可以做任意子字串搜尋
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return 'trigram'
+    except sqlite3.OperationalError:
+        return 'unicode61'
+
+
+def _normalize_dates(dates):
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        parsed = pd.to_datetime(dates, format=SCRAPED_DATE_FORMAT, errors='coerce')
+        # 不是爬蟲格式的日期（例如已是 ISO 格式）再以一般方式解析
+        fallback = pd.to_datetime(dates[parsed.isna()], errors='coerce')
+        dates = parsed.fillna(fallback) if len(fallback) else parsed
+    return dates.dt.strftime(STORED_DATE_FORMAT).astype(object).where(dates.notna(), None)
+
+
+def _to_bound(value, end=False):
+    if value is None or value == "":
+        return None
+    timestamp = pd.Timestamp(pd.to_datetime(value))
+    # 只給日期時，結束日期包含當天整天
+    if end and timestamp == timestamp.normalize():
+        timestamp = timestamp + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return timestamp.strftime(STORED_DATE_FORMAT)
+
+
+# `ArticleStore` 是以 SQLite 保存文章的本地資料庫。
+# - 使用 WAL 模式，寫入時不會阻擋讀取，GUI 與爬蟲可以同時存取。
+# - 以 URL 為主鍵批次 upsert，重複爬到的文章只會更新內容。
+# - Date 與 Author 建有索引，依日期範圍載入時只會讀取需要的資料列。
+# - FTS5 全文索引涵蓋 Title 與 Content。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class ArticleStore:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.tokenizer = _fts_tokenizer(self.conn)
+        self.conn.executescript(FTS_SCHEMA.format(tokenizer=self.tokenizer))
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    # `upsert_articles` 以單一交易批次寫入文章，URL 已存在時更新其餘欄位。
+    # 沒有 URL 的文章無法判斷是否重複，因此會被略過。
+    #
+    # 回傳:
+    # 實際寫入的文章數。
+    def upsert_articles(self, df):
+        if df is None or len(df) == 0:
+            return 0
+        if 'URL' not in df.columns:
+            print("文章缺少 URL 欄位，無法寫入資料庫")
+            return 0
+
+        df = df[df['URL'].notna()]
+        rows = pd.DataFrame({
+            column: (df[source] if source in df.columns else None)
+            for source, column in COLUMN_MAP.items()
+        })
+        rows['date'] = _normalize_dates(df['Date']) if 'Date' in df.columns else None
+        rows = rows.astype(object).where(rows.notna(), None)
+        now = time.time()
+        records = [tuple(record) + (now,) for record in
+                   rows[['url', 'title', 'date', 'author', 'content']].itertuples(index=False, name=None)]
+
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO articles (url, title, date, author, content, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET title = excluded.title, date = excluded.date, "
+                    "author = excluded.author, content = excluded.content, updated_at = excluded.updated_at "
+                    "WHERE articles.title IS NOT excluded.title OR articles.date IS NOT excluded.date "
+                    "OR articles.author IS NOT excluded.author OR articles.content IS NOT excluded.content",
+                    records,
+                )
+        return len(records)
+
+    def _to_dataframe(self, cursor, columns):
+        df = pd.DataFrame(cursor.fetchall(), columns=columns)
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], format=STORED_DATE_FORMAT, errors='coerce')
+        return df
+
+    # `query_range` 以日期索引取出日期範圍內的文章，依日期排序並回傳 DataFrame。
+    #
+    # 參數:
+    # `start_date`, `end_date`: 日期範圍（含頭尾），可以是字串、date 或 datetime；None 代表不限制。
+    # `columns`: 要取出的欄位，例如 ['Title', 'Date']；None 代表全部欄位。
+    # `author`: 只取出特定作者的文章。
+    def query_range(self, start_date=None, end_date=None, columns=None, author=None):
+        columns = list(columns or COLUMN_MAP.keys())
+        unknown = set(columns) - set(COLUMN_MAP)
+        if unknown:
+            raise ValueError(f"未知的欄位：{', '.join(sorted(unknown))}")
+
+        conditions, params = [], []
+        start, end = _to_bound(start_date), _to_bound(end_date, end=True)
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+        if author is not None:
+            conditions.append("author = ?")
+            params.append(author)
+
+        sql = f"SELECT {', '.join(COLUMN_MAP[c] for c in columns)} FROM articles"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY date"
+
+        with self.lock:
+            return self._to_dataframe(self.conn.execute(sql, params), columns)
+
+    # `query_urls` 取出指定 URL 的文章，依日期排序；資料庫中沒有的 URL 會被略過
+    def query_urls(self, urls, columns=None):
+        columns = list(columns or COLUMN_MAP.keys())
+        select = ', '.join(COLUMN_MAP[c] for c in columns)
+        urls = list(urls)
+        rows = []
+        with self.lock:
+            for i in range(0, len(urls), QUERY_BATCH):
+                chunk = urls[i:i + QUERY_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self.conn.execute(
+                    f"SELECT {select}, date FROM articles WHERE url IN ({placeholders})", chunk).fetchall())
+        # 分批查詢後再整體排序，結果與單一查詢的 ORDER BY date 相同
+        rows.sort(key=lambda row: (row[-1] is not None, row[-1] or ""))
+        df = pd.DataFrame([row[:-1] for row in rows], columns=columns)
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], format=STORED_DATE_FORMAT, errors='coerce')
+        return df
+
+    # `month_updates` 回傳每個月份（"YYYY-MM"）文章最後的更新時間，欄式快照以此判斷哪些月份需要重新匯出。
+    # (date, updated_at) 索引涵蓋了查詢需要的欄位，不會讀取文章內容。
+    def month_updates(self, start=None, end=None):
+        conditions, params = ["date IS NOT NULL"], []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+        sql = (f"SELECT substr(date, 1, 7), MAX(updated_at) FROM articles "
+               f"WHERE {' AND '.join(conditions)} GROUP BY 1")
+        with self.lock:
+            return dict(self.conn.execute(sql, params).fetchall())
+
+    # `search` 以全文索引搜尋標題與內文，可同時限制日期範圍。
+    # trigram 索引需要至少三個字元；較短的關鍵字（例如兩個字的公司名稱）改以 LIKE 搜尋。
+    def search(self, text, start_date=None, end_date=None, limit=100, columns=None):
+        columns = list(columns or COLUMN_MAP.keys())
+        select = ', '.join(f"a.{COLUMN_MAP[c]}" for c in columns)
+
+        if self.tokenizer == 'trigram' and len(text) < 3:
+            sql = (f"SELECT {select} FROM articles a "
+                   f"WHERE (a.title LIKE ? OR a.content LIKE ?)")
+            pattern = f"%{text}%"
+            params = [pattern, pattern]
+        else:
+            sql = (f"SELECT {select} FROM articles_fts f JOIN articles a ON a.rowid = f.rowid "
+                   f"WHERE articles_fts MATCH ?")
+            params = ['"' + text.replace('"', '""') + '"']
+
+        start, end = _to_bound(start_date), _to_bound(end_date, end=True)
+        if start is not None:
+            sql += " AND a.date >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND a.date <= ?"
+            params.append(end)
+        sql += " ORDER BY a.date DESC LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            return self._to_dataframe(self.conn.execute(sql, params), columns)
+
+
+# `save_articles` 將 DataFrame 中的文章寫入預設的本地資料庫
+def save_articles(df, path=DEFAULT_DB_PATH):
+    with ArticleStore(path) as store:
+        return store.upsert_articles(df)
+
+
+# `load_articles` 從本地資料庫載入日期範圍內的文章
+def load_articles(start_date=None, end_date=None, columns=None, path=DEFAULT_DB_PATH):
+    with ArticleStore(path) as store:
+        return store.query_range(start_date, end_date, columns=columns)
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DEDUP_PATH = os.path.join(current_dir, "..", "..", "data", "dedup_index.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    version TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band_key INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (band_key, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bands_id ON bands(id);
+"""
+
+# SQLite 單一查詢可綁定的參數數量有限，批次查詢時每次最多帶這麼多個鍵值
+QUERY_BATCH = 500
+
+
+# `DedupIndex` 是近似重複文章偵測的持久化 LSH 索引（見 `utils.find_near_duplicates`）。
+# 每篇登錄的文章保存 MinHash 簽章與各段落的鍵值，新文章只需以自己的段落鍵值查詢候選文章，
+# 不必與所有歷史文章比較。文章依第一次登錄的順序編號，編號較小的視為原文；
+# 同一個 URL 再次登錄時保留原本的編號，只更新簽章與段落鍵值。
+# 段落鍵值包含 MinHash 的參數版本，參數改變後舊的記錄不會被查到，可以用 `prune` 刪除。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class DedupIndex:
+    def __init__(self, path=DEFAULT_DEDUP_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def _query_batches(self, sql, values):
+        values = list(values)
+        rows = []
+        with self.lock:
+            for i in range(0, len(values), QUERY_BATCH):
+                batch = values[i:i + QUERY_BATCH]
+                rows.extend(self.conn.execute(sql.format(placeholders=", ".join("?" * len(batch))), batch))
+        return rows
+
+    # `candidates` 以段落鍵值查詢候選文章，回傳 `{段落鍵值: [(編號, URL)]}`，只包含有找到文章的鍵值
+    def candidates(self, band_keys):
+        found = {}
+        for band_key, entry_id, url in self._query_batches(
+                "SELECT b.band_key, s.id, s.url FROM bands b JOIN signatures s ON s.id = b.id "
+                "WHERE b.band_key IN ({placeholders})", set(band_keys)):
+            found.setdefault(band_key, []).append((entry_id, url))
+        return found
+
+    # `lookup` 回傳已登錄文章的編號 `{URL: 編號}`
+    def lookup(self, urls):
+        return dict(self._query_batches("SELECT url, id FROM signatures WHERE url IN ({placeholders})", set(urls)))
+
+    # `signatures` 回傳 `{編號: 簽章}`，簽章為 uint32 陣列
+    def signatures(self, ids):
+        return {entry_id: np.frombuffer(signature, dtype=np.uint32)
+                for entry_id, signature in self._query_batches(
+                    "SELECT id, signature FROM signatures WHERE id IN ({placeholders})", set(ids))}
+
+    # `add` 以單一交易登錄文章，已登錄的 URL 保留原本的編號並取代簽章與段落鍵值。
+    #
+    # 參數:
+    # `entries`: `(url, 簽章, 段落鍵值列表)` 的列表。
+    # `version`: MinHash 的參數版本。
+    def add(self, entries, version):
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                for url, signature, band_keys in entries:
+                    self.conn.execute(
+                        "INSERT INTO signatures (url, version, signature, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(url) DO UPDATE SET version = excluded.version, signature = excluded.signature, "
+                        "updated_at = excluded.updated_at",
+                        (url, version, np.asarray(signature, dtype=np.uint32).tobytes(), now))
+                    entry_id = self.conn.execute("SELECT id FROM signatures WHERE url = ?", (url,)).fetchone()[0]
+                    self.conn.execute("DELETE FROM bands WHERE id = ?", (entry_id,))
+                    self.conn.executemany("INSERT OR IGNORE INTO bands (band_key, id) VALUES (?, ?)",
+                                          [(band_key, entry_id) for band_key in band_keys])
+
+    # `prune` 刪除其他參數版本的記錄，回傳刪除的文章數
+    def prune(self, keep_version):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM bands WHERE id IN (SELECT id FROM signatures WHERE version != ?)",
+                                  (keep_version,))
+                cursor = self.conn.execute("DELETE FROM signatures WHERE version != ?", (keep_version,))
+        return cursor.rowcount
@@ -0,0 +1,414 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROLLUP_PATH = os.path.join(current_dir, "..", "..", "data", "rollups.sqlite3")
+
+DAY_FORMAT = '%Y-%m-%d'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS company_daily (
+    day TEXT NOT NULL,
+    company TEXT NOT NULL,
+    mentions INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    PRIMARY KEY (day, company)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_company_daily_company ON company_daily(company, day);
+CREATE TABLE IF NOT EXISTS trend_daily (
+    day TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, keyword)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_trend_daily_keyword ON trend_daily(keyword, day);
+CREATE TABLE IF NOT EXISTS company_pairs_daily (
+    day TEXT NOT NULL,
+    company_a TEXT NOT NULL,
+    company_b TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, company_a, company_b)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS contributions (
+    article_key TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    score REAL NOT NULL,
+    companies TEXT NOT NULL,
+    trends TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# 每個每日彙總表的鍵值欄位與數值欄位，用於建立 `DailyTotals`
+DAILY_TABLES = {
+    'company_daily': (['company'], ['mentions', 'score_sum']),
+    'trend_daily': (['keyword'], ['count']),
+    'company_pairs_daily': (['company_a', 'company_b'], ['count']),
+}
+
+# SQLite 單一查詢可綁定的參數數量有限，批次查詢時每次最多帶這麼多個鍵值
+QUERY_BATCH = 500
+
+
+def _day_bound(value):
+    if value is None or value == "":
+        return None
+    return pd.Timestamp(pd.to_datetime(value)).strftime(DAY_FORMAT)
+
+
+def _week_start(days):
+    return days - pd.to_timedelta(days.dt.dayofweek, unit='D')
+
+
+# `_pair_deltas` 計算每日公司共同出現次數的變化：同一篇文章中的每兩家公司算一次，
+# 公司名稱依字串排序後存成 (company_a, company_b)，同一組公司只有一列。
+#
+# 參數:
+# `deltas`: 含有 day、companies（JSON 字串）與 sign（+1 或 -1）欄位的 DataFrame。
+def _pair_deltas(deltas):
+    rows = [(day, company_a, company_b, sign)
+            for day, companies, sign in zip(deltas['day'], deltas['companies'], deltas['sign'])
+            for company_a, company_b in itertools.combinations(sorted(set(json.loads(companies))), 2)]
+    pairs = pd.DataFrame(rows, columns=['day', 'company_a', 'company_b', 'count'])
+    pairs = pairs.groupby(['day', 'company_a', 'company_b'], as_index=False)['count'].sum()
+    return pairs[pairs['count'] != 0]
+
+
+# `DailyTotals` 是每日彙總表在記憶體中的索引：各列依日期排序，鍵值依字串排序後編號。
+# 任意日期範圍的總和只需以二分搜尋找出範圍內的列，再以 `np.bincount` 依鍵值加總，
+# 不論範圍多長都只是對連續陣列的一次掃描；在 SQLite 中則要為每次查詢建立暫時的 GROUP BY 表。
+#
+# 參數:
+# `df`: 依 day 排序的每日彙總，day 為 'YYYY-MM-DD' 字串。
+# `keys`: 鍵值欄位，例如 ['company'] 或 ['company_a', 'company_b']。
+# `values`: 要加總的數值欄位。
+class DailyTotals:
+    def __init__(self, df, keys, values):
+        self.days = np.asarray(df['day'].tolist(), dtype='datetime64[D]')
+        # 各鍵值欄位依字串排序編號後合成一個整數，編號的順序就是 (keys...) 的字串順序，排行同分時依此排序
+        codes = np.zeros(len(df), dtype=np.int64)
+        for key in keys:
+            key_codes, uniques = pd.factorize(df[key], sort=True)
+            codes = codes * max(len(uniques), 1) + key_codes
+        _, first, self.codes = np.unique(codes, return_index=True, return_inverse=True)
+        self.codes = self.codes.ravel()
+        self.labels = df[keys].iloc[first].reset_index(drop=True)
+        self.values = {value: df[value].to_numpy() for value in values}
+
+    def __len__(self):
+        return len(self.labels)
+
+    # `totals` 回傳日期範圍內每個鍵值的總和 `{欄位: 陣列}`，陣列依 `labels` 的順序
+    def totals(self, start_date=None, end_date=None):
+        start, end = _day_bound(start_date), _day_bound(end_date)
+        low = np.searchsorted(self.days, np.datetime64(start, 'D'), 'left') if start is not None else 0
+        high = np.searchsorted(self.days, np.datetime64(end, 'D'), 'right') if end is not None else len(self.days)
+        totals = {}
+        for name, values in self.values.items():
+            total = np.bincount(self.codes[low:high], weights=values[low:high], minlength=len(self.labels))
+            totals[name] = total.round().astype(values.dtype) if values.dtype.kind == 'i' else total
+        return totals
+
+    # `top` 回傳日期範圍內 `column` 總和最大的鍵值，同分時依鍵值的字串順序；總和不大於 0 的鍵值不列入。
+    #
+    # 參數:
+    # `limit`: 最多幾項，None 代表全部。
+    # `mask`: 只考慮這些鍵值（與 `labels` 等長的布林陣列）。
+    #
+    # 回傳:
+    # `DataFrame`: 鍵值欄位與所有數值欄位的總和。
+    def top(self, column, start_date=None, end_date=None, limit=None, mask=None):
+        totals = self.totals(start_date, end_date)
+        present = totals[column] > 0
+        if mask is not None:
+            present &= mask
+        candidates = np.flatnonzero(present)
+        order = candidates[np.argsort(-totals[column][candidates], kind='stable')]
+        if limit is not None:
+            order = order[:limit]
+        result = self.labels.iloc[order].reset_index(drop=True)
+        for name, total in totals.items():
+            result[name] = total[order]
+        return result
+
+
+# `RollupStore` 以 SQLite 保存每日的公司提及數、分數與趨勢關鍵字頻率。
+# 每篇計入的文章都記錄在 `contributions` 表中，因此：
+# - 新的文章只把自己的貢獻加到對應日期的彙總上，不必重新計算歷史資料。
+# - 重複分析同一篇文章不會重複計算；文章內容改變時先扣除舊的貢獻再加上新的。
+# 每週的彙總由每日彙總相加而得。
+# 另外保存每日的公司共同出現次數（稀疏的公司×公司矩陣，只記錄出現過的組合），與其他彙總一起增量更新。
+# 單一公司或關鍵字的時間序列以 (鍵值, day) 索引查詢；日期範圍內的排行則使用記憶體中的 `DailyTotals`，
+# 第一次查詢時由每日彙總建立，之後任意日期範圍的排行都在數毫秒內完成。
+# 本連線寫入後，或其他連線（例如執行中的分析）寫入使 `PRAGMA data_version` 改變後，下次查詢時重新建立。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class RollupStore:
+    def __init__(self, path=DEFAULT_ROLLUP_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        has_pairs = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'company_pairs_daily'").fetchone()
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._totals = {}
+        self._data_version = None
+        if has_pairs is None:
+            self._backfill_pairs()
+
+    # 舊版的資料庫沒有共同出現表，第一次開啟時由已計入的文章補齊，之後只做增量更新
+    def _backfill_pairs(self):
+        with self.lock:
+            deltas = pd.DataFrame(self.conn.execute("SELECT day, companies FROM contributions").fetchall(),
+                                  columns=['day', 'companies']).assign(sign=1)
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO company_pairs_daily (day, company_a, company_b, count) VALUES (?, ?, ?, ?)",
+                    _pair_deltas(deltas).itertuples(index=False, name=None),
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM contributions").fetchone()[0]
+
+    def _existing(self, keys):
+        existing = {}
+        for i in range(0, len(keys), QUERY_BATCH):
+            batch = keys[i:i + QUERY_BATCH]
+            rows = self.conn.execute(
+                f"SELECT article_key, day, score, companies, trends FROM contributions "
+                f"WHERE article_key IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for key, day, score, companies, trends in rows:
+                existing[key] = (day, score, companies, trends)
+        return existing
+
+    # `add` 將文章的貢獻累加到彙總中。
+    #
+    # 參數:
+    # `contributions`: `utils.article_contributions` 產生的 DataFrame（key、day、score、companies、trends）。
+    #
+    # 回傳:
+    # `dictionary`: 新增、更新與沒有改變的文章數。
+    def add(self, contributions):
+        result = {'added': 0, 'updated': 0, 'unchanged': 0}
+        if contributions is None or len(contributions) == 0:
+            return result
+
+        records = pd.DataFrame({
+            'key': contributions['key'].to_numpy(),
+            'day': pd.to_datetime(contributions['day']).dt.strftime(DAY_FORMAT).to_numpy(),
+            'score': contributions['score'].astype(float).to_numpy(),
+            'companies': [json.dumps(list(c), ensure_ascii=False) for c in contributions['companies']],
+            'trends': [json.dumps(list(t), ensure_ascii=False) for t in contributions['trends']],
+        })
+
+        with self.lock:
+            existing = self._existing(records['key'].tolist())
+            unchanged = pd.Series([existing.get(row[0]) == row[1:]
+                                   for row in records.itertuples(index=False, name=None)],
+                                  index=records.index, dtype=bool)
+            records = records[~unchanged]
+            old = pd.DataFrame([(key,) + existing[key] for key in records['key'] if key in existing],
+                               columns=['key', 'day', 'score', 'companies', 'trends'])
+            result['unchanged'] = int(unchanged.sum())
+            result['updated'] = len(old)
+            result['added'] = len(records) - len(old)
+            if records.empty:
+                return result
+
+            # 新的貢獻以 +1 計入，被取代的舊貢獻以 -1 扣除
+            deltas = records.assign(sign=1)
+            if len(old):
+                deltas = pd.concat([deltas, old.assign(sign=-1)], ignore_index=True)
+            deltas['weighted'] = deltas['score'] * deltas['sign']
+            company_deltas = (deltas.assign(company=deltas['companies'].map(json.loads))
+                                    .explode('company').dropna(subset=['company'])
+                                    .groupby(['day', 'company'])
+                                    .agg(mentions=('sign', 'sum'), score_sum=('weighted', 'sum'))
+                                    .reset_index())
+            trend_deltas = (deltas.assign(keyword=deltas['trends'].map(json.loads))
+                                  .explode('keyword').dropna(subset=['keyword'])
+                                  .groupby(['day', 'keyword'])['sign'].sum()
+                                  .reset_index())
+            pair_deltas = _pair_deltas(deltas)
+
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO company_daily (day, company, mentions, score_sum) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(day, company) DO UPDATE SET mentions = mentions + excluded.mentions, "
+                    "score_sum = score_sum + excluded.score_sum",
+                    company_deltas[['day', 'company', 'mentions', 'score_sum']].itertuples(index=False, name=None),
+                )
+                self.conn.executemany(
+                    "INSERT INTO trend_daily (day, keyword, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT(day, keyword) DO UPDATE SET count = count + excluded.count",
+                    trend_deltas[['day', 'keyword', 'sign']].itertuples(index=False, name=None),
+                )
+                self.conn.executemany(
+                    "INSERT INTO company_pairs_daily (day, company_a, company_b, count) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(day, company_a, company_b) DO UPDATE SET count = count + excluded.count",
+                    pair_deltas.itertuples(index=False, name=None),
+                )
+                # 只有被扣除的鍵值可能歸零，以主鍵逐一刪除，不必掃描整個表
+                self.conn.executemany(
+                    "DELETE FROM company_daily WHERE day = ? AND company = ? AND mentions <= 0",
+                    company_deltas.loc[company_deltas['mentions'] < 0, ['day', 'company']]
+                                  .itertuples(index=False, name=None),
+                )
+                self.conn.executemany(
+                    "DELETE FROM trend_daily WHERE day = ? AND keyword = ? AND count <= 0",
+                    trend_deltas.loc[trend_deltas['sign'] < 0, ['day', 'keyword']].itertuples(index=False, name=None),
+                )
+                self.conn.executemany(
+                    "DELETE FROM company_pairs_daily WHERE day = ? AND company_a = ? AND company_b = ? AND count <= 0",
+                    pair_deltas.loc[pair_deltas['count'] < 0, ['day', 'company_a', 'company_b']]
+                               .itertuples(index=False, name=None),
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO contributions (article_key, day, score, companies, trends, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [tuple(row) + (now,) for row in
+                     records[['key', 'day', 'score', 'companies', 'trends']].itertuples(index=False, name=None)],
+                )
+            self._totals = {}
+        return result
+
+    def _query(self, sql, params, columns):
+        with self.lock:
+            df = pd.DataFrame(self.conn.execute(sql, params).fetchall(), columns=columns)
+        df['period'] = pd.to_datetime(df['period'], format=DAY_FORMAT)
+        return df
+
+    def _range(self, start_date, end_date, extra=None):
+        conditions, params = [], []
+        start, end = _day_bound(start_date), _day_bound(end_date)
+        if start is not None:
+            conditions.append("day >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("day <= ?")
+            params.append(end)
+        for condition, value in (extra or []):
+            conditions.append(condition)
+            params.append(value)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    # `company_rollup` 取出日期範圍內每家公司的彙總。
+    #
+    # 參數:
+    # `start_date`, `end_date`: 日期範圍（含頭尾）；None 代表不限制。
+    # `freq`: 'D' 為每日，'W' 為每週（週一開始）。
+    # `company`: 只取出特定公司。
+    #
+    # 回傳:
+    # `DataFrame`: 欄位為 period、company、mentions、score_sum、mean_score。
+    def company_rollup(self, start_date=None, end_date=None, freq='D', company=None):
+        where, params = self._range(start_date, end_date, [("company = ?", company)] if company else None)
+        df = self._query(f"SELECT day, company, mentions, score_sum FROM company_daily{where} ORDER BY day, company",
+                         params, ['period', 'company', 'mentions', 'score_sum'])
+        if freq == 'W':
+            df['period'] = _week_start(df['period'])
+            df = df.groupby(['period', 'company'], as_index=False)[['mentions', 'score_sum']].sum()
+        elif freq != 'D':
+            raise ValueError(f"未知的彙總週期：{freq}")
+        df['mean_score'] = df['score_sum'] / df['mentions']
+        return df
+
+    # `trend_rollup` 取出日期範圍內每個趨勢關鍵字的彙總，欄位為 period、keyword、count
+    def trend_rollup(self, start_date=None, end_date=None, freq='D'):
+        where, params = self._range(start_date, end_date)
+        df = self._query(f"SELECT day, keyword, count FROM trend_daily{where} ORDER BY day, keyword",
+                         params, ['period', 'keyword', 'count'])
+        if freq == 'W':
+            df['period'] = _week_start(df['period'])
+            df = df.groupby(['period', 'keyword'], as_index=False)['count'].sum()
+        elif freq != 'D':
+            raise ValueError(f"未知的彙總週期：{freq}")
+        return df
+
+    def _daily_totals(self, table):
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._totals, self._data_version = {}, version
+            if table not in self._totals:
+                keys, values = DAILY_TABLES[table]
+                columns = ['day'] + keys + values
+                rows = self.conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY day").fetchall()
+                self._totals[table] = DailyTotals(pd.DataFrame(rows, columns=columns), keys, values)
+            return self._totals[table]
+
+    # `top_companies` 回傳日期範圍內被提及最多的公司，欄位為 company、mentions、mean_score；`limit` 為 None 時回傳全部
+    def top_companies(self, start_date=None, end_date=None, limit=10):
+        top = self._daily_totals('company_daily').top('mentions', start_date, end_date, limit)
+        top['mean_score'] = top.pop('score_sum') / top['mentions']
+        return top
+
+    # `top_pairs` 回傳日期範圍內最常在同一篇文章中一起出現的公司組合，欄位為 company_a、company_b、count
+    def top_pairs(self, start_date=None, end_date=None, limit=10):
+        return self._daily_totals('company_pairs_daily').top('count', start_date, end_date, limit)
+
+    # `related_companies` 回傳日期範圍內最常與 `company` 一起出現的公司，欄位為 company、count
+    def related_companies(self, company, start_date=None, end_date=None, limit=10):
+        totals = self._daily_totals('company_pairs_daily')
+        side_a = (totals.labels['company_a'] == company).to_numpy()
+        side_b = (totals.labels['company_b'] == company).to_numpy()
+        top = totals.top('count', start_date, end_date, mask=side_a | side_b)
+        # 組合只存一次，另一家公司可能在任一邊
+        top['company'] = top['company_b'].where(top['company_a'] == company, top['company_a'])
+        top = top.sort_values(['count', 'company'], ascending=[False, True], kind='stable')
+        return top[['company', 'count']].head(limit).reset_index(drop=True)
+
+    # `top_trends` 回傳日期範圍內出現在最多文章中的趨勢關鍵字，欄位為 keyword、count
+    def top_trends(self, start_date=None, end_date=None, limit=10):
+        return self._daily_totals('trend_daily').top('count', start_date, end_date, limit)
+
+    # `trend_series` 回傳單一關鍵字在日期範圍內的時間序列，沒有出現的日期（或週）補 0。
+    #
+    # 參數:
+    # `keyword`: 趨勢關鍵字。
+    # `start_date`, `end_date`: 日期範圍（含頭尾）；None 代表從第一次到最後一次出現。
+    # `freq`: 'D' 為每日，'W' 為每週（週一開始）。
+    #
+    # 回傳:
+    # `Series`: 以 period 為索引的文章數。
+    def trend_series(self, keyword, start_date=None, end_date=None, freq='D'):
+        if freq not in ('D', 'W'):
+            raise ValueError(f"未知的彙總週期：{freq}")
+        where, params = self._range(start_date, end_date, [("keyword = ?", keyword)])
+        df = self._query(f"SELECT day, count FROM trend_daily{where} ORDER BY day", params, ['period', 'count'])
+        start = pd.Timestamp(_day_bound(start_date)) if _day_bound(start_date) else df['period'].min()
+        end = pd.Timestamp(_day_bound(end_date)) if _day_bound(end_date) else df['period'].max()
+        series = df.set_index('period')['count']
+        if pd.isna(start) or pd.isna(end):
+            return series.rename(keyword)
+        series = series.reindex(pd.date_range(start, end, freq='D'), fill_value=0)
+        if freq == 'W':
+            series = series.groupby(_week_start(series.index.to_series())).sum()
+        series.index.name = 'period'
+        return series.rename(keyword)
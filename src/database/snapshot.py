@@ -0,0 +1,177 @@
+import glob
+import json
+import os
+import re
+import tempfile
+import time
+
+import pandas as pd
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from .article_store import ArticleStore, DEFAULT_DB_PATH, COLUMN_MAP, _to_bound
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT_DIR = os.path.join(current_dir, "..", "..", "data", "snapshot")
+
+SNAPSHOT_COLUMNS = list(COLUMN_MAP.keys())
+
+PARTITION_FILE = "articles.arrow"
+PARTITION_PATTERN = re.compile(r'year=(\d{4})[\\/]month=(\d{2})[\\/]articles\.arrow$')
+
+
+def _months_between(start, end):
+    # 日期範圍涵蓋的所有 (year, month)，用於只開啟需要的分區
+    months = pd.period_range(pd.Timestamp(start).to_period('M'), pd.Timestamp(end).to_period('M'), freq='M')
+    return [(period.year, period.month) for period in months]
+
+
+# `ArticleSnapshot` 是本地資料庫的欄式快照：文章依發布月份寫成 Arrow IPC 分區
+# (`year=YYYY/month=MM/articles.arrow`)，分區內依日期排序。
+# 「跳過爬蟲」重新分析時從快照載入，比從 SQLite 逐列讀取快得多：
+# - 只開啟日期範圍涵蓋的月份分區，其他年份與月份完全不讀取。
+# - 檔案不壓縮並以 memory map 開啟，欄位直接對應到檔案內容，讀取時不需要解碼或複製；
+#   沒有要求的欄位（例如不需要 Author 時）根本不會被讀到。
+# - 分區內依日期排序，範圍邊緣的月份以二分搜尋找出需要的區段後直接切片。
+# 同樣的資料存成 Parquet 需要解壓縮與解碼，三年份的文章約需 0.4 秒；Arrow IPC 只需約 10 毫秒，
+# 代價是檔案較大，快照只是快取，可以隨時刪除重建。
+# SQLite 仍是唯一的資料來源；`refresh` 比較每個月份在資料庫中最後的更新時間與快照的匯出時間，
+# 只重新匯出有變動的月份。需要安裝 pyarrow。
+#
+# 參數:
+# `directory`: 快照目錄。
+# `db_path`: 本地資料庫路徑。
+class ArticleSnapshot:
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR, db_path=DEFAULT_DB_PATH):
+        if not HAS_PYARROW:
+            raise ImportError("ArticleSnapshot 需要安裝 pyarrow")
+        self.directory = os.path.abspath(directory)
+        self.db_path = db_path
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 記錄損壞時當作沒有快照，所有月份都會重新匯出
+            return {}
+
+    def _save_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def partition_path(self, year, month):
+        return os.path.join(self.directory, f"year={year:04d}", f"month={month:02d}", PARTITION_FILE)
+
+    def partitions(self):
+        found = []
+        for path in glob.glob(os.path.join(self.directory, "year=*", "month=*", PARTITION_FILE)):
+            match = PARTITION_PATTERN.search(path)
+            if match:
+                found.append((int(match.group(1)), int(match.group(2))))
+        return sorted(found)
+
+    # `refresh` 將資料庫中有變動的月份重新匯出成分區，回傳重新匯出的月份數。
+    # 每個月份在資料庫中的最後更新時間以 (date, updated_at) 索引查詢，不需要讀取文章內容。
+    #
+    # 參數:
+    # `start_date`, `end_date`: 只檢查這個日期範圍涵蓋的月份；None 代表全部。
+    def refresh(self, start_date=None, end_date=None):
+        start = _to_bound(start_date)
+        end = _to_bound(end_date, end=True)
+        if start is not None:
+            start = start[:7] + "-01 00:00:00"
+        with ArticleStore(self.db_path) as store:
+            stale = [month for month, updated_at in store.month_updates(start, end).items()
+                     if self.manifest.get(month, {}).get('exported_at', 0) < updated_at]
+            for month in stale:
+                self._export_month(store, month)
+        if stale:
+            self._save_manifest()
+        return len(stale)
+
+    def _export_month(self, store, month):
+        year, month_number = int(month[:4]), int(month[5:7])
+        exported_at = time.time()
+        first = pd.Timestamp(year=year, month=month_number, day=1)
+        last = first + pd.offsets.MonthEnd(0) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+        df = store.query_range(first, last, columns=SNAPSHOT_COLUMNS)
+        path = self.partition_path(year, month_number)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df.astype({c: object for c in SNAPSHOT_COLUMNS if c != 'Date'}),
+                                     preserve_index=False, schema=self.schema())
+        # 先寫入暫存檔再改名，讀取中的程式不會看到寫到一半的分區
+        tmp_path = path + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self.manifest[month] = {'exported_at': exported_at, 'rows': len(df)}
+
+    @staticmethod
+    def schema():
+        return pa.schema([(column, pa.timestamp('ns') if column == 'Date' else pa.string())
+                          for column in SNAPSHOT_COLUMNS])
+
+    # `read_table` 讀取日期範圍內的文章，回傳 pyarrow Table；欄位仍指向 memory map 的檔案內容，沒有複製。
+    #
+    # 參數:
+    # `start_date`, `end_date`: 日期範圍（含頭尾）；None 代表不限制。
+    # `columns`: 要讀取的欄位；None 代表全部欄位。
+    def read_table(self, start_date=None, end_date=None, columns=None):
+        columns = list(columns or SNAPSHOT_COLUMNS)
+        unknown = set(columns) - set(SNAPSHOT_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知的欄位：{', '.join(sorted(unknown))}")
+
+        start = _to_bound(start_date)
+        end = _to_bound(end_date, end=True)
+        months = self.partitions()
+        if months and (start is not None or end is not None):
+            first, last = months[0], months[-1]
+            wanted = set(_months_between(start or f"{first[0]}-{first[1]:02d}-01",
+                                         end or f"{last[0]}-{last[1]:02d}-01"))
+            months = [month for month in months if month in wanted]
+
+        tables = []
+        for year, month in months:
+            table = pa.ipc.open_file(pa.memory_map(self.partition_path(year, month))).read_all()
+            # 分區依日期排序，日期欄位可以直接轉成 numpy 陣列二分搜尋，不需要逐列比較
+            dates = table.column('Date').to_numpy()
+            low = np.searchsorted(dates, np.datetime64(start), 'left') if start is not None else 0
+            high = np.searchsorted(dates, np.datetime64(end), 'right') if end is not None else len(dates)
+            if high > low:
+                tables.append(table.slice(low, high - low).select(columns))
+        if not tables:
+            return self.schema().empty_table().select(columns)
+        return pa.concat_tables(tables)
+
+    # `read` 與 `read_table` 相同，但回傳 DataFrame，欄位與 `load_articles` 相同。
+    # `arrow_strings` 為 True 時字串欄位使用 `string[pyarrow]` 型別，直接沿用 Arrow 的資料而不建立 Python 字串，
+    # 數據清理會交由 `pyarrow.compute` 執行；為 False 時與 `load_articles` 一樣是 object 型別。
+    def read(self, start_date=None, end_date=None, columns=None, arrow_strings=False):
+        table = self.read_table(start_date, end_date, columns)
+        if arrow_strings:
+            return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+        return table.to_pandas()
+
+
+# `load_snapshot` 先更新日期範圍內有變動的月份，再從快照載入文章，結果與 `load_articles` 相同
+def load_snapshot(start_date=None, end_date=None, columns=None, arrow_strings=False,
+                  directory=DEFAULT_SNAPSHOT_DIR, db_path=DEFAULT_DB_PATH):
+    snapshot = ArticleSnapshot(directory, db_path)
+    snapshot.refresh(start_date, end_date)
+    return snapshot.read(start_date, end_date, columns, arrow_strings)
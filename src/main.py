@@ -1,82 +1,103 @@
 import sys
+import threading
+from collections import deque
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QLabel, QWidget, QCheckBox, QTextEdit, QProgressBar, QLineEdit,
-                             QCalendarWidget)
-from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal, QObject, pyqtSlot
+                             QLabel, QWidget, QCheckBox, QTextEdit, QPlainTextEdit, QProgressBar, QLineEdit,
+                             QCalendarWidget, QGridLayout)
+from PyQt6.QtCore import Qt, QDate, QThread, QTimer, pyqtSignal, QObject, pyqtSlot
 from PyQt6.QtGui import QIcon
 import qdarktheme
-from scraping import run_scraper
 import traceback
 import logging
-from datetime import datetime, timedelta
-from utils import clean_data
-from utils import analysis
+from pipeline import PipelineRunner, resolve_dates, query_insights, format_insights
+from database import RollupStore
+from metrics import get_metrics, MetricsReporter, summarize
+
+# 介面更新的間隔（毫秒）。背景執行緒的日誌與進度先累積在 `UpdateBuffer` 中，
+# 再由 GUI 的計時器以固定頻率一次套用，不論管線跑多快，事件迴圈每秒最多只處理這麼多次更新
+UI_FLUSH_INTERVAL_MS = 100
+
+# 日誌區塊最多保留的行數，超過時捨棄最舊的內容
+MAX_LOG_LINES = 5000
+
+# 兩次介面更新之間最多累積的日誌訊息數，限制每次插入的量，避免單次更新卡住介面
+MAX_PENDING_LOG_LINES = 1000
+
+
+# `UpdateBuffer` 在背景執行緒與 GUI 之間傳遞更新，所有方法都是執行緒安全的。
+# 日誌訊息依序累積在有上限的佇列中，滿了就捨棄最舊的訊息並記錄捨棄的數量；
+# 進度、狀態與統計這類「只需要最新值」的更新則以名稱覆蓋，兩次更新之間的中間值直接合併掉。
+class UpdateBuffer:
+    def __init__(self, max_lines=MAX_PENDING_LOG_LINES):
+        self.lock = threading.Lock()
+        self.max_lines = max_lines
+        self.lines = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.latest = {}
+
+    def log(self, message):
+        with self.lock:
+            if len(self.lines) == self.max_lines:
+                self.dropped += 1
+            self.lines.append(message.rstrip("\n"))
+
+    def set(self, name, value):
+        with self.lock:
+            self.latest[name] = value
+
+    # `drain` 取出並清空目前累積的更新。
+    #
+    # 回傳:
+    # `tuple`: `(日誌訊息列表, 被捨棄的訊息數, {名稱: 最新值})`。
+    def drain(self):
+        with self.lock:
+            lines, self.lines = list(self.lines), deque(maxlen=self.max_lines)
+            dropped, self.dropped = self.dropped, 0
+            latest, self.latest = self.latest, {}
+        return lines, dropped, latest
 
 
 class AnalysisThread(QThread):
-    update_log = pyqtSignal(str)
-    update_total_progress = pyqtSignal(int)
-    update_crawler_progress = pyqtSignal(int)
-    update_crawler_status = pyqtSignal(str)
     analysis_finished = pyqtSignal()
 
-    def __init__(self, start_date, end_date, skip_crawl):
+    def __init__(self, start_date, end_date, skip_crawl, profile=False, incremental=False):
         QThread.__init__(self)
         self.start_date = start_date
         self.end_date = end_date
         self.skip_crawl = skip_crawl
-
-    def set_dates(self, start_date, end_date):
-        today = datetime.now().date()
-
-        if start_date == "" and end_date == "":
-            # 如果兩個日期都沒有提供，使用今天作為結束日期，一個月前作為開始日期
-            self.end_date = today
-            self.start_date = today
-        elif start_date == "":
-            # 如果只提供了結束日期，使用一個月前作為開始日期
-            self.end_date = end_date
-            self.start_date = end_date
-        elif end_date == "":
-            # 如果只提供了開始日期，使用今天作為結束日期
-            self.start_date = start_date
-            self.end_date = today
-        else:
-            # 如果兩個日期都提供了，直接使用
-            self.start_date = start_date
-            self.end_date = end_date
-
-        self.update_log.emit(f"分析日期範圍：從 {self.start_date} 到 {self.end_date}\n")
+        self.profile = profile
+        self.incremental = incremental
+        self.updates = UpdateBuffer()
+        # runner 在建立執行緒時就建立，執行緒啟動前或啟動中按下「停止分析」或關閉視窗也會生效。
+        # 步驟與命令列版本 (`python -m pipeline`) 共用，這裡只負責把回報寫入 `self.updates`，
+        # 由 GUI 的計時器定期取出，不會每篇文章都對事件迴圈發出信號。
+        # 以串流管線執行，爬蟲進行的同時已爬到的文章就會被清理與分析；
+        # 爬蟲進度條顯示爬取進度，狀態列顯示各步驟的處理速度與佇列深度
+        self.runner = PipelineRunner(
+            self.start_date, self.end_date, self.skip_crawl,
+            log=self.updates.log,
+            progress=self.progress_callback,
+            staged=True,
+            overall_progress=lambda progress: self.updates.set("total_progress", int(progress * 100)),
+            profile=self.profile,
+            incremental=self.incremental,
+        )
 
     def run(self):
         self.running = True
+        # 統計面板每秒更新一次
+        reporter = MetricsReporter(get_metrics(), lambda snapshot: self.updates.set("metrics", snapshot),
+                                   interval=1.0)
         try:
-            # steps = ["爬蟲", "數據清理", "文本分析", "評分", "最終分析"]
-            steps = ["爬蟲", "數據清理", "文本分析"]
-            switcher = {
-                "爬蟲": run_scraper,
-                "數據清理": clean_data,
-                "文本分析": analysis
-            }
-            for i, step in enumerate(steps):
-                if not self.running:
-                    break
-                self.update_log.emit(f"開始{step}...\n")
-                self.update_total_progress.emit(int((i + 1) / len(steps) * 100))
-                self.set_dates(self.start_date, self.end_date)
-                if step == "爬蟲":
-                    sitemap_url = "https://technews.tw/sitemap.xml"
-                    self.df = switcher.get(step)(sitemap_url, self.start_date, self.end_date, self.progress_callback )
-                else :
-                    self.df = switcher.get(step)(self.df)
-
-                self.update_log.emit(f"{step}完成\n")
-                self.update_log.emit("=" * 100 + "\n")
-
-            if self.running:
-                self.update_log.emit("分析完成")
+            with reporter:
+                self.df = self.runner.run()
+            if self.runner.summary:
+                self.updates.set("result", self.runner.summary)
+
+            if self.runner.running:
+                self.updates.log("分析完成")
             else:
-                self.update_log.emit("分析被用戶中止")
+                self.updates.log("分析被用戶中止")
         except Exception as e:
             exc_type, exc_value, exc_traceback = sys.exc_info()
             error_details = traceback.extract_tb(exc_traceback)
@@ -90,7 +111,7 @@ class AnalysisThread(QThread):
                 func_name = frame.name
                 error_msg += f"  文件 '{filename}', 第 {line_no} 行, 在 {func_name} 函數\n"
 
-            self.update_log.emit(error_msg)
+            self.updates.log(error_msg)
             logging.error(error_msg)
         finally:
             self.running = False
@@ -98,14 +119,48 @@ class AnalysisThread(QThread):
 
     def progress_callback(self, progress, message):
         # print(f"Progress: {progress * 100}%, Message: {message}")  # 調試輸出
-        self.update_crawler_progress.emit( int( progress * 100) )
-        self.update_crawler_status.emit(message)
-        # self.update_log.emit(message + "\n")
+        self.updates.set("crawler_progress", int(progress * 100))
+        self.updates.set("crawler_status", message)
+
+    # `stop` 要求流程停止，不會強制結束執行緒：爬蟲完成下載中的文章並存入資料庫後才結束，
+    # 下次以相同日期範圍執行時會從檢查點繼續。結束時同樣發出 `analysis_finished`
+    def stop(self):
+        self.runner.stop()
+
+    # `abort` 用於關閉視窗：丟棄尚未處理的批次並等待執行緒結束
+    def abort(self):
+        self.runner.abort()
+        self.wait()
+
+
+# `StatsPanel` 顯示 `metrics.summarize` 的各項統計：速度、預估剩餘時間、下載量、快取命中與各步驟耗時
+class StatsPanel(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.layout = QGridLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.values = {}
+        self.progress = None
+
+    def set_progress(self, value):
+        self.progress = value / 100
+
+    def clear(self):
+        self.progress = None
+        for label in self.values.values():
+            label.setText("-")
+
+    @pyqtSlot(dict)
+    def update_snapshot(self, snapshot):
+        for label, value in summarize(snapshot, self.progress):
+            if label not in self.values:
+                row = len(self.values)
+                self.layout.addWidget(QLabel(label + ":"), row, 0)
+                self.values[label] = QLabel()
+                self.values[label].setWordWrap(True)
+                self.layout.addWidget(self.values[label], row, 1)
+            self.values[label].setText(value)
 
-    def terminate(self):
-        # 方法 1: 使用 PyQt 的 terminate 方法
-        super().terminate()
-        self.wait()  # 等待線程結束
 
 class DateSelector(QWidget):
     def __init__(self, label):
@@ -153,6 +208,11 @@ class NewsAnalysisGUI(QMainWindow):
         self.create_widgets()
 
         self.analysis_thread = None
+        self.updates = None
+        self.rollups = None
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(UI_FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush_updates)
 
         self.isRunning = False
 
@@ -184,9 +244,20 @@ class NewsAnalysisGUI(QMainWindow):
         control_layout = QHBoxLayout(control_frame)
         self.skip_crawl = QCheckBox("跳過爬蟲")
         control_layout.addWidget(self.skip_crawl)
+        self.incremental = QCheckBox("增量爬蟲")
+        self.incremental.setToolTip("只下載新文章或有更新的文章，其餘從本地資料庫載入")
+        control_layout.addWidget(self.incremental)
+        self.profile = QCheckBox("效能分析")
+        self.profile.setToolTip("以 cProfile 記錄 CPU 時間，結果寫到 data/profiles/")
+        control_layout.addWidget(self.profile)
         self.start_button = QPushButton("開始分析")
         self.start_button.clicked.connect(self.start_analysis)
+        # 直接從彙總資料庫查詢日期範圍的結果，不重新爬蟲或分析，通常只需數毫秒
+        self.query_button = QPushButton("查詢結果")
+        self.query_button.setToolTip("從彙總資料庫查詢日期範圍的公司排行、共同出現與趨勢，不重新分析文章")
+        self.query_button.clicked.connect(self.show_insights)
         control_layout.addStretch()
+        control_layout.addWidget(self.query_button)
         control_layout.addWidget(self.start_button)
         self.main_layout.addWidget(control_frame)
 
@@ -206,12 +277,22 @@ class NewsAnalysisGUI(QMainWindow):
         progress_layout.addWidget(self.crawler_status)
         self.main_layout.addWidget(progress_frame)
 
+        # 統計
+        stats_frame = QWidget()
+        stats_layout = QVBoxLayout(stats_frame)
+        stats_layout.addWidget(QLabel("統計:"))
+        self.stats_panel = StatsPanel()
+        stats_layout.addWidget(self.stats_panel)
+        self.main_layout.addWidget(stats_frame)
+
         # 日誌
         log_frame = QWidget()
         log_layout = QVBoxLayout(log_frame)
         log_layout.addWidget(QLabel("日誌:"))
-        self.log_text = QTextEdit()
+        # QPlainTextEdit 以區塊為單位管理內容，超過上限時自動刪除最舊的行，長時間執行也不會越來越慢
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.setMaximumBlockCount(MAX_LOG_LINES)
         log_layout.addWidget(self.log_text)
         self.main_layout.addWidget(log_frame)
 
@@ -235,54 +316,93 @@ class NewsAnalysisGUI(QMainWindow):
         start_date = self.start_date.date_edit.text()
         end_date = self.end_date.date_edit.text()
         skip_crawl = self.skip_crawl.isChecked()
+        profile = self.profile.isChecked()
+        incremental = self.incremental.isChecked()
 
         self.log_text.clear()
         self.result_text.clear()
         self.total_progress.setValue(0)
         self.crawler_progress.setValue(0)
         self.crawler_status.setText("")
+        self.stats_panel.clear()
         self.start_button.setText("停止分析")
 
         # 假設 AnalysisThread 是 QThread 的子類
-        self.analysis_thread = AnalysisThread(start_date, end_date, skip_crawl)
-        # 連接信號
-        self.analysis_thread.update_log.connect(self.update_log)
-        self.analysis_thread.update_total_progress.connect(self.total_progress.setValue)
-        self.analysis_thread.update_crawler_progress.connect(self.update_crawler_progress)
-        self.analysis_thread.update_crawler_status.connect(self.crawler_status.setText)
+        self.analysis_thread = AnalysisThread(start_date, end_date, skip_crawl, profile, incremental)
+        # 日誌與進度透過 `updates` 由計時器定期取出，只有結束通知使用信號
+        self.updates = self.analysis_thread.updates
         self.analysis_thread.analysis_finished.connect(self.on_analysis_finished)
         self.analysis_thread.finished.connect(self.analysis_thread.deleteLater)  # 添加這行來正確清理線程
 
+        self.flush_timer.start()
         self.analysis_thread.start()
 
+    def show_insights(self):
+        start_date, end_date = resolve_dates(self.start_date.date_edit.text(), self.end_date.date_edit.text())
+        try:
+            # 連線保留到關閉視窗，記憶體中的範圍索引只在資料變動後才重新建立，之後每次查詢只需數毫秒
+            if self.rollups is None:
+                self.rollups = RollupStore()
+            self.result_text.setPlainText(format_insights(query_insights(self.rollups, start_date, end_date)))
+        except Exception as e:
+            self.result_text.setPlainText(f"查詢失敗：{e}")
+            logging.error(traceback.format_exc())
+
     def stop_analysis(self):
-        self.analysis_thread.terminate()
-        self.start_button.setText("開始分析")
-        self.update_total_progress(0)
+        # 等待執行緒自行結束，按鈕在 `on_analysis_finished` 中恢復
+        self.analysis_thread.stop()
+        self.start_button.setEnabled(False)
+        self.start_button.setText("正在停止...")
         self.update_log( "取消分析........." )
-        self.isRunning = False
-
-    @pyqtSlot(str)
-    def update_log(self, message):
-        self.log_text.append(message)
-        self.log_text.verticalScrollBar().setValue(self.log_text.verticalScrollBar().maximum())
-
-    @pyqtSlot(int)
-    def update_total_progress(self, value):
-        self.total_progress.setValue(value)
 
-    @pyqtSlot(int)
-    def update_crawler_progress(self, value):
-        self.crawler_progress.setValue(value)
+    # `flush_updates` 一次套用背景執行緒累積的所有更新：日誌合併成一次插入，進度與狀態只套用最新值
+    @pyqtSlot()
+    def flush_updates(self):
+        if self.updates is None:
+            return
+        lines, dropped, latest = self.updates.drain()
+        if dropped:
+            lines.insert(0, f"（日誌過多，略過 {dropped} 則較早的訊息）")
+        if lines:
+            self.append_log(lines)
+        if "total_progress" in latest:
+            self.total_progress.setValue(latest["total_progress"])
+            self.stats_panel.set_progress(latest["total_progress"])
+        if "crawler_progress" in latest:
+            self.crawler_progress.setValue(latest["crawler_progress"])
+        if "crawler_status" in latest:
+            self.crawler_status.setText(latest["crawler_status"])
+        if "metrics" in latest:
+            self.stats_panel.update_snapshot(latest["metrics"])
+        if "result" in latest:
+            self.result_text.setPlainText(latest["result"])
+
+    def append_log(self, lines):
+        # 使用者往上捲動查看舊日誌時不強制捲到底部
+        scroll_bar = self.log_text.verticalScrollBar()
+        at_bottom = scroll_bar.value() >= scroll_bar.maximum() - 4
+        self.log_text.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
 
     @pyqtSlot(str)
-    def update_crawler_status(self, status):
-        self.crawler_status.setText(status)
+    def update_log(self, message):
+        self.append_log([message.rstrip("\n")])
 
     @pyqtSlot()
     def on_analysis_finished(self):
+        self.flush_timer.stop()
+        self.flush_updates()
+        self.start_button.setEnabled(True)
         self.start_button.setText("開始分析")
-        self.update_log("分析完成")
+        self.isRunning = False
+
+    def closeEvent(self, event):
+        if self.isRunning and self.analysis_thread is not None:
+            self.analysis_thread.abort()
+        if self.rollups is not None:
+            self.rollups.close()
+        super().closeEvent(event)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -0,0 +1,33 @@
+from .registry import (
+    MetricsRegistry,
+    get_metrics,
+    timed,
+    count
+)
+from .profiling import Profiler
+from .report import (
+    MetricsReporter,
+    JsonLinesExporter,
+    summarize,
+    format_summary,
+    format_bytes,
+    format_duration,
+    estimate_eta,
+    TIMER_LABELS
+)
+
+__all__ = [
+    'MetricsRegistry',
+    'get_metrics',
+    'timed',
+    'count',
+    'Profiler',
+    'MetricsReporter',
+    'JsonLinesExporter',
+    'summarize',
+    'format_summary',
+    'format_bytes',
+    'format_duration',
+    'estimate_eta',
+    'TIMER_LABELS'
+]
@@ -0,0 +1,126 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROFILE_DIR = os.path.join(current_dir, "..", "..", "data", "profiles")
+
+# Python 3.12 起 cProfile 改用 `sys.monitoring`，一個 profile 就會記錄所有執行緒，
+# 而且同一時間只能啟用一個 profile；之前的版本只記錄呼叫 `enable` 的執行緒，需要每個執行緒各自啟用
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+# `Profiler` 在區塊執行期間以 cProfile 記錄 CPU 時間、以 tracemalloc 記錄記憶體配置，
+# 結束時把結果寫到 `output_dir` 下以時間命名的目錄：
+# `cpu.prof`（可用 snakeviz 或 `python -m pstats` 開啟）、`cpu.txt`（依累計時間排序的前幾名函數）
+# 與 `memory.txt`（配置最多記憶體的程式行與峰值）。
+# Python 3.12 之前 cProfile 只會記錄呼叫 `enable` 的執行緒，因此區塊內新建立的執行緒（爬蟲的抓取執行緒、
+# 串流管線的各階段）會透過 `threading.setprofile` 各自啟用一個 `cProfile.Profile`，結束時再合併；
+# 3.12 起主執行緒的 profile 已經涵蓋所有執行緒（見 `PER_THREAD_PROFILES`）。
+# 斷詞與 HTML 解析的行程池在其他行程中執行，不在記錄範圍內。
+#
+# 參數:
+# `output_dir`: 結果的上層目錄。
+# `cpu`: 是否記錄 CPU 時間。
+# `memory`: 是否記錄記憶體配置；tracemalloc 會讓程式明顯變慢，預設不開啟。
+# `top`: 文字報告列出的項目數。
+#
+# 用法:
+# with Profiler(memory=True) as profiler:
+#     runner.run()
+# print(profiler.path)
+class Profiler:
+    def __init__(self, output_dir=DEFAULT_PROFILE_DIR, cpu=True, memory=False, top=40):
+        self.output_dir = output_dir
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.path = None
+        self.peak_bytes = None
+
+    # 只保留成功啟用的 profile，從未啟用的 profile 沒有任何記錄，無法合併
+    def _enable_profile(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        with self.lock:
+            self.profiles.append(profile)
+        return profile
+
+    def _start_thread(self, *args):
+        # 新執行緒第一次觸發 profile hook 時，換成這個執行緒自己的 cProfile；
+        # 已經有其他 profiler 在執行而無法啟用時略過這個執行緒，不能讓執行緒因此結束
+        try:
+            self._enable_profile()
+        except ValueError:
+            sys.setprofile(None)
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cpu:
+            self.main_profile = self._enable_profile()
+            if PER_THREAD_PROFILES:
+                threading.setprofile(self._start_thread)
+        return self
+
+    def stop(self):
+        if self.cpu:
+            self.main_profile.disable()
+            if PER_THREAD_PROFILES:
+                threading.setprofile(None)
+        self.path = os.path.abspath(os.path.join(self.output_dir, datetime.now().strftime("%Y%m%d-%H%M%S")))
+        os.makedirs(self.path, exist_ok=True)
+        # 先取記憶體快照，避免把整理 CPU 報告時的配置也算進去
+        if self.memory and tracemalloc.is_tracing():
+            self._write_memory()
+            tracemalloc.stop()
+        if self.cpu:
+            self._write_cpu()
+        return self.path
+
+    def _write_cpu(self):
+        with self.lock:
+            profiles = list(self.profiles)
+        stats = None
+        merged = 0
+        for profile in profiles:
+            # 沒有任何記錄的 profile（例如執行緒還沒執行到任何函數）無法轉成 pstats，略過
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                continue
+            merged += 1
+        if stats is None:
+            return
+        stats.dump_stats(os.path.join(self.path, "cpu.prof"))
+
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(self.top)
+        with open(os.path.join(self.path, "cpu.txt"), "w", encoding="utf-8") as f:
+            f.write(f"合併 {merged} 個 profile 的記錄\n")
+            f.write(text.getvalue())
+
+    def _write_memory(self):
+        current, self.peak_bytes = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        with open(os.path.join(self.path, "memory.txt"), "w", encoding="utf-8") as f:
+            f.write(f"目前配置 {current / 1024 / 1024:.1f} MB，峰值 {self.peak_bytes / 1024 / 1024:.1f} MB\n\n")
+            for stat in statistics[:self.top]:
+                f.write(f"{stat}\n")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,107 @@
+import contextlib
+import threading
+import time
+
+
+# `MetricsRegistry` 收集整個流程的計時器與計數器，所有方法都是執行緒安全的，
+# 爬蟲的抓取執行緒、串流管線的各階段與 GUI 可以同時使用同一個實例。
+# 計時器記錄呼叫次數、總耗時與最長的一次；計數器只做累加，例如下載的位元組數。
+# 其他模組已有的統計（例如 HTTP 快取的命中次數）不必重複計數，以 `register_collector` 登記一個
+# 回傳字典的函數，`snapshot` 時一併收集。
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.collectors = {}
+        self.reset()
+
+    # `reset` 清除所有計時器與計數器，並重新開始計算經過時間；登記的收集函數會保留
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+            self.started = time.perf_counter()
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    # `timer` 量測區塊的執行時間，例如 `with metrics.timer("clean"): ...`
+    @contextlib.contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_collector(self, name, func):
+        with self.lock:
+            self.collectors[name] = func
+
+    def unregister_collector(self, name):
+        with self.lock:
+            self.collectors.pop(name, None)
+
+    # `snapshot` 回傳目前所有數據的字典，可以直接轉成 JSON。
+    #
+    # 回傳:
+    # `dictionary`:
+    # `elapsed`: 自上次 `reset` 經過的秒數。
+    # `timers`: `{名稱: {count, seconds, mean_ms, max_ms}}`。
+    # `counters`: `{名稱: 累計值}`。
+    # `rates`: `{名稱: 每秒的平均值}`，由計數器除以經過時間得到。
+    # 其他鍵值為各收集函數的回傳值。
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            timers = {
+                name: {
+                    'count': count,
+                    'seconds': round(total, 4),
+                    'mean_ms': round(total / count * 1000, 3),
+                    'max_ms': round(longest * 1000, 3),
+                }
+                for name, (count, total, longest) in self.timers.items()
+            }
+            counters = dict(self.counters)
+            collectors = dict(self.collectors)
+
+        snapshot = {
+            'elapsed': round(elapsed, 3),
+            'timers': timers,
+            'counters': counters,
+            'rates': {name: round(value / elapsed, 3) if elapsed > 0 else 0.0 for name, value in counters.items()},
+        }
+        # 收集函數在鎖外呼叫，避免它們再使用計數器時發生死結
+        for name, func in collectors.items():
+            try:
+                snapshot[name] = func()
+            except Exception as e:
+                snapshot[name] = {'error': str(e)}
+        return snapshot
+
+
+_metrics = MetricsRegistry()
+
+
+# `get_metrics` 回傳整個程式共用的 `MetricsRegistry`
+def get_metrics():
+    return _metrics
+
+
+def timed(name):
+    return _metrics.timer(name)
+
+
+def count(name, value=1):
+    _metrics.incr(name, value)
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+
+# 計時器在統計面板與日誌中顯示的名稱，依流程的先後排列；沒有列在這裡的計時器以原名顯示
+TIMER_LABELS = {
+    'fetch.rate_limit': "限速等待",
+    'fetch.response': "等待回應",
+    'fetch.download': "下載",
+    'parse': "HTML 解析",
+    'clean': "數據清理",
+    'dedup': "去除重複",
+    'segment': "斷詞標註",
+    'analyze': "文本分析",
+}
+
+
+# `MetricsReporter` 在背景執行緒中每隔 `interval` 秒取一次 `registry.snapshot()` 交給 `callback`，
+# 結束時再回報最後一次，GUI 的統計面板與命令列的 JSON 輸出都使用它。
+#
+# 參數:
+# `registry`: `MetricsRegistry`。
+# `callback`: 接收 snapshot 字典的函數。
+# `interval`: 回報的間隔秒數。
+class MetricsReporter:
+    def __init__(self, registry, callback, interval=1.0):
+        self.registry = registry
+        self.callback = callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.callback(self.registry.snapshot())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.callback(self.registry.snapshot())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# `JsonLinesExporter` 把每次收到的 snapshot 以一行 JSON 附加到檔案，可以直接作為 `MetricsReporter` 的 callback
+class JsonLinesExporter:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, snapshot):
+        line = json.dumps({"time": round(time.time(), 3), **snapshot}, ensure_ascii=False, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def format_bytes(value):
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+# `estimate_eta` 依已經過的時間與進度（0 到 1）估計剩餘秒數，進度為 0 時無法估計而回傳 None
+def estimate_eta(elapsed, progress):
+    if not progress or progress <= 0:
+        return None
+    return max(elapsed * (1 - progress) / progress, 0.0)
+
+
+def _hit_ratio(hits, total):
+    return f"{hits}/{total} ({hits / total:.0%})" if total else "-"
+
+
+# `summarize` 把 snapshot 整理成 `[(標題, 文字)]`，GUI 的統計面板與日誌共用。
+# 「累計耗時」是各執行緒時間的加總，並行抓取時會大於實際經過的時間。
+#
+# 參數:
+# `snapshot`: `MetricsRegistry.snapshot()` 的結果。
+# `progress`: 整體進度（0 到 1），用於估計剩餘時間。
+def summarize(snapshot, progress=None):
+    counters, rates, timers = snapshot['counters'], snapshot['rates'], snapshot['timers']
+    rows = [
+        ("經過時間", format_duration(snapshot['elapsed'])),
+    ]
+    eta = estimate_eta(snapshot['elapsed'], progress)
+    rows.append(("預估剩餘", format_duration(eta) if eta is not None else "-"))
+    rows.append(("爬取文章", f"{counters.get('articles.scraped', 0)} 篇 "
+                             f"({rates.get('articles.scraped', 0.0):.1f} 篇/秒)"))
+    duplicates = counters.get('articles.duplicates')
+    if duplicates:
+        rows.append(("重複文章", f"{duplicates} 篇"))
+    rows.append(("下載量", f"{format_bytes(counters.get('fetch.bytes', 0))} "
+                           f"({format_bytes(rates.get('fetch.bytes', 0.0))}/秒)"))
+
+    http = snapshot.get('http_cache')
+    if isinstance(http, dict) and 'hits' in http:
+        served = http['hits'] + http['revalidated']
+        rows.append(("HTTP 快取命中", _hit_ratio(served, served + http['misses'])))
+    transport = snapshot.get('transport')
+    if isinstance(transport, dict) and 'requests' in transport:
+        rows.append(("連線重用", f"{transport['reused']}/{transport['requests']} "
+                                 f"(新建 {transport['connections']} 次)"))
+    analysis = snapshot.get('analysis_cache')
+    if isinstance(analysis, dict) and 'hits' in analysis:
+        rows.append(("斷詞快取命中", _hit_ratio(analysis['hits'], analysis['hits'] + analysis['misses'])))
+
+    names = [name for name in TIMER_LABELS if name in timers] + sorted(set(timers) - set(TIMER_LABELS))
+    phases = [f"{TIMER_LABELS.get(name, name)} {timers[name]['seconds']:.1f} 秒" for name in names]
+    if phases:
+        rows.append(("累計耗時", "、".join(phases)))
+    return rows
+
+
+def format_summary(snapshot, progress=None):
+    return "\n".join(f"{label}：{value}" for label, value in summarize(snapshot, progress))
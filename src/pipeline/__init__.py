@@ -0,0 +1,25 @@
+from .steps import (
+    PipelineRunner,
+    resolve_dates,
+    write_output,
+    STEPS,
+    OUTPUT_FORMATS,
+    DEFAULT_SITEMAP_URL
+)
+from .insights import query_insights, format_insights
+from .staged import StagedPipeline, BatchQueueSink, StageStats, PipelineAborted
+
+__all__ = [
+    'PipelineRunner',
+    'resolve_dates',
+    'write_output',
+    'STEPS',
+    'OUTPUT_FORMATS',
+    'DEFAULT_SITEMAP_URL',
+    'StagedPipeline',
+    'BatchQueueSink',
+    'StageStats',
+    'PipelineAborted',
+    'query_insights',
+    'format_insights'
+]
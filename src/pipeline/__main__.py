@@ -0,0 +1,142 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+from datetime import datetime
+
+from metrics import get_metrics, MetricsReporter, JsonLinesExporter
+from .steps import PipelineRunner, write_output, DEFAULT_SITEMAP_URL, OUTPUT_FORMATS
+
+# 結束代碼：參數錯誤由 argparse 以 2 結束
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+
+def _parse_date(value):
+    for date_format in ("%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"無法解析的日期：{value}，請使用 YYYY/MM/DD 或 YYYY-MM-DD")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m pipeline",
+        description="不開啟 GUI 執行 爬蟲 → 數據清理 → 去除重複 → 斷詞標註 → 文本分析，進度以 JSON 逐行輸出到 stdout。",
+    )
+    parser.add_argument("--start", type=_parse_date, help="開始日期，例如 2024/06/01；未指定時與 GUI 相同以今天補上")
+    parser.add_argument("--end", type=_parse_date, help="結束日期（含當天）")
+    parser.add_argument("--skip-crawl", action="store_true", help="不爬蟲，從本地資料庫載入文章")
+    parser.add_argument("--sitemap", default=DEFAULT_SITEMAP_URL, help="sitemap 索引的網址")
+    parser.add_argument("--workers", type=int, default=4, help="同時下載的文章數")
+    parser.add_argument("--rate", type=float, default=1.0, help="每秒對同一主機的請求數上限")
+    parser.add_argument("--parse-workers", type=int, default=0, help="解析 HTML 的行程數，0 代表在下載執行緒中解析")
+    parser.add_argument("--segment-workers", type=int, default=None, help="斷詞的行程數，預設使用所有 CPU 核心")
+    parser.add_argument("--sequential", action="store_true", help="逐步執行每個步驟，而不是以串流管線同時執行")
+    parser.add_argument("--batch-size", type=int, default=50, help="串流管線中每批的文章數")
+    parser.add_argument("--queue-size", type=int, default=4, help="串流管線中每個步驟之間最多累積的批次數")
+    parser.add_argument("--no-cache", action="store_true", help="不使用斷詞快取，也不更新彙總資料庫")
+    parser.add_argument("--no-dedup", action="store_true", help="不去除內容幾乎相同的轉載或重複文章")
+    parser.add_argument("--incremental", action="store_true",
+                        help="只爬取新文章或 sitemap <lastmod> 有變動的文章，其餘從本地資料庫載入（適合每日排程執行）")
+    parser.add_argument("--no-resume", action="store_true", help="不從上次被中斷的執行繼續，重新爬取所有文章")
+    parser.add_argument("--output", help="結果輸出路徑，副檔名可為 .csv、.parquet 或 .jsonl")
+    parser.add_argument("--metrics", help="每秒將計時器與計數器以 JSON 逐行附加到這個檔案")
+    parser.add_argument("--metrics-interval", type=float, default=1.0, help="--metrics 的寫入間隔秒數")
+    parser.add_argument("--profile", action="store_true", help="以 cProfile 記錄 CPU 時間，結果寫到 data/profiles/")
+    parser.add_argument("--profile-memory", action="store_true", help="以 tracemalloc 記錄記憶體配置（會明顯變慢）")
+    return parser
+
+
+# 每個事件是一行 JSON，例如 {"event": "progress", "progress": 0.5, "message": "..."}
+class EventWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def emit(self, event, **fields):
+        fields = {"event": event, "time": round(time.time(), 3), **fields}
+        self.stream.write(json.dumps(fields, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # 輸出格式在開始前就檢查，避免跑完整個流程才發現無法寫入
+    if args.output and os.path.splitext(args.output)[1].lower() not in OUTPUT_FORMATS:
+        parser.error(f"--output 的副檔名必須是 {'、'.join(OUTPUT_FORMATS)}")
+    events = EventWriter(sys.stdout)
+
+    runner = PipelineRunner(
+        args.start, args.end,
+        skip_crawl=args.skip_crawl,
+        sitemap_url=args.sitemap,
+        max_workers=args.workers,
+        requests_per_second=args.rate,
+        parse_workers=args.parse_workers,
+        segment_workers=args.segment_workers,
+        use_cache=not args.no_cache,
+        log=lambda message: events.emit("log", message=message.rstrip("\n")),
+        progress=lambda progress, message: events.emit("progress", progress=round(progress, 4), message=message),
+        step_started=lambda index, total, step: events.emit("step", index=index + 1, total=total, step=step),
+        staged=not args.sequential,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        stage_stats=lambda snapshot: events.emit("stats", stages=snapshot),
+        profile=args.profile,
+        profile_memory=args.profile_memory,
+        resume=not args.no_resume,
+        dedup=not args.no_dedup,
+        incremental=args.incremental,
+    )
+    events.emit("start", start_date=runner.start_date, end_date=runner.end_date, skip_crawl=args.skip_crawl,
+                incremental=args.incremental)
+    started = time.perf_counter()
+    exporter = JsonLinesExporter(args.metrics) if args.metrics else None
+    reporter = MetricsReporter(get_metrics(), exporter, args.metrics_interval).start() if exporter else None
+
+    # 第一次 Ctrl+C 讓流程停止：下載中的文章存入資料庫並記錄檢查點後才結束；
+    # 第二次 Ctrl+C 恢復預設行為，立即中斷
+    def request_stop(signum, frame):
+        events.emit("stopping")
+        runner.stop()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    previous_handler = signal.signal(signal.SIGINT, request_stop)
+    try:
+        # 各模組以 print 輸出的訊息改寫到 stderr，stdout 只保留 JSON 事件
+        with contextlib.redirect_stdout(sys.stderr):
+            df = runner.run()
+            if args.output and df is not None:
+                write_output(df, args.output)
+    except KeyboardInterrupt:
+        events.emit("interrupted")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        events.emit("error", type=type(e).__name__, message=str(e), traceback=traceback.format_exc())
+        return EXIT_FAILED
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        if reporter is not None:
+            reporter.stop()
+            exporter.close()
+
+    if not runner.running:
+        events.emit("interrupted", articles=0 if df is None else len(df), output=args.output)
+        return EXIT_INTERRUPTED
+    events.emit("done", articles=0 if df is None else len(df), output=args.output,
+                seconds=round(time.perf_counter() - started, 3),
+                steps={step: round(seconds, 3) for step, seconds in runner.step_seconds.items()},
+                metrics=get_metrics().snapshot(), summary=runner.summary)
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT_PATH = os.path.join(current_dir, "..", "..", "data", "pipeline_checkpoint.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS done (
+    url TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+# `PipelineCheckpoint` 記錄尚未完成的一次執行：日期範圍，以及已經爬取並存入本地資料庫的文章 URL。
+# 執行被停止或當掉時記錄會保留下來，下次以相同日期範圍執行時，這些文章直接從本地資料庫載入，
+# 不必重新下載；整個流程正常結束後才清除記錄。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class PipelineCheckpoint:
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # `begin` 開始一次執行。上次未完成的執行與這次的日期範圍相同時，回傳當時已完成的 URL 以便從中斷處繼續；
+    # 否則清除舊的記錄，回傳空集合。
+    def begin(self, start_date, end_date):
+        start_date, end_date = str(start_date), str(end_date)
+        with self.lock:
+            row = self.conn.execute("SELECT start_date, end_date FROM run WHERE id = 1").fetchone()
+            if row == (start_date, end_date):
+                return {url for (url,) in self.conn.execute("SELECT url FROM done")}
+            with self.conn:
+                self.conn.execute("DELETE FROM done")
+                self.conn.execute("INSERT OR REPLACE INTO run (id, start_date, end_date, started_at) "
+                                  "VALUES (1, ?, ?, ?)", (start_date, end_date, time.time()))
+        return set()
+
+    # `mark_done` 記錄已存入本地資料庫的文章，每次呼叫都是一個交易，當掉時不會遺失已提交的記錄
+    def mark_done(self, urls):
+        urls = [(url,) for url in urls if url]
+        if not urls:
+            return
+        with self.lock:
+            with self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO done (url) VALUES (?)", urls)
+
+    # `finish` 在整個流程正常結束後清除記錄
+    def finish(self):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM done")
+                self.conn.execute("DELETE FROM run")
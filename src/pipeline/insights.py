@@ -0,0 +1,81 @@
+import time
+
+import pandas as pd
+
+
+# `previous_period` 回傳緊接在日期範圍之前、長度相同的範圍，用於比較關鍵字的趨勢變化
+def previous_period(start_date, end_date):
+    start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    previous_end = start - pd.Timedelta(days=1)
+    return previous_end - (end - start), previous_end
+
+
+# `query_insights` 從彙總資料庫取出日期範圍內的公司排行、公司共同出現與趨勢關鍵字的變化。
+# 全部是每日彙總上的範圍查詢（見 `database.RollupStore`），不需要載入或重新分析文章。
+#
+# 參數:
+# `store`: `database.RollupStore`。
+# `start_date`, `end_date`: 日期範圍（含頭尾）。
+# `limit`: 每個排行最多幾項。
+#
+# 回傳:
+# `dictionary`: companies、pairs、related（排名第一的公司最常一起出現的公司）、
+#               trends（keyword、count、previous、change）與查詢耗時 seconds。
+def query_insights(store, start_date, end_date, limit=10):
+    started = time.perf_counter()
+    companies = store.top_companies(start_date, end_date, limit=limit)
+    pairs = store.top_pairs(start_date, end_date, limit=limit)
+    related = pd.DataFrame(columns=['company', 'count'])
+    if len(companies):
+        related = store.related_companies(companies['company'].iloc[0], start_date, end_date, limit=5)
+
+    trends = store.top_trends(start_date, end_date, limit=limit)
+    previous_start, previous_end = previous_period(start_date, end_date)
+    previous = store.top_trends(previous_start, previous_end, limit=None).set_index('keyword')['count']
+    trends['previous'] = trends['keyword'].map(previous).fillna(0).astype(int)
+    trends['change'] = trends['count'] - trends['previous']
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'companies': companies,
+        'pairs': pairs,
+        'related': related,
+        'trends': trends,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+# `format_insights` 將 `query_insights` 的結果轉成顯示在「分析結果」區塊的文字
+def format_insights(insights):
+    start, end = pd.Timestamp(insights['start_date']), pd.Timestamp(insights['end_date'])
+    previous_start, previous_end = previous_period(start, end)
+    lines = [f"分析結果：{start:%Y/%m/%d} 到 {end:%Y/%m/%d}（查詢 {insights['seconds'] * 1000:.1f} 毫秒）", ""]
+
+    lines.append("提及最多的公司：")
+    companies = insights['companies']
+    if len(companies) == 0:
+        lines.append("  （沒有資料）")
+    for rank, row in enumerate(companies.itertuples(), 1):
+        lines.append(f"  {rank:2d}. {row.company}：{row.mentions} 篇，平均分數 {row.mean_score:+.2f}")
+
+    related = insights['related']
+    if len(related):
+        lines.append("")
+        lines.append(f"最常與 {companies['company'].iloc[0]} 一起出現：" +
+                     "、".join(f"{row.company} ({row.count})" for row in related.itertuples()))
+
+    lines.append("")
+    lines.append("最常一起出現的公司：")
+    if len(insights['pairs']) == 0:
+        lines.append("  （沒有資料）")
+    for rank, row in enumerate(insights['pairs'].itertuples(), 1):
+        lines.append(f"  {rank:2d}. {row.company_a} × {row.company_b}：{row.count} 篇")
+
+    lines.append("")
+    lines.append(f"趨勢關鍵字（與前期 {previous_start:%Y/%m/%d} 到 {previous_end:%Y/%m/%d} 比較）：")
+    if len(insights['trends']) == 0:
+        lines.append("  （沒有資料）")
+    for rank, row in enumerate(insights['trends'].itertuples(), 1):
+        lines.append(f"  {rank:2d}. {row.keyword}：{row.count} 篇（前期 {row.previous} 篇，{row.change:+d}）")
+    return "\n".join(lines)
+
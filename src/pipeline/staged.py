@@ -0,0 +1,198 @@
+import queue
+import threading
+import time
+
+import pandas as pd
+
+# 佇列中代表「上游已經沒有資料」的標記
+_END = object()
+
+# 等待佇列時每隔這麼多秒檢查一次是否需要中止
+_POLL_SECONDS = 0.2
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+# `StageStats` 記錄一個階段處理的批次數、文章數與實際工作的時間
+class StageStats:
+    def __init__(self, name, inbox=None):
+        self.name = name
+        self.inbox = inbox
+        self.batches = 0
+        self.articles = 0
+        self.busy_seconds = 0.0
+        self.started = time.perf_counter()
+        self.finished = False
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'stage': self.name,
+            'batches': self.batches,
+            'articles': self.articles,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'articles_per_second': round(self.articles / elapsed, 3) if elapsed > 0 else 0.0,
+            'queue_depth': self.inbox.qsize() if self.inbox is not None else 0,
+            'queue_size': self.inbox.maxsize if self.inbox is not None else 0,
+            'finished': self.finished,
+        }
+
+
+# `BatchQueueSink` 是給 `run_scraper` 使用的寫入器：每累積 `batch_size` 篇文章就組成一個 DataFrame
+# 放進佇列交給下一個階段。佇列已滿時 `write` 會等待，爬蟲因此不會遠遠超前後面的階段（背壓）。
+class BatchQueueSink:
+    def __init__(self, emit, batch_size=50):
+        self.emit = emit
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def written_urls(self):
+        return set()
+
+    def write(self, article):
+        self.buffer.append(article)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            batch, self.buffer = self.buffer, []
+            self.emit(pd.DataFrame(batch))
+
+    def close(self):
+        self.flush()
+
+    def dataset(self):
+        return None
+
+
+# `StagedPipeline` 以有界佇列串接多個階段，每個階段在自己的執行緒中處理一批文章後交給下一個階段，
+# 因此爬蟲還在等網路時，前面已爬到的批次就能同時清理、斷詞與分析。
+# 佇列的大小限制了各階段之間最多累積的批次數，較慢的階段會讓上游暫停，記憶體用量不會無限增長。
+# 任何一個階段發生例外時，所有階段都會停止，例外在 `run` 中重新拋出。
+#
+# 參數:
+# `source`: 產生資料的函數，接收 `emit(batch)` 並對每個批次呼叫一次。
+# `stages`: `[(階段名稱, 處理函數)]`，處理函數接收一個批次並回傳處理後的批次。
+# `source_name`: 來源階段在統計中的名稱。
+# `queue_size`: 每個佇列最多容納的批次數。
+# `report`: 定期呼叫的函數，接收所有階段的統計（`StageStats.snapshot()` 的列表）。
+# `report_interval`: 呼叫 `report` 的間隔秒數。
+class StagedPipeline:
+    def __init__(self, source, stages, source_name="source", queue_size=4, report=None, report_interval=1.0):
+        self.source = source
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.stats = [StageStats(source_name)] + [
+            StageStats(name, self.queues[i]) for i, (name, _) in enumerate(stages)
+        ]
+        self.report = report
+        self.report_interval = report_interval
+        self.abort = threading.Event()
+        self.error = None
+
+    def stop(self):
+        self.abort.set()
+
+    def _put(self, q, item):
+        while True:
+            if self.abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def _get(self, q):
+        while True:
+            if self.abort.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                pass
+
+    def _fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.abort.set()
+
+    def _run_source(self):
+        stats = self.stats[0]
+
+        def emit(batch):
+            stats.batches += 1
+            stats.articles += len(batch)
+            self._put(self.queues[0], batch)
+
+        try:
+            self.source(emit)
+            stats.finished = True
+            self._put(self.queues[0], _END)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _run_stage(self, index):
+        name, func = self.stages[index]
+        stats = self.stats[index + 1]
+        inbox, outbox = self.queues[index], self.queues[index + 1]
+        try:
+            while True:
+                batch = self._get(inbox)
+                if batch is _END:
+                    stats.finished = True
+                    self._put(outbox, _END)
+                    return
+                started = time.perf_counter()
+                result = func(batch)
+                stats.busy_seconds += time.perf_counter() - started
+                stats.batches += 1
+                stats.articles += len(batch)
+                self._put(outbox, result)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def snapshot(self):
+        return [stats.snapshot() for stats in self.stats]
+
+    # `run` 執行管線直到來源與所有階段都完成，回傳最後一個階段產生的所有批次
+    def run(self):
+        threads = [threading.Thread(target=self._run_source, name="pipeline-source", daemon=True)]
+        threads += [threading.Thread(target=self._run_stage, args=(i,), name=f"pipeline-{name}", daemon=True)
+                    for i, (name, _) in enumerate(self.stages)]
+        for thread in threads:
+            thread.start()
+
+        results = []
+        last_report = time.perf_counter()
+        try:
+            while not self.abort.is_set():
+                try:
+                    batch = self.queues[-1].get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    batch = None
+                if batch is _END:
+                    break
+                if batch is not None:
+                    results.append(batch)
+                # 即使最後一個階段還沒有產出（例如爬蟲仍在等網路），也定期回報各階段的狀態
+                if self.report and time.perf_counter() - last_report >= self.report_interval:
+                    self.report(self.snapshot())
+                    last_report = time.perf_counter()
+        finally:
+            # 正常結束時所有執行緒都已經送出結束標記；例外或中止時通知它們停止
+            self.abort.set()
+            for thread in threads:
+                thread.join()
+        if self.report:
+            self.report(self.snapshot())
+        if self.error is not None:
+            raise self.error
+        return results
@@ -0,0 +1,451 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from scraping import run_scraper
+from utils import clean_data, drop_near_duplicates, segment_articles, analysis, create_segment_executor
+from database import (save_articles, load_articles, load_snapshot, ArticleStore, AnalysisCache, RollupStore, DedupIndex,
+                      HAS_PYARROW)
+from metrics import get_metrics, Profiler, format_summary
+from .staged import StagedPipeline, BatchQueueSink
+from .checkpoint import PipelineCheckpoint
+from .insights import query_insights, format_insights
+
+DEFAULT_SITEMAP_URL = "https://technews.tw/sitemap.xml"
+
+STEPS = ["爬蟲", "數據清理", "去除重複", "斷詞標註", "文本分析"]
+
+OUTPUT_FORMATS = (".csv", ".parquet", ".jsonl")
+
+
+# `resolve_dates` 補齊沒有填寫的日期：都沒有填寫時只分析今天，只填一個時另一個以今天或同一天補上
+def resolve_dates(start_date, end_date):
+    today = datetime.now().date()
+    start_date = start_date or ""
+    end_date = end_date or ""
+
+    if start_date == "" and end_date == "":
+        return today, today
+    if start_date == "":
+        return end_date, end_date
+    if end_date == "":
+        return start_date, today
+    return start_date, end_date
+
+
+def _noop(*args):
+    pass
+
+
+# `PipelineRunner` 執行「爬蟲 → 數據清理 → 去除重複 → 斷詞標註 → 文本分析」，不依賴任何 GUI 套件。
+# GUI 的 `AnalysisThread` 與命令列的 `python -m pipeline` 都使用它，透過回呼函數回報進度，
+# 因此兩者執行的步驟完全相同。
+# 預設逐步執行，每個步驟處理完整的 DataFrame；`staged` 為 True 時改用 `StagedPipeline`，
+# 文章分批在各步驟間流動，爬蟲等待網路的同時，已爬到的文章就在清理、斷詞與分析。
+#
+# 參數:
+# `start_date`, `end_date`: 日期範圍，可以是字串（例如 "2024/06/01"）或 date；空字串或 None 時由 `resolve_dates` 補齊。
+# `skip_crawl`: 為 True 時不爬蟲，改從本地資料庫載入日期範圍內的文章；安裝了 pyarrow 時從欄式快照載入
+#               （見 `database.ArticleSnapshot`）。
+# `max_workers`, `requests_per_second`, `parse_workers`: 傳給 `run_scraper` 的爬蟲設定。
+# `segment_workers`: 斷詞的行程數，None 代表使用所有 CPU 核心。
+# `use_cache`: 是否使用斷詞結果快取與彙總資料庫。
+# `log`: 接收日誌訊息的函數。
+# `progress`: 接收步驟內進度 `(progress, message)` 的函數。
+# `step_started`: 每個步驟開始時呼叫，接收 `(index, total, step)`。
+# `staged`: 是否以串流管線執行。
+# `batch_size`, `queue_size`: 串流管線中每批的文章數，以及每個步驟之間最多累積的批次數。
+# `overall_progress`: 串流管線中接收整體進度（0 到 1）的函數。
+# `stage_stats`: 串流管線中定期接收各步驟統計（文章數、每秒文章數、佇列深度）的函數。
+# `profile`: 是否以 cProfile 記錄 CPU 時間，結果寫到 data/profiles/（見 `metrics.Profiler`）。
+# `profile_memory`: 是否以 tracemalloc 記錄記憶體配置。
+# `resume`: 是否使用檢查點。上次以相同日期範圍執行時被停止或中斷的話，已存入本地資料庫的文章
+#           直接從資料庫載入，不再重新下載（見 `PipelineCheckpoint`）。
+# `incremental`: 是否以增量模式爬蟲（見 `scraping.run_scraper`）：只下載爬取索引中沒有的新文章，
+#                或 sitemap `<lastmod>` 有變動的文章，存入本地資料庫後才記錄到索引；其餘文章直接從本地資料庫載入。
+#                適合每日排程執行。索引本身已記錄每篇存下來的文章，因此增量模式不使用檢查點。
+# `dedup`: 是否在斷詞前去除內容與較早文章幾乎相同的轉載或重複文章（見 `utils.find_near_duplicates`），
+#          比對的歷史保存在 `database.DedupIndex`，新文章也會與之前執行時看過的文章比對。
+#
+# 各步驟的耗時與文章數記錄在 `metrics.get_metrics()` 中，每次 `run` 開始時歸零，結束時寫入日誌。
+# 使用彙總資料庫時，分析完成後日期範圍的公司排行、公司共同出現與趨勢變化會存到 `summary`（見 `format_insights`）。
+class PipelineRunner:
+    def __init__(self, start_date, end_date, skip_crawl=False, sitemap_url=DEFAULT_SITEMAP_URL,
+                 max_workers=4, requests_per_second=1.0, parse_workers=0, segment_workers=None,
+                 use_cache=True, log=None, progress=None, step_started=None,
+                 staged=False, batch_size=50, queue_size=4, overall_progress=None, stage_stats=None,
+                 profile=False, profile_memory=False, resume=True, dedup=True, incremental=False):
+        self.start_date, self.end_date = resolve_dates(start_date, end_date)
+        self.skip_crawl = skip_crawl
+        self.sitemap_url = sitemap_url
+        self.max_workers = max_workers
+        self.requests_per_second = requests_per_second
+        self.parse_workers = parse_workers
+        self.segment_workers = segment_workers
+        self.use_cache = use_cache
+        self.log = log or _noop
+        self.progress = progress or _noop
+        self.step_started = step_started or _noop
+        self.staged = staged
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.overall_progress = overall_progress or _noop
+        self.stage_stats = stage_stats or _noop
+        self.profile = profile
+        self.profile_memory = profile_memory
+        self.resume = resume
+        self.dedup = dedup
+        self.incremental = incremental
+        self.metrics = get_metrics()
+        self.cancel_event = threading.Event()
+        self.checkpoint = None
+        self.running = False
+        self.df = None
+        self.summary = None
+        self.step_seconds = {}
+        self.pipeline = None
+
+    # `stop` 要求流程停止，可以從任何執行緒呼叫，呼叫後 `run` 會盡快返回：
+    # 爬蟲不再抓取新的文章，已在下載中的文章完成後照常存入本地資料庫並記錄到檢查點；
+    # 尚未斷詞與分析的文章則略過，`run` 回傳已完成分析的部分。
+    def stop(self):
+        self.running = False
+        self.cancel_event.set()
+
+    # `abort` 立即中止所有步驟，佇列中尚未處理的批次直接丟棄，用於關閉程式等無法等待的情況
+    def abort(self):
+        self.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+
+    # `run` 執行所有步驟並回傳最後的 DataFrame；被 `stop` 中止時回傳中止前的結果。
+    # 在 `run` 開始前（例如執行緒還在啟動時）呼叫的 `stop` 同樣有效，流程不會開始，回傳 None。
+    def run(self):
+        self.running = True
+        if self.cancel_event.is_set():
+            self.running = False
+            self.cancel_event.clear()
+            self.log("流程在開始前已被停止\n")
+            return None
+        self.metrics.reset()
+        self.summary = None
+        profiler = None
+        if self.profile or self.profile_memory:
+            profiler = Profiler(cpu=self.profile, memory=self.profile_memory).start()
+        if self.resume and not self.skip_crawl and not self.incremental:
+            self.checkpoint = PipelineCheckpoint()
+        try:
+            df = self._run_staged() if self.staged else self._run_sequential()
+            if self.checkpoint is not None:
+                if self.running:
+                    # 整個流程完成後才清除檢查點，被停止時保留給下次繼續
+                    self.checkpoint.finish()
+                else:
+                    self.log("已停止：已爬取的文章都已存入本地資料庫，下次以相同日期範圍執行時會從這裡繼續\n")
+            return df
+        finally:
+            # 結束後重設，同一個 runner 可以再次執行
+            self.cancel_event.clear()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+                self.checkpoint = None
+            if profiler is not None:
+                self.log(f"效能分析結果已寫入 {profiler.stop()}\n")
+            self.log("效能統計：\n" + format_summary(self.metrics.snapshot()) + "\n")
+
+    def _run_sequential(self):
+        steps = {
+            "爬蟲": self.crawl,
+            "數據清理": self.clean,
+            "去除重複": self.deduplicate,
+            "斷詞標註": self.segment,
+            "文本分析": self.analyze,
+        }
+        self.log(f"分析日期範圍：從 {self.start_date} 到 {self.end_date}\n")
+        for i, step in enumerate(STEPS):
+            if not self.running:
+                break
+            self.log(f"開始{step}...\n")
+            self.step_started(i, len(STEPS), step)
+            started = time.perf_counter()
+            steps[step]()
+            self.step_seconds[step] = time.perf_counter() - started
+            self.log(f"{step}完成\n")
+            self.log("=" * 100 + "\n")
+        return self.df
+
+    # `_resume_urls` 開始檢查點並回傳上次被停止時已經存下來的文章 URL
+    def _resume_urls(self):
+        if self.checkpoint is None:
+            return set()
+        done = self.checkpoint.begin(self.start_date, self.end_date)
+        if done:
+            self.log(f"從上次中斷處繼續：{len(done)} 篇文章已在本地資料庫中，不再重新下載\n")
+        return done
+
+    def _load_resumed(self, done):
+        with ArticleStore() as store:
+            return store.query_urls(done)
+
+    # `_save` 將爬到的文章存入本地資料庫，並記錄到檢查點
+    def _save(self, df):
+        saved = save_articles(df)
+        if self.checkpoint is not None and 'URL' in df.columns:
+            self.checkpoint.mark_done(df['URL'].dropna().tolist())
+        return saved
+
+    # `_load_stored` 載入本地資料庫中日期範圍內的文章。有 pyarrow 時先更新有變動的月份快照，
+    # 再以 memory map 讀取涵蓋日期範圍的分區，重新分析多年的文章也不需要逐列讀取 SQLite
+    def _load_stored(self):
+        started = time.perf_counter()
+        if HAS_PYARROW:
+            df = load_snapshot(self.start_date, self.end_date, arrow_strings=True)
+            source = "欄式快照"
+        else:
+            df = load_articles(self.start_date, self.end_date)
+            source = "本地資料庫"
+        self.log(f"跳過爬蟲，從{source}載入 {len(df)} 篇文章（{time.perf_counter() - started:.2f} 秒）\n")
+        return df
+
+    def crawl(self):
+        if self.skip_crawl:
+            self.df = self._load_stored()
+            return
+        if self.incremental:
+            with ArticleStore() as store:
+                self.df = run_scraper(self.sitemap_url, self.start_date, self.end_date, self.progress,
+                                      max_workers=self.max_workers, requests_per_second=self.requests_per_second,
+                                      parse_workers=self.parse_workers, cancel_event=self.cancel_event,
+                                      incremental=True, store=store)
+            self.log(f"增量爬蟲：日期範圍內共 {len(self.df)} 篇文章，新文章與更新的文章已存入本地資料庫\n")
+            return
+        done = self._resume_urls()
+        df = run_scraper(self.sitemap_url, self.start_date, self.end_date, self.progress,
+                         max_workers=self.max_workers, requests_per_second=self.requests_per_second,
+                         parse_workers=self.parse_workers, cancel_event=self.cancel_event, skip_urls=done)
+        saved = self._save(df)
+        self.log(f"已將 {saved} 篇文章存入本地資料庫\n")
+        if done:
+            frames = [frame for frame in (self._load_resumed(done), df) if len(frame)]
+            df = pd.concat(frames, ignore_index=True) if frames else df
+        self.df = df
+
+    def clean(self):
+        with self.metrics.timer("clean"):
+            self.df = clean_data(self.df)
+        self.metrics.incr("articles.cleaned", len(self.df))
+
+    def deduplicate(self):
+        if not self.dedup:
+            self.log("已停用去除重複\n")
+            return
+        with DedupIndex() as index:
+            self.df = self._drop_duplicates(self.df, index)
+
+    # `_drop_duplicates` 移除重複的文章並記錄到日誌與統計中
+    def _drop_duplicates(self, df, index):
+        with self.metrics.timer("dedup"):
+            df, removed = drop_near_duplicates(df, index=index)
+        if len(removed):
+            self.metrics.incr("articles.duplicates", len(removed))
+            examples = "、".join(f"{row.URL} (與 {row.DuplicateOf} 重複)"
+                                for row in removed.head(3).itertuples())
+            self.log(f"去除 {len(removed)} 篇重複文章：{examples}\n")
+        return df.reset_index(drop=True)
+
+    def segment(self):
+        if not self.use_cache:
+            with self.metrics.timer("segment"):
+                self.df = segment_articles(self.df, workers=self.segment_workers, progress_callback=self.progress)
+            self.metrics.incr("articles.segmented", len(self.df))
+            return
+        # 內文與字典都沒有改變的文章直接沿用上次的斷詞結果
+        with AnalysisCache() as cache:
+            self.metrics.register_collector("analysis_cache", lambda: dict(cache.stats))
+            try:
+                with self.metrics.timer("segment"):
+                    self.df = segment_articles(self.df, workers=self.segment_workers,
+                                               progress_callback=self.progress, cache=cache)
+            finally:
+                self.metrics.unregister_collector("analysis_cache")
+            self.metrics.incr("articles.segmented", len(self.df))
+            self.log(f"斷詞快取：命中 {cache.stats['hits']} 篇，重新分析 {cache.stats['misses']} 篇\n")
+
+    def analyze(self):
+        if not self.use_cache:
+            with self.metrics.timer("analyze"):
+                self.df = analysis(self.df)
+            self.metrics.incr("articles.analyzed", len(self.df))
+            return
+        # 分數累加到每日彙總中，已計入的文章不會重複計算
+        with RollupStore() as store:
+            with self.metrics.timer("analyze"):
+                self.df = analysis(self.df, store=store)
+            self.metrics.incr("articles.analyzed", len(self.df))
+            self._summarize(store)
+
+    def _summarize(self, store):
+        self._log_top_companies(store)
+        self.summary = format_insights(query_insights(store, self.start_date, self.end_date))
+
+    def _log_top_companies(self, store):
+        top = store.top_companies(self.start_date, self.end_date, limit=5)
+        if len(top):
+            summary = "、".join(f"{row.company} ({row.mentions} 篇, 分數 {row.mean_score:+.2f})"
+                               for row in top.itertuples())
+            self.log(f"提及最多的公司：{summary}\n")
+
+    def _run_staged(self):
+        self.log(f"分析日期範圍：從 {self.start_date} 到 {self.end_date}\n")
+        self.log(f"以串流管線執行：{' → '.join(STEPS)}，每批 {self.batch_size} 篇文章\n")
+        self.step_started(0, 1, " → ".join(STEPS))
+        crawl_progress = [1.0 if self.skip_crawl else 0.0]
+
+        def on_crawl_progress(progress, message):
+            # 爬蟲本身的逐篇訊息不轉送，狀態列改為顯示各步驟的統計
+            crawl_progress[0] = progress
+
+        def emit_stored(emit, df):
+            for i in range(0, len(df), self.batch_size):
+                batch = df.iloc[i:i + self.batch_size].reset_index(drop=True)
+                # 從資料庫載入的文章不需要再寫回資料庫
+                batch.attrs['stored'] = True
+                emit(batch)
+
+        def source(emit):
+            if self.skip_crawl:
+                emit_stored(emit, self._load_stored())
+                return
+            if self.incremental:
+                # 新爬到的文章在爬蟲中就已存入本地資料庫，之後的步驟不需要再寫入一次
+                with ArticleStore() as store:
+                    unchanged = run_scraper(self.sitemap_url, self.start_date, self.end_date, on_crawl_progress,
+                                            max_workers=self.max_workers,
+                                            requests_per_second=self.requests_per_second,
+                                            parse_workers=self.parse_workers,
+                                            sink=BatchQueueSink(lambda batch: emit_stored(emit, batch),
+                                                                self.batch_size),
+                                            cancel_event=self.cancel_event, incremental=True, store=store)
+                self.log(f"增量爬蟲：{len(unchanged)} 篇文章沒有變動，直接從本地資料庫載入\n")
+                emit_stored(emit, unchanged)
+                crawl_progress[0] = 1.0
+                return
+            done = self._resume_urls()
+            if done:
+                emit_stored(emit, self._load_resumed(done))
+            run_scraper(self.sitemap_url, self.start_date, self.end_date, on_crawl_progress,
+                        max_workers=self.max_workers, requests_per_second=self.requests_per_second,
+                        parse_workers=self.parse_workers, sink=BatchQueueSink(emit, self.batch_size),
+                        cancel_event=self.cancel_event, skip_urls=done)
+            crawl_progress[0] = 1.0
+
+        def report(snapshot):
+            self.stage_stats(snapshot)
+            parts = []
+            for stats in snapshot:
+                part = f"{stats['stage']} {stats['articles']} 篇 ({stats['articles_per_second']:.1f} 篇/秒"
+                if stats['queue_size']:
+                    part += f", 佇列 {stats['queue_depth']}/{stats['queue_size']}"
+                parts.append(part + ")")
+            self.progress(crawl_progress[0], " | ".join(parts))
+            scraped, done = snapshot[0]['articles'], snapshot[-1]['articles']
+            self.overall_progress(crawl_progress[0] * done / scraped if scraped else 0.0)
+
+        workers = self.segment_workers or os.cpu_count() or 1
+        executor = create_segment_executor(workers) if workers > 1 else None
+        cache = AnalysisCache() if self.use_cache else None
+        store = RollupStore() if self.use_cache else None
+        dedup_index = DedupIndex() if self.dedup else None
+        if cache is not None:
+            self.metrics.register_collector("analysis_cache", lambda: dict(cache.stats))
+
+        saved = [0]
+        metrics = self.metrics
+
+        def clean(batch):
+            if not batch.attrs.get('stored'):
+                saved[0] += self._save(batch)
+            with metrics.timer("clean"):
+                batch = clean_data(batch)
+            metrics.incr("articles.cleaned", len(batch))
+            return batch
+
+        def deduplicate(batch):
+            if self.cancel_event.is_set():
+                return batch.iloc[:0]
+            return self._drop_duplicates(batch, dedup_index)
+
+        def segment(batch):
+            # 被停止後已爬到的文章仍會在前一個步驟存入資料庫，斷詞與分析則略過
+            if self.cancel_event.is_set():
+                return batch.iloc[:0]
+            # 把一批文章再平均分給每個斷詞行程
+            with metrics.timer("segment"):
+                batch = segment_articles(batch, batch_size=max(1, -(-len(batch) // workers)),
+                                         cache=cache, executor=executor)
+            metrics.incr("articles.segmented", len(batch))
+            return batch
+
+        def analyze(batch):
+            if self.cancel_event.is_set():
+                return batch.iloc[:0]
+            with metrics.timer("analyze"):
+                batch = analysis(batch, store=store)
+            metrics.incr("articles.analyzed", len(batch))
+            return batch
+
+        stages = [("數據清理", clean), ("去除重複", deduplicate), ("斷詞標註", segment), ("文本分析", analyze)]
+        if dedup_index is None:
+            stages = [stage for stage in stages if stage[0] != "去除重複"]
+        self.pipeline = StagedPipeline(source, stages, source_name="爬蟲", queue_size=self.queue_size, report=report)
+        try:
+            batches = [batch for batch in self.pipeline.run() if len(batch)]
+            self.df = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+            for stats in self.pipeline.snapshot():
+                self.step_seconds[stats['stage']] = stats['busy_seconds']
+            if not self.skip_crawl and not self.incremental:
+                self.log(f"已將 {saved[0]} 篇文章存入本地資料庫\n")
+            if cache is not None:
+                self.log(f"斷詞快取：命中 {cache.stats['hits']} 篇，重新分析 {cache.stats['misses']} 篇\n")
+            if store is not None:
+                self._summarize(store)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if cache is not None:
+                self.metrics.unregister_collector("analysis_cache")
+                cache.close()
+            if store is not None:
+                store.close()
+            if dedup_index is not None:
+                dedup_index.close()
+        self.log("=" * 100 + "\n")
+        return self.df
+
+
+def _to_list(value):
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
+
+# `write_output` 依副檔名將結果寫成 .csv、.parquet 或 .jsonl（每行一篇文章的 JSON）
+def write_output(df, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(_to_list)
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        df.to_csv(path, index=False)
+    elif extension == ".parquet":
+        df.to_parquet(path, index=False)
+    elif extension == ".jsonl":
+        df.to_json(path, orient="records", lines=True, force_ascii=False, date_format="iso")
+    else:
+        raise ValueError(f"不支援的輸出格式：{extension}，請使用 {'、'.join(OUTPUT_FORMATS)}")
+    return path
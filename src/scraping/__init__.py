@@ -1,21 +1,82 @@
 from .scraper import (
     parse_sitemap,
     scrape_article,
+    fetch_article_html,
     get_article_urls,
+    iter_sitemap_entries,
+    iter_article_urls,
+    ArticleUrlStream,
     flatten_list_recursive,
     process_and_save_articles,
     get_article_urls_in_date,
     run_scraper
 )
+from .crawl_index import CrawlIndex
+from .sitemap_index import SitemapIndex, sitemap_month
+from .fetcher import (
+    TokenBucket,
+    HostRateLimiter,
+    fetch_concurrently
+)
+from .transport import (
+    http_get,
+    cached_get,
+    open_stream,
+    configure_transport,
+    get_transport_stats,
+    close_transport
+)
+from .http_cache import (
+    HttpCache,
+    configure_cache,
+    get_cache
+)
+from .extractor import (
+    extract_article,
+    register_extractor,
+    compare_extractors
+)
+from .sink import (
+    CsvArticleSink,
+    ParquetArticleSink,
+    ArticleDataset,
+    open_sink
+)
 
 __all__ = [
     'parse_sitemap',
     'scrape_article',
+    'fetch_article_html',
     'get_article_urls',
+    'iter_sitemap_entries',
+    'iter_article_urls',
+    'ArticleUrlStream',
     'flatten_list_recursive',
     'process_and_save_articles',
     'get_article_urls_in_date',
-    'run_scraper'
+    'run_scraper',
+    'CrawlIndex',
+    'SitemapIndex',
+    'sitemap_month',
+    'TokenBucket',
+    'HostRateLimiter',
+    'fetch_concurrently',
+    'http_get',
+    'cached_get',
+    'open_stream',
+    'configure_transport',
+    'get_transport_stats',
+    'close_transport',
+    'HttpCache',
+    'configure_cache',
+    'get_cache',
+    'extract_article',
+    'register_extractor',
+    'compare_extractors',
+    'CsvArticleSink',
+    'ParquetArticleSink',
+    'ArticleDataset',
+    'open_sink'
 ]
 
 __version__ = "1.0.0"
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(current_dir, "..", "..", "data", "crawl_index.sqlite3")
+
+
+# `CrawlIndex` 是已爬取文章的持久化索引，記錄每個文章 URL 以及爬取當時 sitemap 中的 `<lastmod>`。
+# 增量模式下，只有索引中沒有的 URL，或 `<lastmod>` 與索引記錄不同（文章被更新過）的 URL 才需要重新爬取。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class CrawlIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scraped ("
+            " url TEXT PRIMARY KEY,"
+            " lastmod TEXT,"
+            " scraped_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM scraped").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lastmod_of(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT lastmod FROM scraped WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    # `filter_changed` 從 `(url, lastmod)` 列表中挑出需要爬取的項目：
+    # 索引中不存在的新文章，或 sitemap 的 lastmod 與上次爬取時不同的文章。
+    # sitemap 沒有提供 lastmod 的文章只要爬過一次就不會再重抓。
+    def filter_changed(self, entries):
+        with self.lock:
+            known = {}
+            cursor = self.conn.cursor()
+            urls = [url for url, _ in entries]
+            # SQLite 對單一查詢的參數數量有上限，因此分批查詢
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for url, lastmod in cursor.execute(
+                        f"SELECT url, lastmod FROM scraped WHERE url IN ({placeholders})", chunk):
+                    known[url] = lastmod
+
+        changed = []
+        for url, lastmod in entries:
+            if url not in known:
+                changed.append((url, lastmod))
+            elif lastmod is not None and lastmod != known[url]:
+                changed.append((url, lastmod))
+        return changed
+
+    # `mark_scraped` 將已成功爬取並寫入資料集的文章記錄到索引中
+    def mark_scraped(self, entries):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO scraped (url, lastmod, scraped_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET lastmod = excluded.lastmod, scraped_at = excluded.scraped_at",
+                [(url, lastmod, now) for url, lastmod in entries],
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,151 @@
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# 找不到欄位時的預設值，`DataCleaner.clean_data` 會將這些值替換成 NA
+TITLE_NOT_FOUND = "標題未找到"
+DATE_NOT_FOUND = "日期未找到"
+AUTHOR_NOT_FOUND = "作者未找到"
+CONTENT_NOT_FOUND = "內容未找到"
+
+
+# `extract_article_bs4` 是原本 `scrape_article` 使用的解析方式：
+# 以 BeautifulSoup 的 html.parser 建立完整的文件樹，再逐一搜尋標題、日期、作者與內文。
+# 它作為沒有安裝 lxml 時的備用方案，以及檢查其他解析器輸出是否一致的基準。
+def extract_article_bs4(html):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title_tag = soup.find('h1', class_='entry-title')
+    title = title_tag.text.strip() if title_tag else TITLE_NOT_FOUND
+
+    def meta_field(label, default):
+        head = soup.find('span', class_='head', string=label)
+        body = head.find_next_sibling('span', class_='body') if head else None
+        return body.text.strip() if body else default
+
+    date = meta_field('發布日期', DATE_NOT_FOUND)
+    author = meta_field('作者', AUTHOR_NOT_FOUND)
+
+    content_div = soup.find('div', class_='indent')
+    content = ' '.join([p.text for p in content_div.find_all('p')]) if content_div else CONTENT_NOT_FOUND
+
+    return {
+        'Title': title,
+        'Date': date,
+        'Author': author,
+        'Content': content
+    }
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 預先編譯的 XPath，與 BeautifulSoup 版本的搜尋條件一一對應：
+# `class_='x'` 對應「class 屬性中包含 x 這個類別」。
+# `string='發布日期'` 比對的是 `.string`：元素只有一個子節點時取該子節點的 `.string`，遞迴到文字為止，
+# 因此 `<span><b>發布日期</b></span>` 也符合，夾著註解的 `<span>發布日期<!-- --></span>` 則不符合。
+# 對應的 XPath 是「自己與所有子孫元素都恰好只有一個子節點（含註解），且文字內容完全相同」。
+if HAS_LXML:
+    from lxml.etree import XPath
+
+    _TITLE_XPATH = XPath(f"(//h1[{_has_class('entry-title')}])[1]")
+    _META_XPATH = XPath(
+        f"(//span[{_has_class('head')} and not(descendant-or-self::*[count(node()) != 1])"
+        f" and string() = $label])[1]"
+        f"/following-sibling::span[{_has_class('body')}][1]"
+    )
+    _CONTENT_XPATH = XPath(f"(//div[{_has_class('indent')}])[1]")
+    _PARAGRAPH_XPATH = XPath(".//p")
+
+
+# `extract_article_lxml` 使用 lxml（libxml2）解析 HTML 並以預先編譯的 XPath 取出欄位。
+# 與 html.parser 相比，建樹與搜尋都在 C 中完成，且每個欄位只搜尋一次，速度快上許多。
+# 回傳的字典與 `extract_article_bs4` 相同。
+def extract_article_lxml(html):
+    if isinstance(html, bytes):
+        # 先嘗試以 UTF-8 解碼（technews.tw 使用 UTF-8），失敗時交給 lxml 依 meta charset 自行判斷
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    if not html or not html.strip():
+        return extract_article_bs4(html or '')
+
+    tree = lxml.html.document_fromstring(html)
+
+    titles = _TITLE_XPATH(tree)
+    title = titles[0].text_content().strip() if titles else TITLE_NOT_FOUND
+
+    def meta_field(label, default):
+        bodies = _META_XPATH(tree, label=label)
+        return bodies[0].text_content().strip() if bodies else default
+
+    date = meta_field('發布日期', DATE_NOT_FOUND)
+    author = meta_field('作者', AUTHOR_NOT_FOUND)
+
+    content_divs = _CONTENT_XPATH(tree)
+    if content_divs:
+        content = ' '.join([p.text_content() for p in _PARAGRAPH_XPATH(content_divs[0])])
+    else:
+        content = CONTENT_NOT_FOUND
+
+    return {
+        'Title': title,
+        'Date': date,
+        'Author': author,
+        'Content': content
+    }
+
+
+EXTRACTORS = {
+    'bs4': extract_article_bs4,
+}
+if HAS_LXML:
+    EXTRACTORS['lxml'] = extract_article_lxml
+
+DEFAULT_BACKEND = 'lxml' if HAS_LXML else 'bs4'
+
+
+# `register_extractor` 註冊新的解析器，解析器接收 HTML（bytes 或 str）並回傳 Title/Date/Author/Content 字典
+def register_extractor(name, func):
+    EXTRACTORS[name] = func
+
+
+# `extract_article` 依指定的解析器從 HTML 取出文章欄位，`backend` 為 None 時使用最快的可用解析器。
+#
+# 參數:
+# `html`: 文章頁面的 HTML（bytes 或 str）。
+# `backend`: 解析器名稱，例如 'lxml' 或 'bs4'。
+#
+# 回傳:
+# `dictionary`: 包含 `Title`、`Date`、`Author` 與 `Content` 的字典。
+def extract_article(html, backend=None):
+    backend = backend or DEFAULT_BACKEND
+    try:
+        extractor = EXTRACTORS[backend]
+    except KeyError:
+        raise ValueError(f"未知的解析器：{backend}，可用的解析器有 {', '.join(EXTRACTORS)}")
+    return extractor(html)
+
+
+# `compare_extractors` 以每個已註冊的解析器解析同一份 HTML，回傳與基準解析器（bs4）不一致的欄位。
+# 用於確認新的解析器在已存檔的 technews.tw 頁面上與原本的結果完全相同。
+#
+# 回傳:
+# `dictionary`: `{解析器名稱: {欄位: (基準值, 該解析器的值)}}`，全部一致時為空字典。
+def compare_extractors(html, reference='bs4'):
+    expected = EXTRACTORS[reference](html)
+    mismatches = {}
+    for name, extractor in EXTRACTORS.items():
+        if name == reference:
+            continue
+        actual = extractor(html)
+        diff = {key: (expected[key], actual.get(key)) for key in expected if expected[key] != actual.get(key)}
+        if diff:
+            mismatches[name] = diff
+    return mismatches
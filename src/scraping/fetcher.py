@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from metrics import get_metrics
+
+
+# `TokenBucket` 是一個執行緒安全的令牌桶限速器。
+# 桶子以每秒 `rate` 個令牌的速度補充，最多存放 `capacity` 個令牌。
+# 每次請求前呼叫 `acquire()` 取走一個令牌，若桶子是空的就等待到下一個令牌補充為止。
+# 等待時不持有鎖，所以多個執行緒可以同時排隊，但整體請求速率不會超過 `rate`。
+#
+# 參數:
+# `rate`: 每秒允許的請求數，例如 1.0 代表每秒一個請求。
+# `capacity`: 桶子容量，也就是允許的瞬間突發請求數。
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate 必須大於 0")
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# `HostRateLimiter` 為每個主機 (host) 各自維護一個 `TokenBucket`。
+# 這樣對 technews.tw 的禮貌間隔不會因為並行而被打破，同時其他主機也不會互相拖慢。
+class HostRateLimiter:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        self.bucket_for(url).acquire()
+
+
+# `ordered_imap` 與 `executor.map` 類似，但只保留一個固定大小的「視窗」在執行中。
+# 它會從 `iterable` 逐一取出項目提交給 `executor`，並依照輸入順序回傳結果。
+# 因為最多只有 `window` 個未完成的工作，所以輸入可以是很長甚至是惰性的產生器，記憶體也不會隨之增長。
+#
+# 參數:
+# `executor`: ThreadPoolExecutor 或 ProcessPoolExecutor。
+# `func`: 對每個項目執行的函數。
+# `iterable`: 輸入項目，可以是列表或產生器。
+# `window`: 同時在執行中的最大工作數。
+# `stop`: `threading.Event`，被設定後不再從 `iterable` 取出新項目，尚未開始執行的工作會被取消，
+#         已在執行中的工作仍會完成並回傳結果，因此呼叫端拿到的結果都是完整的。
+#
+# 回傳:
+# 依輸入順序產生 `(item, result)` 的產生器。
+def ordered_imap(executor, func, iterable, window, stop=None):
+    pending = deque()
+    iterator = iter(iterable)
+    exhausted = False
+
+    try:
+        while True:
+            if stop is not None and stop.is_set() and not exhausted:
+                exhausted = True
+                pending = deque((item, future) for item, future in pending if not future.cancel())
+
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((item, executor.submit(func, item)))
+
+            if not pending:
+                return
+
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        # 呼叫端提早結束迭代（例如例外）時，取消還沒開始的工作，執行緒池關閉時就不必等它們
+        for _, future in pending:
+            future.cancel()
+
+
+# `fetch_concurrently` 以有界的執行緒池並行抓取 URL，並對每個主機套用令牌桶限速。
+# 每個執行緒在真正發出請求前都會先向限速器取得令牌，
+# 因此整體請求速率和原本的逐一抓取加 `time.sleep(1)` 一樣禮貌，只是網路等待時間可以互相重疊。
+# 結果會依照 URL 的原始順序產生，方便呼叫端依序回報進度。
+#
+# 參數:
+# `urls`: 要抓取的 URL，可以是列表或產生器。
+# `fetch_func`: 接收一個 URL 並回傳結果的函數，例如 `scrape_article`。
+# `max_workers`: 並行的執行緒數量。
+# `requests_per_second`: 每個主機每秒允許的請求數。
+# `burst`: 每個主機允許的瞬間突發請求數。
+# `cancel_event`: `threading.Event`，被設定後停止抓取新的 URL（見 `ordered_imap` 的 `stop`）。
+#
+# 回傳:
+# 依原始順序產生 `(url, result)` 的產生器。
+def fetch_concurrently(urls, fetch_func, max_workers=4, requests_per_second=1.0, burst=1, cancel_event=None):
+    limiter = HostRateLimiter(requests_per_second, burst)
+    metrics = get_metrics()
+
+    def limited_fetch(url):
+        # 等待令牌的時間另外記錄，與網路本身的耗時區分
+        with metrics.timer("fetch.rate_limit"):
+            limiter.acquire(url)
+        return fetch_func(url)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # 視窗大小取執行緒數的兩倍，確保執行緒在等待結果被取走時仍有工作可做
+        yield from ordered_imap(executor, limited_fetch, urls, window=max_workers * 2, stop=cancel_event)
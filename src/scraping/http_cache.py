@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from .sitemap_index import month_closed_at, sitemap_month
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(current_dir, "..", "..", "data", "http_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+# 快取有效期限（秒）：
+# 在月份結束之後才取得的該月 sitemap 與文章內容不會再變動，視為不可變並給予很長的 TTL。
+# 其餘內容（根 sitemap、月份還沒結束時取得的 sitemap 與文章）每次都以條件式請求重新驗證（TTL 為 0），
+# 伺服器沒有變動時只會回傳 304，不需要重新下載內容。
+IMMUTABLE_TTL = 365 * 24 * 3600
+REVALIDATE_TTL = 0
+
+ARTICLE_DATE_PATTERN = re.compile(r'^https?://[^/]+/(\d{4})/(\d{2})/\d{2}/')
+
+# 只保留解析回應所需的標頭，內容在存入快取前已經解壓縮，因此不保留 Content-Encoding
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+# `ttl_for_url` 根據 URL 與快取內容的取得時間判斷快取內容的有效期限。
+# 月份 sitemap (sitemap-pt-post-YYYY-MM.xml) 與文章網址 (/YYYY/MM/DD/...) 都帶有月份資訊，
+# 只有在該月份結束（見 `sitemap_index.month_closed_at`）之後才取得的內容視為不可變；
+# 月份還沒結束時取得的 sitemap 可能缺少之後才發布的文章，必須重新驗證。
+# `lastmod` 是呼叫端已知的最後修改時間（例如 sitemap 中的 `<lastmod>`），快取內容在這之前取得時也必須重新驗證。
+#
+# 參數:
+# `url`: 快取的網址。
+# `fetched_at`: 快取內容的取得時間 (time.time())。
+# `lastmod`: ISO 8601 格式的最後修改時間，None 代表未知。
+def ttl_for_url(url, fetched_at, lastmod=None):
+    modified_at = lastmod_timestamp(lastmod)
+    if modified_at is not None and fetched_at < modified_at:
+        return REVALIDATE_TTL
+
+    month = sitemap_month(url)
+    if month is None:
+        match = ARTICLE_DATE_PATTERN.match(url)
+        month = (int(match.group(1)), int(match.group(2))) if match else None
+    if month is not None and fetched_at >= month_closed_at(*month):
+        return IMMUTABLE_TTL
+    return REVALIDATE_TTL
+
+
+# `lastmod_timestamp` 將 sitemap 的 `<lastmod>` 轉成時間戳記，沒有或無法解析時回傳 None
+def lastmod_timestamp(lastmod):
+    if not lastmod:
+        return None
+    try:
+        return datetime.fromisoformat(lastmod.strip().replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+# `HttpCache` 是以 URL 雜湊為鍵的磁碟快取。
+# 每個項目由兩個檔案組成：`<sha256>.body` 存放（已解壓縮的）回應內容，
+# `<sha256>.json` 存放 URL、ETag、Last-Modified、取得時間等中繼資料。
+# 中繼資料檔的修改時間同時作為 LRU 的最後存取時間，快取總大小超過 `max_bytes` 時，
+# 會從最久未使用的項目開始刪除。
+#
+# 參數:
+# `cache_dir`: 快取目錄。
+# `max_bytes`: 快取內容的總大小上限。
+class HttpCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        directory = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(directory, key + ".json"), os.path.join(directory, key + ".body")
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    # 取得 URL 的中繼資料，若不存在或內容檔遺失則回傳 None
+    def lookup(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not os.path.exists(body_path):
+            return None
+        return meta
+
+    def is_fresh(self, meta, ttl):
+        return ttl > 0 and time.time() - meta.get("fetched_at", 0) < ttl
+
+    def body_path(self, url):
+        return self._paths(url)[1]
+
+    def read_body(self, url):
+        meta_path, body_path = self._paths(url)
+        with open(body_path, "rb") as f:
+            body = f.read()
+        self._touch(meta_path)
+        return body
+
+    def _touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _write_meta(self, meta_path, meta):
+        directory = os.path.dirname(meta_path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    # 存入一個新的回應，內容與中繼資料都以「寫入暫存檔再 os.replace」的方式原子性更新
+    def store(self, url, content, headers):
+        return self.store_stream(url, [content], headers)
+
+    # `store_stream` 與 `store` 相同，但內容以區塊逐一寫入磁碟，大型 sitemap 不必整份載入記憶體
+    def store_stream(self, url, chunks, headers):
+        meta_path, body_path = self._paths(url)
+        directory = os.path.dirname(meta_path)
+        os.makedirs(directory, exist_ok=True)
+
+        previous_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, body_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        meta = {
+            "url": url,
+            "fetched_at": time.time(),
+            "size": size,
+            "headers": {name: headers[name] for name in KEPT_HEADERS if name in headers},
+        }
+        self._write_meta(meta_path, meta)
+        self.count("stored")
+        self._account(size - previous_size)
+        return meta
+
+    # 伺服器回傳 304 時，更新取得時間（以及伺服器可能更新的驗證標頭）
+    def refresh(self, url, meta, headers):
+        meta_path, _ = self._paths(url)
+        meta = dict(meta)
+        meta["fetched_at"] = time.time()
+        for name in ("ETag", "Last-Modified"):
+            if name in headers:
+                meta["headers"][name] = headers[name]
+        self._write_meta(meta_path, meta)
+        return meta
+
+    def _account(self, delta):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += delta
+            over_limit = self.total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _scan_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(root, name)
+                body_path = meta_path[:-len(".json")] + ".body"
+                try:
+                    entries.append((os.path.getmtime(meta_path), os.path.getsize(body_path),
+                                    meta_path, body_path))
+                except OSError:
+                    continue
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _, _ in self._scan_entries())
+
+    # `evict` 依最後存取時間由舊到新刪除項目，直到總大小降到上限的 90% 以下，避免每次寫入都觸發清理
+    def evict(self):
+        with self.lock:
+            entries = sorted(self._scan_entries())
+            total = sum(size for _, size, _, _ in entries)
+            target = self.max_bytes * 0.9
+            for _, size, meta_path, body_path in entries:
+                if total <= target:
+                    break
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+                self.stats["evicted"] += 1
+            self.total_bytes = total
+
+    def clear(self):
+        with self.lock:
+            for _, _, meta_path, body_path in self._scan_entries():
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self.total_bytes = 0
+
+
+_cache = None
+_cache_enabled = True
+_cache_lock = threading.Lock()
+
+
+# `configure_cache` 設定共用的 HTTP 快取，`enabled=False` 可完全停用快取（例如需要強制重新抓取時）。
+def configure_cache(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+    global _cache, _cache_enabled
+    with _cache_lock:
+        _cache_enabled = enabled
+        _cache = HttpCache(cache_dir, max_bytes) if enabled else None
+
+
+# `get_cache` 回傳共用的 HTTP 快取，第一次呼叫時才建立快取目錄
+def get_cache():
+    global _cache
+    if not _cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None and _cache_enabled:
+                _cache = HttpCache()
+    return _cache
@@ -1,64 +1,91 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
 import random
 from datetime import datetime
 import xml.etree.ElementTree as ET
-import re
+import os
+import itertools
 from tqdm import tqdm
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from .fetcher import fetch_concurrently, ordered_imap
+from .extractor import extract_article
+from .transport import cached_get, open_stream, get_transport_stats
+from .http_cache import get_cache
+from .crawl_index import CrawlIndex, DEFAULT_INDEX_PATH
+from .sitemap_index import SitemapIndex, DEFAULT_SITEMAP_INDEX_PATH, ROOT_MAX_AGE, sitemap_month, month_closed_at
+from .sink import open_sink
+from metrics import get_metrics
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+
+# `iter_sitemap_entries` 以串流方式解析 sitemap，逐一產生 `(kind, loc, lastmod)`。
+# `kind` 為 'sitemap'（sitemap index 中的子 sitemap）或 'url'（一般 sitemap 中的文章）。
+# 回應內容先以區塊方式寫入磁碟（快取），再用 `ET.iterparse` 逐個元素解析，
+# 每處理完一個元素就將它從樹中清除，因此不論 sitemap 多大，記憶體用量都維持固定。
+# 取得失敗或解析錯誤時會印出錯誤訊息並停止產生。
+# `lastmod` 是這個 sitemap 在上層 sitemap 中的 `<lastmod>`，快取的內容比它舊時會重新驗證。
+def iter_sitemap_entries(url, lastmod=None):
+    print(f"正在獲取 sitemap: {url}")
+    with open_stream(url, lastmod=lastmod) as (status_code, stream):
+        if status_code != 200:
+            print(f"獲取 sitemap 失敗。狀態碼：{status_code}")
+            return
+
+        root = None
+        try:
+            for event, elem in ET.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    continue
+
+                if elem.tag in (SITEMAP_NS + 'sitemap', SITEMAP_NS + 'url'):
+                    loc = elem.find(SITEMAP_NS + 'loc')
+                    lastmod = elem.find(SITEMAP_NS + 'lastmod')
+                    if loc is not None:
+                        kind = 'sitemap' if elem.tag == SITEMAP_NS + 'sitemap' else 'url'
+                        yield kind, loc.text, lastmod.text if lastmod is not None else None
+                    # 已處理的元素不再需要，清除以維持記憶體用量固定
+                    root.clear()
+        except ET.ParseError as e:
+            print(f"解析 XML 時出錯：{e}")
+
 
 # 函數 parse_sitemap 用於解析 sitemap 並取出在特定日期範圍內的 sitemap URL。
 # 這個函數有三個輸入: url，start_date，和 end_date。
-# 函數首先試著從提供的 url 取得內容，並檢測返回的狀態碼。如果狀態碼不是200的話，函數會返回一個空的列表。
-# 如果狀態碼確認為200，函數會解析內容為 XML 格式，然後從中提取 sitemap 標籤的 loc 文本。每一個成功提取的 loc 文本都會被加入到 urls 列表中。
-# 接下來，函數將按照輸入的日期範圍產生出對應的 url 匹配模式，並用這個模式從 urls 列表中過濾出相對應的 url。
+# 函數以 `iter_sitemap_entries` 串流解析 sitemap，如果取得失敗或解析錯誤，函數會返回一個空的列表。
+# 函數會從中提取 sitemap 標籤的 loc 文本，並以 `sitemap_month` 取出每個子 sitemap 的月份，建立 `{(year, month): url}` 的字典。
+# 接下來，函數依輸入的日期範圍逐月查字典，取出相對應的 url；同一個月份只會回傳一次。
 # 最後，函數會回傳這些匹配的 url。
 def parse_sitemap(url, start_date, end_date):
-    print(f"正在獲取 sitemap: {url}")
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f"獲取 sitemap 失敗。狀態碼：{response.status_code}")
-        return []
-
-    print("成功獲取 sitemap")
-    print(f"Response content type: {response.headers.get('Content-Type')}")
-    print("Response content (first 200 characters):")
-    print(response.text[:200])
-
-    try:
-        root = ET.fromstring(response.content)
-    except ET.ParseError as e:
-        print(f"解析 XML 時出錯：{e}")
-        return []
-
-    namespaces = {
-        'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9'
-    }
-
     urls = []
-    for sitemap in root.findall('sm:sitemap', namespaces):
-        loc = sitemap.find('sm:loc', namespaces)
-        if loc is not None:
-            urls.append(loc.text)
+    page_urls = []
+    for kind, loc, _ in iter_sitemap_entries(url):
+        if kind == 'sitemap':
+            urls.append(loc)
+        else:
+            page_urls.append(loc)
 
     if not urls:
         print("No sub-sitemaps found, trying to parse as a regular sitemap")
-        for url in root.findall('sm:url', namespaces):
-            loc = url.find('sm:loc', namespaces)
-            if loc is not None:
-                urls.append(loc.text)
+        urls = page_urls
 
-    # 使用正则表达式匹配当前月份的sitemap URL
-    date_range = pd.date_range(start=start_date, end=end_date, freq='ME')
-    print( date_range )
-    # 构建正则表达式模式列表，用于匹配特定日期范围内的sitemap URL
-    patterns = [ re.compile(rf'https://technews.tw/sitemap-pt-post-{date.year}-{date.month:02d}\.xml') for date in date_range ]
-
-    # 根据模式匹配sitemap URL
-    matched_sitemap_urls = [ url for url in urls for pattern in patterns if pattern.match(url) ]
+    # 每個 URL 只比對一次，同一個月份出現多次時以最後一筆為準
+    month_urls = {}
+    for sitemap_url in urls:
+        month = sitemap_month(sitemap_url)
+        if month is not None:
+            month_urls[month] = sitemap_url
 
+    # 日期範圍內的每個月份直接查字典
+    date_range = pd.date_range(start=start_date, end=end_date, freq='ME')
+    matched_sitemap_urls = [month_urls[(date.year, date.month)] for date in date_range
+                            if (date.year, date.month) in month_urls]
 
     print(f"找到 {len(urls)} 個 URL")
     print(f"回傳 target Date 的 URL {matched_sitemap_urls}")
@@ -66,71 +93,67 @@ def parse_sitemap(url, start_date, end_date):
 
 
 # `scrape_article` 函數用於從給定的網址中抓取文章的信息。
-# 它從給定的網址獲取 HTML 內容，使用 BeautifulSoup 解析它，並提取有關文章的關鍵信息，如 `title`（標題），`date`（日期），`author`（作者）和`content`（內容）。
+# 它從給定的網址獲取 HTML 內容，交給 `extract_article` 解析（預設使用 lxml，未安裝時使用 BeautifulSoup），
+# 並提取有關文章的關鍵信息，如 `title`（標題），`date`（日期），`author`（作者）和`content`（內容）。
 # 若無法找到任何信息，則此函數會將預設值，如 "標題未找到", "日期未找到", "作者未找到", "內容未找到" 分別添加到相關的字段中。
 # 此函數最後會將收集到的字段以字典形式回傳。
 #
 # 參數:
 # `url`: 需要抓取文章的網址連結
+# `backend`: 解析器名稱，None 代表使用預設解析器。
+# `lastmod`: 文章在 sitemap 中的 `<lastmod>`，快取的頁面比它舊時會重新驗證，不會拿到修改前的內容。
 #
 # 回傳:
 # `dictionary`: 包含了在網址中找到的文章的 `title`（標題），`Date`（日期），`Author`（作者）和`Content`（內容）的字典。
-def scrape_article(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+def scrape_article(url, backend=None, lastmod=None):
+    html = fetch_article_html(url, lastmod=lastmod)
+    with get_metrics().timer("parse"):
+        return extract_article(html, backend=backend)
+
 
-    title = soup.find('h1', class_='entry-title').text.strip() if soup.find('h1', class_='entry-title') else "標題未找到"
+# `fetch_article_html` 只負責下載文章頁面並回傳原始 HTML (bytes)，解析可以另外交給行程池處理
+def fetch_article_html(url, lastmod=None):
+    response = cached_get(url, lastmod=lastmod)
+    return response.content
 
-    date_span = soup.find('span', class_='head', string='發布日期')
-    date = date_span.find_next_sibling('span', class_='body').text.strip() if date_span else "日期未找到"
 
-    author_span = soup.find('span', class_='head', string='作者')
-    author = author_span.find_next_sibling('span', class_='body').text.strip() if author_span else "作者未找到"
+def _extract_fetched(item):
+    _, html = item
+    return extract_article(html)
 
-    content_div = soup.find('div', class_='indent')
-    content = ' '.join([p.text for p in content_div.find_all('p')]) if content_div else "內容未找到"
 
-    return {
-        'Title': title,
-        'Date': date,
-        'Author': author,
-        'Content': content
-    }
+# `_parse_in_processes` 將抓取執行緒下載好的 HTML 交給行程池解析，依原始順序產生 `(url, article)`。
+# 解析是 CPU 密集的工作，放在獨立的行程中可以避免與抓取執行緒搶 GIL。
+# 解析在其他行程中進行，metrics 的 `parse` 計時器不包含這種情況。
+def _parse_in_processes(fetched, parse_workers):
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        # 停止時抓取端不再產生新的頁面，已下載的頁面仍會解析完，這裡不需要另外檢查
+        for (url, _), article in ordered_imap(pool, _extract_fetched, fetched, window=parse_workers * 2):
+            yield url, article
 
 
 # `get_article_urls` 函數用於抓取網頁地圖中每篇文章的 URL。
-# 此函數首先嘗試發起對網頁地圖網址的 GET 請求。如果此請求的 HTTP 狀態碼不為200，則回傳一個 leeg list。
-# 如果 HTTP 狀態碼為200，則函數將嘗試從回應內容中解析 XML。
-# 如果解析失敗，則回傳一個 leeg list。
-# 如果解析成功，則函數將尋找並取出網頁地圖 URL，並加入到 URLs 列表。
+# 此函數以 `iter_sitemap_entries` 串流解析網頁地圖，取得失敗或解析錯誤時回傳一個空的（或不完整的）列表。
+# 如果解析成功，則函數將取出每篇文章的 URL，並加入到 URLs 列表。
 # 最後函數回傳剛才抓取的所有文章的 URL。
-def get_article_urls(sitemap_url):
-    print(f"正在獲取 sitemap: {sitemap_url}")
-    response = requests.get(sitemap_url)
-    if response.status_code != 200:
-        print(f"獲取 sitemap 失敗。狀態碼：{response.status_code}")
-        return []
-
-    try:
-        root = ET.fromstring(response.content)
-    except ET.ParseError as e:
-        print(f"解析 XML 時出錯：{e}")
-        return []
-
-    namespaces = {
-        'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9'
-    }
-
-    urls = []
-    for url in root.findall('sm:url', namespaces):
-        loc = url.find('sm:loc', namespaces)
-        if loc is not None:
-            urls.append(loc.text)
-
+# 若 `with_lastmod` 為 True，則回傳 `(url, lastmod)` 的列表，lastmod 為 sitemap 中的 `<lastmod>`（可能為 None），
+# 供增量模式判斷文章是否有更新。
+# 需要逐一處理而不想建立完整列表時，請改用 `iter_article_urls`。
+def get_article_urls(sitemap_url, with_lastmod=False):
+    urls = list(iter_article_urls(sitemap_url, with_lastmod=with_lastmod))
     print(f"找到 {len(urls)} 個文章 URL")
     return urls
 
 
+# `iter_article_urls` 是 `get_article_urls` 的產生器版本，邊解析邊產生文章 URL。
+# `sitemap_lastmod` 是月份 sitemap 本身的 `<lastmod>`（見 `iter_sitemap_entries`）。
+def iter_article_urls(sitemap_url, with_lastmod=False, sitemap_lastmod=None):
+    for kind, loc, lastmod in iter_sitemap_entries(sitemap_url, lastmod=sitemap_lastmod):
+        if kind != 'url':
+            continue
+        yield (loc, lastmod) if with_lastmod else loc
+
+
 # 定義 flatten_list_recursive 函數，用於將傳入的嵌套列表進行扁平化
 # 嵌套列表是指列表內還包含列表的結構，例如 [1, 2, [3, 4, [5, 6]]]
 # 扁平化是指將嵌套結構打平，變為一維結構，例如將上述列表扁平化會得到 [1, 2, 3, 4, 5, 6]
@@ -147,52 +170,129 @@ def flatten_list_recursive(nested_list):
             flattened.append(item)
     return flattened
 
-# `process_and_save_articles` 函數將從每個 URL 提取的文章内容存儲到 CSV 檔案中。
+# `process_and_save_articles` 函數將從每個 URL 提取的文章内容整理成 DataFrame，或分批寫入磁碟。
 # 由於我們可能有大量的 URL，為了防止我們一次性送出大量的請求並可能造成被伺服器封鎖，
-# 我們在此使用了批量處理的策略。批量處理的含義是我們每次只處理一小部分 URL，
-# 這通常也可提高處理效率。
+# 我們使用有界的執行緒池並行抓取，並以每個主機各自的令牌桶限制請求速率。
+# 這樣整體的請求頻率與原本「每篇文章暫停一秒」相同，但網路等待時間可以互相重疊。
 #
 # 參數:
-# `flattened_urls`: 包含所有我們欲爬取的文章 URL 的列表。
-# `batch_size`: 每個批次處理的 URL 數量。
+# `flattened_urls`: 包含所有我們欲爬取的文章 URL 的列表，也可以是 `ArticleUrlStream` 等惰性的可迭代物件，
+#                   此時 sitemap 還在下載解析時就會開始爬取文章。
+# `batch_size`: 每個批次處理的 URL 數量，每完成一個批次才會併入結果列表。
+# `progress_callback`: 進度回報函數，接收 `(progress, message)`，會依照 URL 原始順序被呼叫。
+# `max_workers`: 並行抓取的執行緒數量。
+# `requests_per_second`: 對同一個主機每秒允許的請求數，預設 1.0 與原本的 `time.sleep(1)` 相同。
+# `burst`: 對同一個主機允許的瞬間突發請求數。
+# `limit`: 最多爬取的文章數，None 代表全部爬取（方便除錯時只抓少量文章）。
+# `parse_workers`: 解析 HTML 的行程數，0 代表在抓取執行緒中直接解析。
+# `sink`: 文章寫入器（見 `sink.py`）。指定時文章會分批寫入磁碟而不保留在記憶體中，
+#         已寫入的 URL 會被跳過，因此當掉後以同一個 sink 重新執行即可從檢查點繼續。
+# `cancel_event`: `threading.Event`，被設定後不再抓取新的文章；已在下載中的文章會完成並照常寫入，
+#                 函數回傳到目前為止的結果，而不是丟棄已爬到的文章。
+# `skip_urls`: 不需要爬取的 URL，例如上次被停止的執行中已經存下來的文章。
+# `lastmods`: `{url: lastmod}`，文章在 sitemap 中的 `<lastmod>`；HTTP 快取中比它舊的頁面會重新驗證。
 #
-# 此函數首先創建一個CSV檔案，並寫入表頭。
-# 然後，它將預備處理的 URL 列表分成多個批次，每個批次的大小由參數決定。
-# 對於每個批次，我們都會對其中的每個 URL 進行處理，並使用我們在之前定義的 `scrape_article` 函數提取文章內容。
-# 提取的文章資訊將被添加到列表中，之後將被寫入到 CSV 檔案中。
-# 在每次請求之間，我們會暫停一秒以避免對伺服器產生過大的壓力。
-# 最後，所有的文章資訊都將被寫入到 CSV 檔案中。
-#
-# 請注意這個函數並未有回傳值，它的結果將直接儲存到硬碟中。
-def process_and_save_articles(flattened_urls, batch_size=10, progress_callback=None):
+# 回傳:
+# `DataFrame`: 包含所有文章資訊的 DataFrame；指定 `sink` 時回傳惰性的 `ArticleDataset`。
+def process_and_save_articles(flattened_urls, batch_size=10, progress_callback=None,
+                              max_workers=4, requests_per_second=1.0, burst=1, limit=None, parse_workers=0,
+                              sink=None, cancel_event=None, skip_urls=None, lastmods=None):
     all_articles = []
-    total = len(flattened_urls)
-    total = 10
-    for i in range(0, total, batch_size):
-        batch = flattened_urls[i:i + batch_size]
-        articles = []
-
-        for j, url in enumerate(batch):
-            article = scrape_article(url)
+    skip = set(skip_urls or ())
+    if sink is not None:
+        written = sink.written_urls()
+        if written:
+            print(f"從檢查點繼續：跳過已寫入的 {len(written)} 篇文章")
+            skip |= written
+    if skip:
+        flattened_urls = _exclude_urls(flattened_urls, skip)
+    if limit is not None:
+        flattened_urls = itertools.islice(flattened_urls, limit) if not hasattr(flattened_urls, '__len__') \
+            else flattened_urls[:limit]
+    total = len(flattened_urls) if hasattr(flattened_urls, '__len__') else None
+    estimate_total = getattr(flattened_urls, 'estimated_total', None)
+
+    articles = []
+    scraped = 0
+    metrics = get_metrics()
+    fetch_html, scrape = fetch_article_html, scrape_article
+    if lastmods is not None:
+        fetch_html, scrape = _with_lastmod(fetch_html, lastmods), _with_lastmod(scrape, lastmods)
+    if parse_workers:
+        fetched = fetch_concurrently(flattened_urls, fetch_html, max_workers=max_workers,
+                                     requests_per_second=requests_per_second, burst=burst,
+                                     cancel_event=cancel_event)
+        results = _parse_in_processes(fetched, parse_workers)
+    else:
+        results = fetch_concurrently(flattened_urls, scrape, max_workers=max_workers,
+                                     requests_per_second=requests_per_second, burst=burst,
+                                     cancel_event=cancel_event)
+    for index, (url, article) in enumerate(results):
+        article['URL'] = url
+        scraped = index + 1
+        metrics.incr("articles.scraped")
+        if sink is not None:
+            sink.write(article)
+        else:
             articles.append(article)
 
-            # 報告進度
-            if progress_callback:
-                overall_progress = (i + j + 1) / total
-                message = f"已爬取: {article['Date']} : {article['Title']}"
-                # print( message )
-                progress_callback(overall_progress, message)
+        # 報告進度
+        if progress_callback:
+            # 串流模式下總數未知，改用 `estimated_total` 的估計值
+            expected = total if total is not None else (estimate_total() if estimate_total else None)
+            overall_progress = (index + 1) / max(expected or 0, index + 1)
+            message = f"已爬取: {article['Date']} : {article['Title']}"
+            # print( message )
+            progress_callback(overall_progress, message)
 
-            time.sleep(1)  # 添加延遲以避免過快請求
+        if len(articles) >= batch_size:
+            all_articles.extend(articles)
+            articles = []
 
-        all_articles.extend(articles)
+    all_articles.extend(articles)
+    if cancel_event is not None and cancel_event.is_set():
+        print(f"爬蟲已停止，保留已爬取的 {scraped} 篇文章")
 
+    if sink is not None:
+        sink.close()
+        return sink.dataset()
 
     # 將所有文章轉換為 DataFrame
     df = pd.DataFrame(all_articles)
+    return _ensure_columns(df)
+
+
+# `_with_lastmod` 讓只接收 URL 的抓取函數帶上該文章的 `<lastmod>`
+def _with_lastmod(fetch, lastmods):
+    return lambda url: fetch(url, lastmod=lastmods.get(url))
+
+
+# `_FilteredUrls` 從惰性的 URL 串流中排除已處理過的 URL，並保留串流的總數估計
+class _FilteredUrls:
+    def __init__(self, urls, skip):
+        self.urls = urls
+        self.skip = skip
+
+    def __iter__(self):
+        return (url for url in self.urls if url not in self.skip)
+
+    def estimated_total(self):
+        estimate = getattr(self.urls, 'estimated_total', None)
+        total = estimate() if estimate else None
+        return max(total - len(self.skip), 0) if total is not None else None
+
+
+def _exclude_urls(urls, skip):
+    if hasattr(urls, '__len__'):
+        return [url for url in urls if url not in skip]
+    return _FilteredUrls(urls, skip)
+
 
+# `_ensure_columns` 確保 DataFrame 包含後續分析步驟所需的欄位
+def _ensure_columns(df):
     # 確保 DataFrame 包含所需的列
-    required_columns = ['Title', 'Date', 'Author', 'Content', 'StockContent', 'Score']
+    # 沒有爬到任何文章時 DataFrame 沒有任何欄位，URL 也要補上，合併資料集時才能以 URL 比對
+    required_columns = ['Title', 'Date', 'Author', 'Content', 'URL', 'StockContent', 'Score']
     for col in required_columns:
         if col not in df.columns:
             df[col] = None  # 如果缺少某列，添加一個空列
@@ -203,23 +303,264 @@ def process_and_save_articles(flattened_urls, batch_size=10, progress_callback=N
 
     return df
 
-def get_article_urls_in_date(sitemap_url,start_date, end_date):
-    start_date = start_date # 设置开始日期
-    today = end_date
-    today = pd.to_datetime(today)
-    end_date = today + pd.offsets.MonthEnd(0)
-    urls = parse_sitemap(sitemap_url, start_date, end_date)
-
-    pt = []
-
-    for url in urls:
-        pt.append(get_article_urls(url))
-
-    all_pt_urls = flatten_list_recursive(pt)
+# `_month_sitemaps` 取得日期範圍內（結束日期延伸到該月月底）每個月份的 sitemap URL
+def _month_sitemaps(sitemap_url, start_date, end_date):
+    end_date = pd.to_datetime(end_date) + pd.offsets.MonthEnd(0)
+    return parse_sitemap(sitemap_url, start_date, end_date)
+
+
+def _months_in_range(start_date, end_date):
+    periods = pd.period_range(pd.Timestamp(start_date).to_period('M'), pd.Timestamp(end_date).to_period('M'), freq='M')
+    return [(period.year, period.month) for period in periods]
+
+
+# `_indexed_month_sitemaps` 以 `SitemapIndex` 取得日期範圍內每個月份的 `(year, month, entry)`。
+# 只有在需要時才重新取得根 sitemap：從未取得過、超過 `ROOT_MAX_AGE`，或範圍內有索引中沒有的月份，
+# 且該月份在上次取得根 sitemap 時還沒結束（可能是之後才出現的新月份）。
+# 根 sitemap 取得失敗時沿用索引中既有的月份。
+def _indexed_month_sitemaps(index, sitemap_url, start_date, end_date):
+    wanted = _months_in_range(start_date, end_date)
+    known = index.months(sitemap_url)
+    fetched_at = index.root_fetched_at(sitemap_url)
+    now = time.time()
+    if (fetched_at is None or now - fetched_at > ROOT_MAX_AGE
+            or any(month not in known and fetched_at < month_closed_at(*month) for month in wanted)):
+        entries = [(loc, lastmod) for kind, loc, lastmod in iter_sitemap_entries(sitemap_url) if kind == 'sitemap']
+        if entries:
+            print(f"sitemap 索引已更新：{index.update_root(sitemap_url, entries)} 個月份")
+            known = index.months(sitemap_url)
+    months = [(year, month, known[(year, month)]) for year, month in wanted if (year, month) in known]
+    print(f"回傳 target Date 的 URL {[entry['sitemap_url'] for _, _, entry in months]}")
+    return months
+
+
+# `ArticleUrlStream` 是日期範圍內文章 URL 的惰性串流。
+# 迭代時才逐一下載並串流解析每個月份的 sitemap，邊解析邊產生文章 URL，
+# 因此第一個月份的 sitemap 一解析出 URL，爬蟲就能開始抓文章，不必等所有 sitemap 下載完；
+# 記憶體中也不會保留完整的 URL 列表。
+# 有 `index_path` 時以 `SitemapIndex` 記錄每個月份的 sitemap 與文章 URL：已結束且沒有變動的月份直接從索引讀取，
+# 通常只有當月的 sitemap 需要重新下載。
+# 由於總數要到最後才知道，`estimated_total()` 會依已解析月份的平均文章數估計總數，供進度列使用。
+#
+# 參數:
+# `with_lastmod`: 為 True 時產生 `(url, lastmod)`，否則只產生 url。
+# `index_path`: sitemap 索引的路徑；None 代表不使用索引，每次都重新下載解析所有 sitemap。
+class ArticleUrlStream:
+    def __init__(self, sitemap_url, start_date, end_date, with_lastmod=False,
+                 index_path=DEFAULT_SITEMAP_INDEX_PATH):
+        self.sitemap_url = sitemap_url
+        self.start_date = start_date
+        self.end_date = end_date
+        self.with_lastmod = with_lastmod
+        self.index_path = index_path
+        self.discovered = 0
+        self.months_total = None
+        self.months_done = 0
+        self.months_cached = 0
+        self.done_count = 0
+
+    def __iter__(self):
+        if self.index_path is None:
+            sitemap_urls = _month_sitemaps(self.sitemap_url, self.start_date, self.end_date)
+            self.months_total = len(sitemap_urls)
+            for sitemap_url in sitemap_urls:
+                yield from self._emit(iter_article_urls(sitemap_url, with_lastmod=True))
+                self._month_done()
+            return
+
+        end_date = pd.to_datetime(self.end_date) + pd.offsets.MonthEnd(0)
+        with SitemapIndex(self.index_path) as index:
+            months = _indexed_month_sitemaps(index, self.sitemap_url, self.start_date, end_date)
+            self.months_total = len(months)
+            for year, month, entry in months:
+                if index.is_fresh(year, month, entry):
+                    self.months_cached += 1
+                    yield from self._emit(index.article_urls(entry['sitemap_url']))
+                else:
+                    started = time.time()
+                    entries = []
+                    for item in iter_article_urls(entry['sitemap_url'], with_lastmod=True,
+                                                  sitemap_lastmod=entry['lastmod']):
+                        entries.append(item)
+                        yield from self._emit((item,))
+                    # 取得失敗時 `iter_sitemap_entries` 不會產生任何項目，空的列表不記錄，下次重新取得
+                    if entries:
+                        index.store_month(self.sitemap_url, year, month, entries, started, entry['lastmod'])
+                self._month_done()
+        if self.months_cached:
+            print(f"sitemap 索引：{self.months_cached}/{self.months_total} 個月份直接從索引讀取")
+
+    def _emit(self, entries):
+        for url, lastmod in entries:
+            self.discovered += 1
+            yield (url, lastmod) if self.with_lastmod else url
+
+    def _month_done(self):
+        self.months_done += 1
+        self.done_count = self.discovered
+
+    def estimated_total(self):
+        if self.months_total is None:
+            return None
+        remaining = self.months_total - self.months_done
+        if remaining <= 0:
+            return self.discovered
+        current = self.discovered - self.done_count
+        average = self.done_count / self.months_done if self.months_done else current
+        return self.done_count + max(current, average) + average * (remaining - 1)
+
+
+# `get_article_urls_in_date` 取得日期範圍內所有月份 sitemap 中的文章 URL。
+# `with_lastmod` 為 True 時回傳 `(url, lastmod)` 的列表。
+# 這個函數會建立完整的列表；大範圍的爬取請直接迭代 `ArticleUrlStream`。
+def get_article_urls_in_date(sitemap_url,start_date, end_date, with_lastmod=False,
+                             index_path=DEFAULT_SITEMAP_INDEX_PATH):
+    all_pt_urls = list(ArticleUrlStream(sitemap_url, start_date, end_date, with_lastmod=with_lastmod,
+                                        index_path=index_path))
 
     print( len(all_pt_urls))
     return all_pt_urls
 
-def run_scraper(sitemap_url, start_date, end_date, progress_callback=None):
-    all_pt_urls = get_article_urls_in_date(sitemap_url, start_date, end_date)
-    return process_and_save_articles(all_pt_urls, batch_size=10, progress_callback=progress_callback)
\ No newline at end of file
+# `run_scraper` 是爬蟲的入口：先取得日期範圍內的所有文章 URL，再並行爬取文章內容。
+#
+# 參數:
+# `max_workers`: 並行抓取的執行緒數量。
+# `requests_per_second`: 對同一個主機每秒允許的請求數。
+# `burst`: 對同一個主機允許的瞬間突發請求數。
+# `parse_workers`: 解析 HTML 的行程數，0 代表在抓取執行緒中直接解析。
+# `incremental`: 是否使用增量模式。增量模式只爬取索引中沒有的新文章，或 sitemap `<lastmod>` 有變動的文章，
+#                爬到的文章寫入 `store` 後才記錄到索引；沒有變動的文章直接從 `store` 取出。
+#                沒有 `sink` 時回傳日期範圍內的所有文章；有 `sink` 時新爬到的文章交給 `sink`，
+#                回傳的是沒有重新爬取、從 `store` 取出的文章。
+# `index_path`: 已爬取文章索引的路徑。
+# `store`: 增量模式下保存文章的資料庫（提供 `upsert_articles` 與 `query_urls`，例如 `database.ArticleStore`）。
+# `output_path`: 非增量模式下，將文章分批寫入的檔案（.csv）或 Parquet 資料集目錄。
+#                指定時記憶體用量不會隨日期範圍增長，當掉後以相同路徑重新執行會從檢查點繼續。
+# `lazy`: 搭配 `output_path` 使用，為 True 時回傳惰性的 `ArticleDataset` 而不是完整的 DataFrame。
+# `sink`: 自訂的寫入器（提供 `written_urls`、`write`、`close` 與 `dataset`），例如串流管線中把文章
+#         交給下一個階段的寫入器；指定時取代 `output_path`，回傳 `sink.dataset()`。
+# `cancel_event`: `threading.Event`，被設定後停止爬取並回傳已爬到的文章（見 `process_and_save_articles`）。
+# `skip_urls`: 不需要爬取的 URL。
+# `sitemap_index_path`: sitemap 索引的路徑（見 `ArticleUrlStream`）；None 代表每次都重新下載解析所有 sitemap。
+def run_scraper(sitemap_url, start_date, end_date, progress_callback=None,
+                max_workers=4, requests_per_second=1.0, burst=1, parse_workers=0,
+                incremental=False, index_path=DEFAULT_INDEX_PATH, store=None,
+                output_path=None, lazy=False, sink=None, cancel_event=None, skip_urls=None,
+                sitemap_index_path=DEFAULT_SITEMAP_INDEX_PATH):
+    if incremental and store is None:
+        raise ValueError("增量模式需要指定保存文章的 store")
+    if incremental and output_path:
+        raise ValueError("增量模式會寫入 store，不能同時指定 output_path")
+
+    if incremental:
+        df = _run_incremental(sitemap_url, start_date, end_date, progress_callback,
+                              max_workers, requests_per_second, burst, parse_workers, index_path, store,
+                              sink, cancel_event, skip_urls, sitemap_index_path)
+    else:
+        url_stream = ArticleUrlStream(sitemap_url, start_date, end_date, index_path=sitemap_index_path)
+        if sink is None and output_path:
+            sink = open_sink(output_path)
+        df = process_and_save_articles(url_stream, batch_size=10, progress_callback=progress_callback,
+                                       max_workers=max_workers, requests_per_second=requests_per_second,
+                                       burst=burst, parse_workers=parse_workers, sink=sink,
+                                       cancel_event=cancel_event, skip_urls=skip_urls)
+        if output_path and not lazy:
+            df = _ensure_columns(df.to_dataframe())
+
+    stats = get_transport_stats()
+    print(f"連線重用統計：請求 {stats['requests']} 次，新建連線 {stats['connections']} 次，"
+          f"重用比例 {stats['reuse_ratio']:.1%}")
+    cache = get_cache()
+    if cache is not None:
+        print(f"HTTP 快取統計：命中 {cache.stats['hits']} 次，304 重新驗證 {cache.stats['revalidated']} 次，"
+              f"未命中 {cache.stats['misses']} 次")
+    return df
+
+
+# `_PendingUrls` 以索引過濾 `ArticleUrlStream`，只產生新文章或有更新的文章 URL。
+# 過濾以批次查詢索引，並記錄範圍內所有 URL，以及待爬取文章在 sitemap 中的 `<lastmod>`，供更新索引使用。
+class _PendingUrls:
+    def __init__(self, stream, index, skip=None, chunk_size=200):
+        self.stream = stream
+        self.index = index
+        self.skip = set(skip or ())
+        self.chunk_size = chunk_size
+        self.in_range = set()
+        self.lastmods = {}
+
+    def __iter__(self):
+        iterator = iter(self.stream)
+        while True:
+            chunk = list(itertools.islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            self.in_range.update(url for url, _ in chunk)
+            for url, lastmod in self.index.filter_changed([entry for entry in chunk if entry[0] not in self.skip]):
+                self.lastmods[url] = lastmod
+                yield url
+
+    def estimated_total(self):
+        total = self.stream.estimated_total()
+        if not total or not self.in_range:
+            return None
+        return total * len(self.lastmods) / len(self.in_range)
+
+
+# `_IndexedStoreSink` 是增量模式的寫入器：每批文章先寫入 `store`，成功後才記錄到爬取索引，
+# 中途失敗或被停止時，索引不會記錄實際上沒有存下來的文章。有 `sink` 時再把文章交給它。
+class _IndexedStoreSink:
+    def __init__(self, store, index, lastmods, sink=None, batch_size=10):
+        self.store = store
+        self.index = index
+        self.lastmods = lastmods
+        self.sink = sink
+        self.batch_size = batch_size
+        self.buffer = []
+        self.saved = 0
+
+    def written_urls(self):
+        return self.sink.written_urls() if self.sink is not None else set()
+
+    def write(self, article):
+        self.buffer.append(article)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        self.saved += self.store.upsert_articles(_ensure_columns(pd.DataFrame(batch)))
+        self.index.mark_scraped([(article['URL'], self.lastmods.get(article['URL'])) for article in batch])
+        if self.sink is not None:
+            for article in batch:
+                self.sink.write(article)
+
+    def close(self):
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+
+    def dataset(self):
+        return None
+
+
+def _run_incremental(sitemap_url, start_date, end_date, progress_callback,
+                     max_workers, requests_per_second, burst, parse_workers, index_path, store,
+                     sink=None, cancel_event=None, skip_urls=None, sitemap_index_path=DEFAULT_SITEMAP_INDEX_PATH):
+    stream = ArticleUrlStream(sitemap_url, start_date, end_date, with_lastmod=True, index_path=sitemap_index_path)
+
+    with CrawlIndex(index_path) as index:
+        pending = _PendingUrls(stream, index, skip_urls)
+        writer = _IndexedStoreSink(store, index, pending.lastmods, sink)
+        process_and_save_articles(pending, batch_size=10,
+                                  progress_callback=progress_callback, max_workers=max_workers,
+                                  requests_per_second=requests_per_second, burst=burst,
+                                  parse_workers=parse_workers, sink=writer, cancel_event=cancel_event,
+                                  lastmods=pending.lastmods)
+    print(f"增量模式：範圍內共 {len(pending.in_range)} 篇文章，其中 {len(pending.lastmods)} 篇為新文章或已更新，"
+          f"已寫入 {writer.saved} 篇")
+
+    if sink is not None:
+        return _ensure_columns(store.query_urls(pending.in_range - set(pending.lastmods)))
+    return _ensure_columns(store.query_urls(pending.in_range))
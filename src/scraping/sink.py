@@ -0,0 +1,209 @@
+import glob
+import io
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+SINK_COLUMNS = ['Title', 'Date', 'Author', 'Content', 'URL']
+
+
+def _fsync_write(path, data, mode):
+    with open(path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# `CsvArticleSink` 將文章分批附加寫入 CSV 檔案。
+# 每累積 `chunk_size` 篇文章就寫入一次並呼叫 fsync，接著在旁邊的 `.checkpoint.json` 記錄目前完整寫入的檔案長度。
+# 程式中途當掉時，CSV 最後可能留下寫到一半的資料列；下次開啟同一個檔案時，
+# 會先把檔案截斷到檢查點記錄的長度，再從已寫入的 URL 之後繼續爬取。
+#
+# 參數:
+# `path`: CSV 檔案路徑。
+# `chunk_size`: 每次寫入的文章數。
+class CsvArticleSink:
+    def __init__(self, path, chunk_size=100):
+        self.path = os.path.abspath(path)
+        self.checkpoint_path = self.path + ".checkpoint.json"
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.written = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._recover()
+
+    def _recover(self):
+        if not os.path.exists(self.path):
+            return
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if os.path.getsize(self.path) > checkpoint["size"]:
+                print(f"偵測到未完成的寫入，將 {self.path} 還原到上次的檢查點")
+                with open(self.path, "r+b") as f:
+                    f.truncate(checkpoint["size"])
+
+    def _save_checkpoint(self):
+        checkpoint = {"size": os.path.getsize(self.path)}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def written_urls(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return set()
+        urls = pd.read_csv(self.path, usecols=['URL'])['URL']
+        return set(urls.dropna())
+
+    def write(self, article):
+        self.buffer.append(article)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        df = pd.DataFrame(self.buffer).reindex(columns=SINK_COLUMNS)
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        text = io.StringIO()
+        df.to_csv(text, index=False, header=write_header)
+        _fsync_write(self.path, text.getvalue().encode("utf-8"), "ab")
+        self._save_checkpoint()
+        self.written += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    def dataset(self):
+        return ArticleDataset(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# `ParquetArticleSink` 將每批文章寫成一個獨立的 Parquet 檔 (`part-00000.parquet`, `part-00001.parquet`, ...)，
+# 組成一個只會附加的欄式資料集。每個分片先寫入暫存檔再改名，因此當掉時不會留下損壞的分片，
+# 已完成的分片本身就是檢查點。需要安裝 pyarrow。
+#
+# 參數:
+# `directory`: 資料集目錄。
+# `chunk_size`: 每個分片的文章數。
+class ParquetArticleSink:
+    def __init__(self, directory, chunk_size=500):
+        if not HAS_PYARROW:
+            raise ImportError("ParquetArticleSink 需要安裝 pyarrow")
+        self.directory = os.path.abspath(directory)
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.written = 0
+        os.makedirs(self.directory, exist_ok=True)
+        for tmp_path in glob.glob(os.path.join(self.directory, "*.tmp")):
+            os.remove(tmp_path)
+        self.next_part = len(self._parts())
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    def written_urls(self):
+        if not self._parts():
+            return set()
+        table = ds.dataset(self._parts(), format="parquet").to_table(columns=['URL'])
+        return set(url for url in table.column('URL').to_pylist() if url is not None)
+
+    def write(self, article):
+        self.buffer.append(article)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        df = pd.DataFrame(self.buffer).reindex(columns=SINK_COLUMNS).astype(object)
+        table = pa.Table.from_pandas(df, preserve_index=False,
+                                     schema=pa.schema([(col, pa.string()) for col in SINK_COLUMNS]))
+        part_path = os.path.join(self.directory, f"part-{self.next_part:05d}.parquet")
+        tmp_path = part_path + ".tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, part_path)
+        self.next_part += 1
+        self.written += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    def dataset(self):
+        return ArticleDataset(self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# `open_sink` 依路徑選擇寫入器：副檔名為 .csv 時使用 `CsvArticleSink`，其餘視為 Parquet 資料集目錄。
+def open_sink(path, chunk_size=None):
+    if path.lower().endswith(".csv"):
+        return CsvArticleSink(path, chunk_size or 100)
+    return ParquetArticleSink(path, chunk_size or 500)
+
+
+# `ArticleDataset` 是已寫入磁碟的文章資料集的惰性代理，建立時不會讀取任何資料。
+# 可以一次載入成 DataFrame，也可以分批迭代，避免大範圍的資料一次佔滿記憶體。
+#
+# 參數:
+# `path`: CSV 檔案或 Parquet 資料集目錄。
+class ArticleDataset:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.is_csv = self.path.lower().endswith(".csv")
+
+    def __repr__(self):
+        return f"<ArticleDataset path={self.path!r}>"
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def exists(self):
+        return os.path.exists(self.path) if self.is_csv else bool(self._parts())
+
+    def __len__(self):
+        if not self.exists():
+            return 0
+        if self.is_csv:
+            return sum(len(chunk) for chunk in pd.read_csv(self.path, usecols=['URL'], chunksize=50000))
+        return sum(pq.ParquetFile(part).metadata.num_rows for part in self._parts())
+
+    # 分批產生 DataFrame，每批最多 `chunksize` 篇文章
+    def iter_chunks(self, chunksize=1000, columns=None):
+        if not self.exists():
+            return
+        if self.is_csv:
+            yield from pd.read_csv(self.path, chunksize=chunksize, usecols=columns)
+            return
+        dataset = ds.dataset(self._parts(), format="parquet")
+        for batch in dataset.to_batches(columns=columns, batch_size=chunksize):
+            yield batch.to_pandas()
+
+    def to_dataframe(self, columns=None):
+        if not self.exists():
+            return pd.DataFrame(columns=columns or SINK_COLUMNS)
+        if self.is_csv:
+            return pd.read_csv(self.path, usecols=columns)
+        return ds.dataset(self._parts(), format="parquet").to_table(columns=columns).to_pandas()
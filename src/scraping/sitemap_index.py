@@ -0,0 +1,164 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SITEMAP_INDEX_PATH = os.path.join(current_dir, "..", "..", "data", "sitemap_index.sqlite3")
+
+# 每個月份的文章 sitemap，例如 https://technews.tw/sitemap-pt-post-2024-06.xml
+# 只比對路徑而不寫死主機名稱，離線測試用的本地伺服器也能匹配
+SITEMAP_MONTH_PATTERN = re.compile(r'/sitemap-pt-post-(\d{4})-(\d{2})\.xml$')
+
+# 根 sitemap 超過這個秒數沒有重新取得時，重新比對各月份的 <lastmod>，找出文章被修改過的舊月份
+ROOT_MAX_AGE = 24 * 3600
+
+# 月份結束後多久才視為不會再新增文章；多留一天，避免時區差異讓月底最後幾篇文章被漏掉
+CLOSED_MONTH_GRACE = pd.Timedelta(days=1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS months (
+    root TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    sitemap_url TEXT NOT NULL,
+    lastmod TEXT,
+    fetched_lastmod TEXT,
+    fetched_at REAL,
+    PRIMARY KEY (root, year, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS urls (
+    sitemap_url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    lastmod TEXT,
+    PRIMARY KEY (sitemap_url, position)
+) WITHOUT ROWID;
+"""
+
+
+# `sitemap_month` 從月份 sitemap 的 URL 取出 `(year, month)`，不是月份 sitemap 時回傳 None
+def sitemap_month(url):
+    match = SITEMAP_MONTH_PATTERN.search(url or "")
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+# `month_closed_at` 回傳月份結束（再加上 `CLOSED_MONTH_GRACE`）的時間戳記；在這之後取得的 sitemap 已包含該月所有文章
+def month_closed_at(year, month):
+    return (pd.Timestamp(year=year, month=month, day=1) + pd.offsets.MonthBegin(1) + CLOSED_MONTH_GRACE).timestamp()
+
+
+# `SitemapIndex` 是 sitemap 的持久化索引，記錄根 sitemap 中每個月份 `(year, month)` 的子 sitemap URL，
+# 以及已取得月份的文章 URL 列表，讓日期範圍的查詢變成字典查找，不必每次都重新下載解析。
+# 每個月份各自判斷是否需要重新取得（`is_fresh`）：
+# - 月份結束後才取得的列表不會再新增文章，之後直接沿用；當月（或月底前取得的）列表每次都重新取得。
+# - 根 sitemap 中該月份的 `<lastmod>` 與取得列表時不同（舊文章被修改過）時重新取得。
+#
+# 參數:
+# `path`: SQLite 檔案路徑。
+class SitemapIndex:
+    def __init__(self, path=DEFAULT_SITEMAP_INDEX_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def root_fetched_at(self, root):
+        with self.lock:
+            row = self.conn.execute("SELECT fetched_at FROM roots WHERE root = ?", (root,)).fetchone()
+        return row[0] if row else None
+
+    # `months` 回傳根 sitemap 的月份索引 `{(year, month): {sitemap_url, lastmod, fetched_lastmod, fetched_at}}`
+    def months(self, root):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT year, month, sitemap_url, lastmod, fetched_lastmod, fetched_at FROM months WHERE root = ?",
+                (root,)).fetchall()
+        return {(year, month): {'sitemap_url': sitemap_url, 'lastmod': lastmod,
+                                'fetched_lastmod': fetched_lastmod, 'fetched_at': fetched_at}
+                for year, month, sitemap_url, lastmod, fetched_lastmod, fetched_at in rows}
+
+    # `update_root` 以重新取得的根 sitemap 更新月份索引，回傳索引到的月份數。
+    # 同一個月份出現多次時以最後一筆為準；子 sitemap URL 改變的月份會捨棄已取得的文章列表。
+    #
+    # 參數:
+    # `entries`: 根 sitemap 中子 sitemap 的 `(url, lastmod)`。
+    def update_root(self, root, entries):
+        months = {}
+        for url, lastmod in entries:
+            month = sitemap_month(url)
+            if month is not None:
+                months[month] = (url, lastmod)
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO months (root, year, month, sitemap_url, lastmod) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(root, year, month) DO UPDATE SET sitemap_url = excluded.sitemap_url, "
+                    "lastmod = excluded.lastmod, "
+                    "fetched_at = CASE WHEN months.sitemap_url = excluded.sitemap_url THEN months.fetched_at END",
+                    [(root, year, month, url, lastmod) for (year, month), (url, lastmod) in months.items()],
+                )
+                self.conn.execute("INSERT OR REPLACE INTO roots (root, fetched_at) VALUES (?, ?)",
+                                  (root, time.time()))
+        return len(months)
+
+    # `is_fresh` 判斷月份已取得的文章列表是否可以直接沿用
+    @staticmethod
+    def is_fresh(year, month, entry):
+        if entry['fetched_at'] is None:
+            return False
+        if entry['lastmod'] is not None and entry['lastmod'] != entry['fetched_lastmod']:
+            return False
+        return entry['fetched_at'] >= month_closed_at(year, month)
+
+    # `article_urls` 回傳月份 sitemap 中的 `(url, lastmod)`，順序與 sitemap 相同
+    def article_urls(self, sitemap_url):
+        with self.lock:
+            return self.conn.execute("SELECT url, lastmod FROM urls WHERE sitemap_url = ? ORDER BY position",
+                                     (sitemap_url,)).fetchall()
+
+    # `store_month` 以單一交易取代月份的文章列表。
+    #
+    # 參數:
+    # `entries`: 月份 sitemap 中的 `(url, lastmod)`。
+    # `fetched_at`: 開始取得 sitemap 的時間，用於判斷取得時月份是否已經結束。
+    # `fetched_lastmod`: 取得時根 sitemap 中該月份的 `<lastmod>`。
+    def store_month(self, root, year, month, entries, fetched_at, fetched_lastmod):
+        with self.lock:
+            with self.conn:
+                row = self.conn.execute("SELECT sitemap_url FROM months WHERE root = ? AND year = ? AND month = ?",
+                                        (root, year, month)).fetchone()
+                if row is None:
+                    return
+                sitemap_url = row[0]
+                self.conn.execute("DELETE FROM urls WHERE sitemap_url = ?", (sitemap_url,))
+                self.conn.executemany(
+                    "INSERT INTO urls (sitemap_url, position, url, lastmod) VALUES (?, ?, ?, ?)",
+                    [(sitemap_url, position, url, lastmod) for position, (url, lastmod) in enumerate(entries)],
+                )
+                self.conn.execute(
+                    "UPDATE months SET fetched_at = ?, fetched_lastmod = ? WHERE root = ? AND year = ? AND month = ?",
+                    (fetched_at, fetched_lastmod, root, year, month))
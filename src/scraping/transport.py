@@ -0,0 +1,291 @@
+import contextlib
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+from metrics import get_metrics
+from .http_cache import get_cache, ttl_for_url
+
+try:
+    import brotli  # noqa: F401  urllib3 只有在安裝 brotli 時才能解碼 br
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "TechNews-AnalysisSystem/1.0 (+https://technews.tw)",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+# 預設傳輸設定：
+# `pool_connections`: 要快取連線池的主機數量。
+# `pool_maxsize`: 每個主機最多保留的 keep-alive 連線數，應不小於爬蟲的並行執行緒數。
+# `timeout`: (連線逾時, 讀取逾時) 秒數。
+# `retries`: 遇到 429/5xx 或連線錯誤時的最大重試次數。
+# `backoff_factor`: 指數退避的基數，第 n 次重試前等待 backoff_factor * 2^(n-1) 秒。
+DEFAULT_CONFIG = {
+    "pool_connections": 4,
+    "pool_maxsize": 16,
+    "timeout": (5, 30),
+    "retries": 3,
+    "backoff_factor": 1.0,
+}
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_config = dict(DEFAULT_CONFIG)
+_session = None
+_session_lock = threading.Lock()
+
+
+# `build_session` 建立一個帶有連線池、壓縮協商與重試策略的 `requests.Session`。
+# 重試只針對冪等的 GET/HEAD，並且會遵守伺服器回傳的 Retry-After 標頭。
+# 重試用盡時不會拋出例外，而是回傳最後一次的回應，讓呼叫端照原本的方式檢查狀態碼。
+def build_session(pool_connections=4, pool_maxsize=16, retries=3, backoff_factor=1.0, **_):
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                          max_retries=retry, pool_block=False)
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# `configure_transport` 更新共用傳輸層的設定，並在下次請求時以新設定重建 session。
+# 例如 `configure_transport(pool_maxsize=32, timeout=(3, 20))`。
+def configure_transport(**options):
+    global _session
+    unknown = set(options) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"未知的傳輸設定：{', '.join(sorted(unknown))}")
+
+    with _session_lock:
+        _config.update(options)
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+# `get_session` 回傳整個爬蟲共用的 session。
+# `requests.Session` 的連線池本身是執行緒安全的，所以並行抓取的執行緒可以共用同一個 session，
+# 並重複使用已建立好的 TCP + TLS 連線。
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(**_config)
+    return _session
+
+
+# `http_get` 是 `parse_sitemap`、`get_article_urls` 與 `scrape_article` 共用的 GET 函數。
+# 它使用共用的 session，並在呼叫端沒有指定時套用預設逾時。
+# 每個請求的耗時分成兩段記錄到 metrics：`fetch.response` 是送出請求到收到回應標頭的時間
+# （新連線時包含 DNS、TCP 與 TLS 握手，requests 無法再細分，握手次數見 `transport` 的 `connections`），
+# `fetch.download` 是下載內容的時間；串流請求的內容由呼叫端讀取，只記錄第一段。
+def http_get(url, **kwargs):
+    kwargs.setdefault("timeout", _config["timeout"])
+    metrics = get_metrics()
+    started = time.perf_counter()
+    response = get_session().get(url, **kwargs)
+    total = time.perf_counter() - started
+    waited = min(response.elapsed.total_seconds(), total)
+    metrics.add_time("fetch.response", waited)
+    metrics.incr("fetch.requests")
+    if not kwargs.get("stream"):
+        metrics.add_time("fetch.download", total - waited)
+        metrics.incr("fetch.bytes", len(response.content))
+    return response
+
+
+def _counted_chunks(chunks):
+    metrics = get_metrics()
+    for chunk in chunks:
+        metrics.incr("fetch.bytes", len(chunk))
+        yield chunk
+
+
+# `_response_from_cache` 以快取內容組出一個 `requests.Response`，
+# 讓呼叫端可以和真正的網路回應一樣使用 `status_code`、`content`、`text` 與 `headers`。
+def _response_from_cache(cache, url, meta):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = cache.read_body(url)
+    response.from_cache = True
+    return response
+
+
+# `cached_get` 在 `http_get` 之上加入磁碟快取與條件式請求：
+# 1. 快取內容仍在有效期限內（例如在月份結束後才取得的該月 sitemap 與文章）時，直接回傳快取，不發出任何請求。
+# 2. 否則帶上 If-None-Match / If-Modified-Since 重新驗證，伺服器回傳 304 時沿用快取內容。
+# 3. 伺服器回傳 200 時，將新內容與 ETag / Last-Modified 存入快取。
+#
+# 參數:
+# `url`: 要抓取的網址。
+# `ttl`: 快取有效秒數，None 代表依照 `ttl_for_url` 的規則決定。
+# `lastmod`: 已知的最後修改時間（sitemap 的 `<lastmod>`），快取內容比它舊時一定會重新驗證。
+def cached_get(url, ttl=None, lastmod=None, **kwargs):
+    cache = get_cache()
+    if cache is None:
+        return http_get(url, **kwargs)
+
+    meta = cache.lookup(url)
+    if _is_fresh(cache, url, meta, ttl, lastmod):
+        cache.count("hits")
+        return _response_from_cache(cache, url, meta)
+
+    headers = _conditional_headers(meta, kwargs.pop("headers", None))
+    response = http_get(url, headers=headers, **kwargs)
+    if response.status_code == 304 and meta is not None:
+        cache.count("revalidated")
+        meta = cache.refresh(url, meta, response.headers)
+        return _response_from_cache(cache, url, meta)
+
+    cache.count("misses")
+    if response.status_code == 200:
+        cache.store(url, response.content, response.headers)
+    return response
+
+
+def _is_fresh(cache, url, meta, ttl, lastmod):
+    if meta is None:
+        return False
+    if ttl is None:
+        ttl = ttl_for_url(url, meta.get("fetched_at", 0), lastmod)
+    return cache.is_fresh(meta, ttl)
+
+
+# `_conditional_headers` 依快取的中繼資料產生 If-None-Match / If-Modified-Since 標頭
+def _conditional_headers(meta, headers=None):
+    headers = dict(headers or {})
+    if meta is not None:
+        validators = meta.get("headers", {})
+        if "ETag" in validators:
+            headers["If-None-Match"] = validators["ETag"]
+        if "Last-Modified" in validators:
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+
+# `open_stream` 以串流方式取得 URL 的內容，回傳 `(status_code, 檔案物件)`，供 `iterparse` 等逐步解析使用。
+# 回應內容以區塊方式直接寫入磁碟（有快取時寫入快取，否則寫入暫存檔），再從磁碟逐步讀取，
+# 因此不論 sitemap 多大，記憶體用量都維持固定；而且下載速度不受下游解析與爬取速度影響，
+# 不會因為長時間佔用連線而被伺服器中斷。
+# 狀態碼不是 200 時，檔案物件為 None。`ttl` 與 `lastmod` 的意義與 `cached_get` 相同。
+#
+# 用法:
+# with open_stream(url) as (status, stream):
+#     ...
+@contextlib.contextmanager
+def open_stream(url, ttl=None, lastmod=None, chunk_size=64 * 1024, **kwargs):
+    cache = get_cache()
+    meta = cache.lookup(url) if cache is not None else None
+
+    if _is_fresh(cache, url, meta, ttl, lastmod):
+        cache.count("hits")
+        with open(cache.body_path(url), "rb") as stream:
+            yield 200, stream
+        return
+
+    headers = _conditional_headers(meta, kwargs.pop("headers", None))
+    with http_get(url, headers=headers, stream=True, **kwargs) as response:
+        if response.status_code == 304 and meta is not None:
+            cache.count("revalidated")
+            cache.refresh(url, meta, response.headers)
+            with open(cache.body_path(url), "rb") as stream:
+                yield 200, stream
+            return
+
+        if cache is not None:
+            cache.count("misses")
+        if response.status_code != 200:
+            yield response.status_code, None
+            return
+
+        chunks = _counted_chunks(response.iter_content(chunk_size=chunk_size))
+        if cache is not None:
+            cache.store_stream(url, chunks, response.headers)
+            with open(cache.body_path(url), "rb") as stream:
+                yield 200, stream
+        else:
+            with tempfile.TemporaryFile() as stream:
+                for chunk in chunks:
+                    stream.write(chunk)
+                stream.seek(0)
+                yield 200, stream
+
+
+# `get_transport_stats` 回傳連線重用的統計數據，用於驗證 keep-alive 省下的握手次數。
+# 資料來自 urllib3 每個連線池的計數器：
+# `requests`: 透過連線池送出的請求總數（包含重試）。
+# `connections`: 實際新建立的 TCP 連線數，也就是 TCP + TLS 握手的次數。
+# `reused`: 重複使用既有連線的請求數。
+# `reuse_ratio`: 重複使用連線的請求比例。
+def get_transport_stats():
+    stats = {"hosts": {}, "requests": 0, "connections": 0}
+    session = _session
+    if session is None:
+        stats.update(reused=0, reuse_ratio=0.0)
+        return stats
+
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}"
+            host_stats = stats["hosts"].setdefault(host, {"requests": 0, "connections": 0})
+            host_stats["requests"] += pool.num_requests
+            host_stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    stats["reuse_ratio"] = stats["reused"] / stats["requests"] if stats["requests"] else 0.0
+    return stats
+
+
+def _cache_stats():
+    cache = get_cache()
+    return dict(cache.stats) if cache is not None else {}
+
+
+# 連線重用與 HTTP 快取的統計已經由各自的物件記錄，snapshot 時直接讀取；這兩項是整個程式執行期間的累計值
+get_metrics().register_collector("transport", get_transport_stats)
+get_metrics().register_collector("http_cache", _cache_stats)
+
+
+# `close_transport` 關閉共用 session 並釋放所有保留中的連線。
+def close_transport():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -0,0 +1,230 @@
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+user_dict_path = os.path.join(current_dir, "stock_dict.txt")
+alias_path = os.path.join(current_dir, "stock_aliases.txt")
+
+# 只由英數字組成的詞（股票代號、英文名稱）必須是完整的詞才算命中，避免 "2330" 命中 "123305"
+ASCII_WORD = re.compile(r'[0-9A-Za-z]+')
+
+# 一次命中：`start`/`end` 是在原文中的位置（`text[start:end] == surface`），`company` 是正式名稱
+Mention = namedtuple('Mention', ['start', 'end', 'surface', 'company'])
+
+
+def _read_words(path, tags):
+    words = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] in tags:
+                words.append(parts[0])
+    return words
+
+
+def _read_aliases(path):
+    aliases = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            company, *names = line.split()
+            for name in names:
+                aliases[name] = company
+    return aliases
+
+
+# 純 Python 的 Aho-Corasick 自動機，沒有安裝 pyahocorasick 時使用。
+# `iter` 的介面與 `ahocorasick.Automaton.iter` 相同：產生 `(結束位置, 值)`，結束位置包含在詞內。
+class _Automaton:
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+
+    def add_word(self, word, value):
+        state = 0
+        for ch in word:
+            next_state = self.goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][ch] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = next_state
+        self.output[state] = self.output[state] + (value,)
+
+    def make_automaton(self):
+        # 以廣度優先建立失敗連結，並把失敗連結上的輸出合併進來，掃描時不必再沿著連結尋找
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, next_state in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and ch not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(ch, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+                queue.append(next_state)
+
+    def iter(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for value in output[state]:
+                yield i, value
+
+
+# `CompanyMatcher` 以 Aho-Corasick 自動機一次比對所有公司名稱、別名與股票代號。
+# 自動機只在建立時編譯一次，每篇文章只需從頭到尾掃描一遍，不必做斷詞與詞性標註。
+# 重疊的命中採最左最長原則，例如 "日月光投控" 不會再另外算成 "日月光"。
+# 有安裝 pyahocorasick 時使用其 C 實作，否則使用純 Python 版本，兩者結果相同。
+#
+# 參數:
+# `patterns`: `{要比對的詞: 正式名稱}`。
+class CompanyMatcher:
+    def __init__(self, patterns):
+        self.patterns = list(patterns.items())
+        self.needs_boundary = [bool(ASCII_WORD.fullmatch(surface)) for surface, _ in self.patterns]
+        self.automaton = ahocorasick.Automaton() if HAS_AHOCORASICK else _Automaton()
+        for index, (surface, _) in enumerate(self.patterns):
+            self.automaton.add_word(surface, index)
+        if self.patterns:
+            self.automaton.make_automaton()
+
+    def __len__(self):
+        return len(self.patterns)
+
+    # `from_dictionary` 由 stock_dict.txt 中指定詞性的詞與別名檔建立比對器
+    #
+    # 參數:
+    # `dict_path`: jieba 格式的自訂字典（詞 詞頻 詞性）。
+    # `alias_path`: 別名檔，每行是「正式名稱 別名1 別名2 ...」；None 或檔案不存在時不使用別名。
+    # `tags`: 要納入的詞性。
+    @classmethod
+    def from_dictionary(cls, dict_path=user_dict_path, alias_path=alias_path, tags=('stock',)):
+        patterns = {word: word for word in _read_words(dict_path, tags)}
+        if alias_path and os.path.exists(alias_path):
+            for alias, company in _read_aliases(alias_path).items():
+                patterns.setdefault(alias, company)
+        return cls(patterns)
+
+    def _is_word_boundary(self, text, start, end):
+        before = text[start - 1] if start > 0 else ''
+        after = text[end] if end < len(text) else ''
+        return not (before.isascii() and before.isalnum()) and not (after.isascii() and after.isalnum())
+
+    # `find` 回傳文章中所有不重疊的命中，依出現位置排序
+    def find(self, text):
+        if not isinstance(text, str) or not self.patterns:
+            return []
+        candidates = []
+        for end, index in self.automaton.iter(text):
+            length = len(self.patterns[index][0])
+            start = end + 1 - length
+            if self.needs_boundary[index] and not self._is_word_boundary(text, start, end + 1):
+                continue
+            candidates.append((start, -length, index))
+        candidates.sort()
+
+        mentions = []
+        last_end = 0
+        for start, negative_length, index in candidates:
+            if start < last_end:
+                continue
+            surface, company = self.patterns[index]
+            last_end = start - negative_length
+            mentions.append(Mention(start, last_end, surface, company))
+        return mentions
+
+    # `count` 回傳 `{正式名稱: 提及次數}`，依第一次出現的順序排列
+    def count(self, text):
+        counts = {}
+        for mention in self.find(text):
+            counts[mention.company] = counts.get(mention.company, 0) + 1
+        return counts
+
+    # `extract` 與 `extract_companies` 的回傳格式相同：依出現順序去除重複的公司名稱陣列
+    def extract(self, text):
+        return pd.unique(np.asarray([mention.company for mention in self.find(text)], dtype=object))
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+# `get_company_matcher` 回傳整個行程共用、由預設字典建立的比對器，第一次呼叫時才建立
+def get_company_matcher():
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = CompanyMatcher.from_dictionary()
+    return _matcher
+
+
+# `match_companies` 以比對器取代詞性標註填入公司欄位，另外加上每篇文章的提及次數。
+#
+# 參數:
+# `df`: 含有 Content 欄位的 DataFrame。
+# `matcher`: 使用的比對器，None 代表使用預設的比對器。
+#
+# 回傳:
+# `DataFrame`: 加上 `Companies_Content` 與 `Company_Mentions`（`{公司: 次數}`）欄位的 DataFrame。
+def match_companies(df, matcher=None):
+    matcher = matcher or get_company_matcher()
+    df = df.copy()
+    counts = [matcher.count(text) for text in df['Content']]
+    df['Companies_Content'] = pd.Series([np.asarray(list(c), dtype=object) for c in counts],
+                                        index=df.index, dtype=object)
+    df['Company_Mentions'] = pd.Series(counts, index=df.index, dtype=object)
+    return df
+
+
+# `benchmark_matchers` 以同一批文章比較 jieba 詞性標註與 `CompanyMatcher` 的速度及召回率。
+# 召回率以 jieba 的結果為基準：jieba 找到的公司中，比對器也找到的比例。
+#
+# 回傳:
+# `dictionary`: 包含兩者的耗時、加速倍數、召回率，以及只有比對器找到的公司數（通常來自別名與代號）。
+def benchmark_matchers(texts, matcher=None):
+    from .ContentAnalysis import extract_companies, load_dictionaries
+
+    matcher = matcher or get_company_matcher()
+    texts = list(texts)
+    load_dictionaries()  # 字典載入不計入斷詞時間
+
+    start = time.perf_counter()
+    expected = [set(extract_companies(text)) for text in texts]
+    jieba_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [set(matcher.extract(text)) for text in texts]
+    matcher_seconds = time.perf_counter() - start
+
+    found = sum(len(e & a) for e, a in zip(expected, actual))
+    total = sum(len(e) for e in expected)
+    return {
+        'articles': len(texts),
+        'backend': 'pyahocorasick' if HAS_AHOCORASICK else 'python',
+        'jieba_seconds': jieba_seconds,
+        'matcher_seconds': matcher_seconds,
+        'speedup': jieba_seconds / matcher_seconds if matcher_seconds else float('inf'),
+        'recall': found / total if total else 1.0,
+        'matcher_only': sum(len(a - e) for e, a in zip(expected, actual)),
+    }
@@ -1,54 +1,340 @@
 import pandas as pd
-import jieba
-import jieba.posseg as pseg
+import numpy as np
+import hashlib
+import importlib.util
+import marshal
 import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
-jieba_path = os.path.dirname(jieba.__file__)
+# 只查找 jieba 的安裝位置而不匯入它，匯入 `utils` 時不會觸發任何字典載入
+_jieba_spec = importlib.util.find_spec('jieba')
+jieba_path = os.path.dirname(_jieba_spec.origin) if _jieba_spec and _jieba_spec.origin else ''
 dict_path = os.path.join(jieba_path, 'dict.txt.big')
 
-if os.path.exists(dict_path):
-    jieba.set_dictionary(dict_path)
-    print("成功設置繁體字典")
-else:
-    print(f"錯誤：在 {dict_path} 找不到字典文件")
-
 current_dir = os.path.dirname(os.path.abspath(__file__))  # 獲取當前文件的目錄
 user_dict_path = os.path.join(current_dir, "stock_dict.txt")  # 拼接 stock_dict.txt 的完整路徑
 
-if os.path.exists(user_dict_path):
-    jieba.load_userdict(user_dict_path)
-    print("自訂字典載入成功")
-else:
-    print(f"錯誤：找不到自訂字典，預期路徑為 {user_dict_path}")
+DEFAULT_MODEL_CACHE_DIR = os.path.join(current_dir, "..", "..", "data", "jieba_cache")
+
+# 快取檔案的格式版本，修改 `_build_model` 保存的內容時需要遞增
+MODEL_FORMAT = 'jieba-model-1'
+
+# 詞性標籤與輸出欄位的對應，新增標籤（例如在 stock_dict.txt 中加入新的詞性）時只需在這裡加一行
+ENTITY_TAGS = {
+    'stock': 'Companies_Content',  # 'stock' 表示股票名稱
+    'trend': 'Trend',              # 'trend' 表示趨勢關鍵字
+}
+
+
+def _file_digest(path, digest):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+
+def _atomic_marshal(path, value):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump(value, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# `ContentAnalyzer` 負責斷詞與詞性標註，建立時不會載入任何東西，第一次斷詞時才初始化 jieba。
+# 初始化完成後會把建好的前綴字典（包含 stock_dict.txt 加入的詞與詞性）以 marshal 存到
+# `cache_dir`，檔名以字典檔內容的雜湊值命名；之後啟動時直接讀回快取，不必重新解析字典檔。
+# 任何一個字典檔被修改時雜湊值就會改變，舊的快取自然不會再被使用。
+#
+# 參數:
+# `dictionary`: 主字典檔路徑，找不到時使用 jieba 內建的字典。
+# `user_dictionary`: 自訂字典檔路徑。
+# `cache_dir`: 模型快取的目錄。
+class ContentAnalyzer:
+    def __init__(self, dictionary=dict_path, user_dictionary=user_dict_path, cache_dir=DEFAULT_MODEL_CACHE_DIR):
+        self.dictionary = dictionary
+        self.user_dictionary = user_dictionary
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.initialized = False
+        self.lock = threading.Lock()
+        self._version = None
+        self._pseg = None
+
+    def _dictionary_files(self):
+        main = self.dictionary if os.path.exists(self.dictionary) else os.path.join(jieba_path, 'dict.txt')
+        files = [main]
+        if os.path.exists(self.user_dictionary):
+            files.append(self.user_dictionary)
+        return files
+
+    # 字典版本：快取格式與所有字典檔內容的雜湊值，任何一個改變都代表斷詞結果可能不同
+    @property
+    def version(self):
+        if self._version is None:
+            digest = hashlib.sha1()
+            digest.update(MODEL_FORMAT.encode())
+            for path in self._dictionary_files():
+                digest.update(os.path.basename(path).encode('utf-8'))
+                _file_digest(path, digest)
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    def model_cache_path(self):
+        return os.path.join(self.cache_dir, f"jieba.{self.version}.model")
+
+    def initialize(self):
+        if self.initialized:
+            return
+        with self.lock:
+            if self.initialized:
+                return
+            import jieba
+            from jieba import finalseg
+            # 原本在設定繁體字典之前就匯入 posseg，詞性表來自 jieba 內建的字典，這裡維持相同的順序
+            import jieba.posseg as pseg
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            jieba.dt.tmp_dir = self.cache_dir
+            if os.path.exists(self.dictionary):
+                jieba.set_dictionary(self.dictionary)
+            else:
+                print(f"錯誤：在 {self.dictionary} 找不到字典文件")
+
+            cache_path = self.model_cache_path()
+            if not self._load_model(jieba.dt, finalseg, cache_path):
+                self._build_model(jieba, finalseg, cache_path)
+
+            self._pseg = pseg
+            self.initialized = True
+
+    def _load_model(self, tokenizer, finalseg, cache_path):
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path, 'rb') as f:
+                freq, total, word_tags, force_split = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            print(f"斷詞模型快取損壞，將重新建立：{cache_path}")
+            return False
+        with tokenizer.lock:
+            tokenizer.FREQ, tokenizer.total = freq, total
+            tokenizer.user_word_tag_tab.update(word_tags)
+            tokenizer.initialized = True
+        for word in force_split:
+            finalseg.add_force_split(word)
+        print("已從快取載入斷詞模型")
+        return True
+
+    def _build_model(self, jieba, finalseg, cache_path):
+        jieba.dt.initialize()
+        if os.path.exists(self.dictionary):
+            print("成功設置繁體字典")
+
+        if os.path.exists(self.user_dictionary):
+            jieba.load_userdict(self.user_dictionary)
+            print("自訂字典載入成功")
+        else:
+            print(f"錯誤：找不到自訂字典，預期路徑為 {self.user_dictionary}")
+
+        # 自訂詞的詞性在第一次標註時才會合併進 posseg，因此必須在斷詞之前保存
+        model = (jieba.dt.FREQ, jieba.dt.total, dict(jieba.dt.user_word_tag_tab),
+                 sorted(finalseg.Force_Split_Words))
+        try:
+            _atomic_marshal(cache_path, model)
+        except OSError as e:
+            print(f"無法寫入斷詞模型快取：{e}")
+
+    def cut(self, text):
+        self.initialize()
+        return self._pseg.cut(text)
+
+    # `extract_entities` 對一篇文章只做一次斷詞與詞性標註，同時取出所有 `tags` 中的標籤。
+    #
+    # 回傳:
+    # `dictionary`: `{輸出欄位: 依出現順序去除重複的詞陣列}`，例如 `{'Companies_Content': [...], 'Trend': [...]}`。
+    def extract_entities(self, text, tags=None):
+        tags = tags or ENTITY_TAGS
+        found = {tag: [] for tag in tags}
+        if isinstance(text, str):
+            for word, flag in self.cut(text):
+                if flag in found:
+                    found[flag].append(word)
+        return {column: pd.unique(np.asarray(found[tag], dtype=object)) for tag, column in tags.items()}
+
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+# `get_analyzer` 回傳整個行程共用的 `ContentAnalyzer`，第一次呼叫時才建立
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = ContentAnalyzer()
+    return _analyzer
+
+
+def load_dictionaries():
+    get_analyzer().initialize()
+
+
+# `dictionary_version` 回傳目前字典的版本字串，字典檔內容改變時版本也會改變，
+# 可以作為斷詞結果快取的一部分鍵值。
+def dictionary_version():
+    return get_analyzer().version
+
+
+# `extract_entities` 對一篇文章只做一次斷詞與詞性標註，同時取出所有 `ENTITY_TAGS` 中的標籤。
+# 原本 `extract_companies` 與 `extract_keywords` 各自呼叫一次 `pseg.cut`，同一篇文章會被處理兩次。
+#
+# 回傳:
+# `dictionary`: `{輸出欄位: 依出現順序去除重複的詞陣列}`，例如 `{'Companies_Content': [...], 'Trend': [...]}`。
+def extract_entities(text, tags=None):
+    return get_analyzer().extract_entities(text, tags)
+
 
 def extract_companies(text):
-    words = pseg.cut(text)
-    companies = [word for word, flag in words if flag == 'stock']  # 'stock' 表示股票名稱
-    companies = pd.unique(companies)
-    return companies
+    return extract_entities(text, {'stock': 'Companies_Content'})['Companies_Content']
+
 
 def extract_keywords(text):
-    words = pseg.cut(text)
-    companies = [word for word, flag in words if flag == 'trend']  # 'stock' 表示股票名稱
-    companies = pd.unique(companies)
-    return companies
-
-def analysis() :
-    pass
-
-# 讀取 CSV 文件
-csv_path = os.path.join(current_dir, "technews_articles_content_copy.csv")
-if os.path.exists(csv_path):
-    df = pd.read_csv(csv_path)
-else:
-    print(f"錯誤：找不到 CSV 檔案，預期路徑為 {csv_path}")
-
-# 使用 progress_apply 來顯示進度條
-tqdm.pandas(desc="Processing")
-df['Companies_Content'] = df['Content'].iloc[0:10].progress_apply(extract_companies)
-df['Trend'] = df['Content'].iloc[0:10].progress_apply(extract_keywords)
-
-print( df['Companies_Content'].iloc[0:10] )
-print( df['Trend'].iloc[0:10] )
-print("處理完成！")
\ No newline at end of file
+    return extract_entities(text, {'trend': 'Trend'})['Trend']
+
+
+def _init_worker():
+    # 每個工作行程只載入一次字典，之後處理的所有批次都共用；字典模型由快取讀回，不必重新解析
+    load_dictionaries()
+
+
+def _extract_batch(texts):
+    return [extract_entities(text) for text in texts]
+
+
+# `create_segment_executor` 建立已設定好初始化函數的斷詞行程池。
+# 需要對許多小批次斷詞時（例如串流管線），可以把同一個行程池傳給 `segment_articles` 的 `executor`，
+# 不必每批都重新啟動行程與載入字典。
+def create_segment_executor(workers=None):
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker)
+
+
+def _segment_texts(texts, workers, batch_size, progress_callback, executor=None):
+    workers = workers or os.cpu_count() or 1
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    results = []
+    owned = None
+    if executor is not None:
+        mapped = executor.map(_extract_batch, batches)
+    elif workers == 1 or len(batches) <= 1:
+        mapped = map(_extract_batch, batches)
+    else:
+        owned = ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker)
+        mapped = owned.map(_extract_batch, batches)
+
+    try:
+        # 共用行程池時通常是串流管線中的小批次，不另外顯示進度條
+        progress = tqdm(mapped, total=len(batches), desc="Processing", disable=executor is not None)
+        for i, batch_result in enumerate(progress):
+            results.extend(batch_result)
+            if progress_callback:
+                progress_callback(len(results) / len(texts), f"已斷詞 {len(results)} / {len(texts)} 篇文章")
+    finally:
+        if owned is not None:
+            owned.shutdown()
+    return results
+
+
+# `content_hash` 回傳內文的雜湊值，作為斷詞結果快取的鍵值；內文不是字串（例如 NA）時回傳 None
+def content_hash(text):
+    if not isinstance(text, str):
+        return None
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# `cache_version` 結合字典版本與 `ENTITY_TAGS`，任何一個改變時快取中的舊結果都不再適用
+def cache_version(tags=None):
+    tags = tags or ENTITY_TAGS
+    return f"{dictionary_version()}:{','.join(sorted(tags))}"
+
+
+def _segment_with_cache(texts, cache, workers, batch_size, progress_callback, executor=None):
+    version = cache_version()
+    keys = [content_hash(text) for text in texts]
+    cached = cache.get_many([key for key in keys if key], version)
+
+    # 內容相同的文章只需分析一次
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key and key not in cached:
+            pending.setdefault(key, text)
+
+    if pending:
+        fresh = dict(zip(pending, _segment_texts(list(pending.values()), workers, batch_size,
+                                                 progress_callback, executor)))
+        cache.put_many({key: {column: list(words) for column, words in result.items()}
+                        for key, result in fresh.items()}, version)
+    else:
+        fresh = {}
+        if progress_callback:
+            progress_callback(1.0, f"全部 {len(texts)} 篇文章皆已有斷詞結果")
+
+    results = []
+    for key, text in zip(keys, texts):
+        if key is None:
+            results.append(extract_entities(text))
+        elif key in fresh:
+            results.append(fresh[key])
+        else:
+            results.append({column: np.asarray(words, dtype=object) for column, words in cached[key].items()})
+    return results
+
+
+# `segment_articles` 為每篇文章的 Content 做一次斷詞，並將 `ENTITY_TAGS` 中的每個標籤寫入對應欄位。
+# 文章會被切成批次分散到多個行程，每個行程在啟動時載入一次字典；批次依原始順序收回，
+# 因此結果與逐篇處理完全相同。
+#
+# 參數:
+# `df`: 含有 Content 欄位的 DataFrame。
+# `workers`: 行程數，None 代表使用所有 CPU 核心，1 代表在目前的行程中處理。
+# `batch_size`: 每個批次的文章數，批次越大行程間傳輸的額外負擔越小。
+# `progress_callback`: 進度回報函數，接收 `(progress, message)`。
+# `cache`: 斷詞結果快取（例如 `database.AnalysisCache`），只有快取中沒有的文章才會重新斷詞；
+#          全部命中時完全不會載入 jieba 字典。
+# `executor`: 由 `create_segment_executor` 建立的行程池；指定時使用它而不另外建立，`workers` 會被忽略。
+#
+# 回傳:
+# `DataFrame`: 加上 `ENTITY_TAGS` 各輸出欄位的 DataFrame。
+def segment_articles(df, workers=None, batch_size=50, progress_callback=None, cache=None, executor=None):
+    df = df.copy()
+    texts = df['Content'].tolist()
+    if cache is None:
+        results = _segment_texts(texts, workers, batch_size, progress_callback, executor)
+    else:
+        results = _segment_with_cache(texts, cache, workers, batch_size, progress_callback, executor)
+
+    for column in ENTITY_TAGS.values():
+        df[column] = pd.Series([result[column] for result in results], index=df.index, dtype=object)
+    return df
+
+
+if __name__ == "__main__":
+    # 讀取 CSV 文件
+    csv_path = os.path.join(current_dir, "technews_articles_content_copy.csv")
+    if os.path.exists(csv_path):
+        df = pd.read_csv(csv_path)
+    else:
+        print(f"錯誤：找不到 CSV 檔案，預期路徑為 {csv_path}")
+
+    df = segment_articles(df.iloc[0:10])
+
+    print( df['Companies_Content'].iloc[0:10] )
+    print( df['Trend'].iloc[0:10] )
+    print("處理完成！")
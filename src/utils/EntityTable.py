@@ -0,0 +1,195 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# `EntityTable` 是每篇文章實體清單（例如 Companies_Content、Trend）的精簡欄式表示，格式與 CSR 稀疏矩陣相同：
+# - `vocabulary`: 所有出現過的詞，詞的編號就是它在陣列中的位置。
+# - `offsets`: 長度為文章數 + 1 的 int64 陣列，第 i 篇文章的詞編號是 `values[offsets[i]:offsets[i + 1]]`。
+# - `values`: 所有文章的詞編號依序串接的 int32 陣列。
+# 相較於每列一個 Python 字串陣列的 object 欄位，每個詞只保存一次，每次提及只佔 4 個位元組；
+# 計數、共同出現與依日期彙總都是整個陣列的 NumPy 運算，不需要 explode 或逐列迴圈。
+# `from_series` 與 `to_series` 在兩種表示之間轉換，`to_series` 的結果與 `segment_articles` 產生的欄位相同。
+#
+# 參數:
+# `vocabulary`: 詞的陣列（或列表）。
+# `offsets`, `values`: CSR 格式的位移與詞編號。
+class EntityTable:
+    def __init__(self, vocabulary, offsets, values):
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.int32)
+        if len(self.offsets) == 0 or self.offsets[-1] != len(self.values):
+            raise ValueError("offsets 的最後一個值必須等於 values 的長度")
+
+    # `from_lists` 由每篇文章的詞清單建立；缺失值（NA）會被略過，同一篇文章中的詞保留原本的順序。
+    # 所有清單先串接成一個陣列，再以 `pd.factorize` 一次編號。
+    #
+    # 參數:
+    # `lists`: 每篇文章一個詞清單（list、tuple 或陣列），其他值（例如 NaN）視為沒有任何詞。
+    # `vocabulary`: 既有的詞表；指定時沿用其中的編號，新的詞接在後面，多批文章可以共用同一套編號。
+    @classmethod
+    def from_lists(cls, lists, vocabulary=None):
+        rows = [items if isinstance(items, (list, tuple, np.ndarray)) else () for items in lists]
+        lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        total = int(lengths.sum())
+        if total and all(isinstance(items, np.ndarray) for items in rows):
+            # `segment_articles` 的欄位每列都是陣列，直接在 C 中串接
+            words = np.concatenate(rows, dtype=object)
+        else:
+            # Python list 交給 np.concatenate 時每一列都要先轉成陣列，逐一取出反而快得多
+            words = np.fromiter(itertools.chain.from_iterable(rows), dtype=object, count=total)
+        present = pd.notna(words)
+        if not present.all():
+            row_ids = np.repeat(np.arange(len(rows)), lengths)
+            lengths = np.bincount(row_ids[present], minlength=len(rows))
+            words = words[present]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if vocabulary is None or len(vocabulary) == 0:
+            codes, known = pd.factorize(words)
+            return cls(np.asarray(known, dtype=object), offsets, codes)
+        known = pd.Index(vocabulary, dtype=object)
+        codes = known.get_indexer(words)
+        new_words = pd.unique(words[codes < 0])
+        if len(new_words):
+            known = known.append(pd.Index(new_words, dtype=object))
+            codes = known.get_indexer(words)
+        return cls(known.to_numpy(), offsets, codes)
+
+    @classmethod
+    def from_series(cls, series, vocabulary=None):
+        return cls.from_lists(series.tolist(), vocabulary)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.values.nbytes + sum(len(word) for word in self.vocabulary)
+
+    # `lengths` 回傳每篇文章的詞數
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    # `row_ids` 回傳 `values` 中每個詞所屬的文章編號
+    def row_ids(self):
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def row(self, i):
+        return self.vocabulary[self.values[self.offsets[i]:self.offsets[i + 1]]]
+
+    # `to_lists` 轉回每篇文章一個詞陣列的列表
+    def to_lists(self):
+        words = self.vocabulary[self.values]
+        return [words[start:end] for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+    # `to_series` 轉回與 `segment_articles` 相同的 object 欄位
+    def to_series(self, index=None, name=None):
+        return pd.Series(self.to_lists(), index=index, name=name, dtype=object)
+
+    # `to_arrow` 轉成 Arrow 的 `list<dictionary<int32, string>>` 陣列，可以直接寫入 Parquet 或 Arrow 檔案
+    def to_arrow(self):
+        if not HAS_PYARROW:
+            raise ImportError("to_arrow 需要安裝 pyarrow")
+        dictionary = pa.DictionaryArray.from_arrays(pa.array(self.values, type=pa.int32()),
+                                                    pa.array(self.vocabulary, type=pa.string()))
+        return pa.ListArray.from_arrays(pa.array(self.offsets.astype(np.int32)), dictionary)
+
+    # `take` 回傳指定文章組成的新表，詞表共用
+    def take(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        lengths = ends - starts
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # 每個詞在原本 values 中的位置 = 所屬文章的起點 + 在文章內的位置
+        within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        return EntityTable(self.vocabulary, offsets, self.values[np.repeat(starts, lengths) + within])
+
+    # `counts` 回傳每個詞被提及的次數（有 `weights` 時為每篇文章權重的加總），依詞表順序，不含沒有出現的詞。
+    # `segment_articles` 產生的清單在同一篇文章中不會重複，因此次數也就是提及該詞的文章數。
+    def counts(self, weights=None):
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[self.row_ids()]
+        totals = np.bincount(self.values, weights=weights, minlength=len(self.vocabulary))
+        if weights is not None:
+            totals = totals.astype(float)
+        present = np.bincount(self.values, minlength=len(self.vocabulary)) > 0
+        return pd.Series(totals[present], index=pd.Index(self.vocabulary[present], dtype=object))
+
+    # `cooccurrence` 回傳在同一篇文章中一起出現的詞組與文章數，欄位為 a、b、count（a 與 b 依詞表編號排序，a < b）。
+    # 文章依詞數分組，同樣詞數的文章以 `np.triu_indices` 一次產生所有詞組，再以 `np.unique` 計數。
+    def cooccurrence(self):
+        lengths = self.lengths()
+        size = max(len(self.vocabulary), 1)
+        pair_codes = []
+        for length in np.unique(lengths[lengths > 1]):
+            rows = np.flatnonzero(lengths == length)
+            ids = self.values[self.offsets[rows][:, None] + np.arange(length)]
+            first, second = np.triu_indices(length, k=1)
+            a, b = ids[:, first].ravel().astype(np.int64), ids[:, second].ravel().astype(np.int64)
+            pair_codes.append(np.minimum(a, b) * size + np.maximum(a, b))
+        if not pair_codes:
+            return pd.DataFrame({'a': pd.Series(dtype=object), 'b': pd.Series(dtype=object),
+                                 'count': pd.Series(dtype=np.int64)})
+        codes, counts = np.unique(np.concatenate(pair_codes), return_counts=True)
+        return pd.DataFrame({'a': self.vocabulary[codes // size], 'b': self.vocabulary[codes % size],
+                             'count': counts})
+
+    # `rollup` 依每篇文章的鍵值（例如日期）彙總每個詞的文章數，有 `weights` 時另外加總權重（例如分數）。
+    # 鍵值與詞編號合成一個整數後以 `np.unique` 計數，鍵值為 NA 的文章會被略過。
+    #
+    # 回傳:
+    # `DataFrame`: 欄位為 key、term、count（以及 weight_sum），依 key、term 排序。
+    def rollup(self, keys, weights=None):
+        key_codes, key_values = pd.factorize(pd.Series(keys), sort=True)
+        row_ids = self.row_ids()
+        valid = key_codes[row_ids] >= 0
+        term_order = np.argsort(self.vocabulary.astype(str), kind='stable')
+        term_rank = np.empty_like(term_order)
+        term_rank[term_order] = np.arange(len(term_order))
+
+        size = max(len(self.vocabulary), 1)
+        codes = key_codes[row_ids[valid]].astype(np.int64) * size + term_rank[self.values[valid]]
+        unique_codes, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        result = pd.DataFrame({
+            'key': np.asarray(key_values)[unique_codes // size],
+            'term': self.vocabulary[term_order[unique_codes % size]],
+            'count': counts,
+        })
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[row_ids[valid]]
+            # 沒有任何詞時 np.bincount 回傳整數陣列，權重的加總一律轉成浮點數
+            result['weight_sum'] = np.bincount(inverse.ravel(), weights=weights,
+                                               minlength=len(unique_codes)).astype(float)
+        return result
+
+    # `concat` 合併多個表，詞表取聯集並重新編號
+    @staticmethod
+    def concat(tables):
+        vocabulary = pd.Index([], dtype=object)
+        for table in tables:
+            vocabulary = vocabulary.append(pd.Index(table.vocabulary, dtype=object)[
+                ~pd.Index(table.vocabulary, dtype=object).isin(vocabulary)])
+        offsets, values, total = [np.zeros(1, dtype=np.int64)], [], 0
+        for table in tables:
+            remap = vocabulary.get_indexer(table.vocabulary)
+            values.append(remap[table.values])
+            offsets.append(table.offsets[1:] + total)
+            total += len(table.values)
+        return EntityTable(vocabulary.to_numpy(), np.concatenate(offsets),
+                           np.concatenate(values) if values else np.zeros(0, dtype=np.int32))
+
+
+# `entity_tables` 將 DataFrame 中的實體欄位轉成 `{欄位: EntityTable}`，沒有的欄位會被略過
+def entity_tables(df, columns=('Companies_Content', 'Trend')):
+    return {column: EntityTable.from_series(df[column]) for column in columns if column in df.columns}
@@ -0,0 +1,163 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# MinHash 的排列數；估計 Jaccard 相似度的標準誤約為 1 / sqrt(NUM_PERM)
+NUM_PERM = 128
+# 以連續幾個字元作為一個 shingle；中文一個詞多為兩三個字，5 個字元約涵蓋兩個詞
+SHINGLE_SIZE = 5
+# LSH 把簽章切成幾段，每段 NUM_PERM / LSH_BANDS 列；任一段完全相同的文章才會成為候選。
+# 16 段 × 8 列時，相似度 0.8 的文章約有 97% 的機率成為候選，0.5 的文章只有約 6%
+LSH_BANDS = 16
+# 估計的相似度達到這個值才視為重複（轉載、更新或聯合發布的文章）
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_SHINGLE_BASE = np.uint64(1000003)
+
+
+# `MinHasher` 計算文章內文的 MinHash 簽章。
+# 內文去除空白後切成連續 `shingle_size` 個字元的 shingle，每個 shingle 雜湊成 32 位元整數，
+# 再以 `num_perm` 個 `(a * x + b) mod p` 的排列各取最小值。全部以 NumPy 陣列運算，不逐字迴圈。
+# 兩篇文章簽章中相同的比例即為兩者 shingle 集合 Jaccard 相似度的估計值。
+#
+# 參數:
+# `num_perm`: 排列數，也是簽章的長度。
+# `shingle_size`: shingle 的字元數。
+# `bands`: LSH 的段數，`num_perm` 必須是它的倍數。
+# `seed`: 產生排列的亂數種子；種子與參數相同的簽章才能互相比較（見 `version`）。
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, bands=LSH_BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必須是 bands ({bands}) 的倍數")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        # a 與 b 小於 2^31，a * x + b 在 uint64 中不會溢位
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        self.version = f"minhash:{num_perm}:{shingle_size}:{bands}:{seed}"
+
+    # `shingles` 回傳內文所有 shingle 的雜湊值（不重複）；內文不是字串或去除空白後為空時回傳 None
+    def shingles(self, text):
+        if not isinstance(text, str):
+            return None
+        text = "".join(text.split())
+        if not text:
+            return None
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        # 比 shingle 還短的內文整段視為一個 shingle
+        size = min(self.shingle_size, len(codes))
+        count = len(codes) - size + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            hashes = (hashes * _SHINGLE_BASE + codes[offset:offset + count]) & _MAX_HASH
+        return np.unique(hashes)
+
+    # `signature` 回傳長度為 `num_perm` 的 uint32 簽章，無法計算時回傳 None
+    def signature(self, text):
+        shingles = self.shingles(text)
+        if shingles is None:
+            return None
+        permuted = (np.outer(self.a, shingles) + self.b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    # `band_keys` 把簽章切成 `bands` 段，每段雜湊成一個 64 位元有號整數（可以直接存入 SQLite）。
+    # 鍵值包含 `version` 與段落編號，不同參數或不同段落的鍵值不會互相碰撞。
+    def band_keys(self, signature):
+        keys = []
+        for band, rows in enumerate(signature.reshape(self.bands, -1)):
+            digest = hashlib.blake2b(rows.tobytes(), digest_size=8, person=f"b{band}".encode('ascii'),
+                                     key=self.version.encode('ascii')).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+
+_minhasher = None
+
+
+def get_minhasher():
+    global _minhasher
+    if _minhasher is None:
+        _minhasher = MinHasher()
+    return _minhasher
+
+
+# `estimate_similarity` 以兩個簽章中相同的比例估計 Jaccard 相似度
+def estimate_similarity(signature, other):
+    return float(np.mean(signature == other))
+
+
+# `find_near_duplicates` 找出內容與較早的文章幾乎相同的文章，回傳與 `df` 同索引的 Series，
+# 重複的文章為較早那篇文章的 URL（沒有 URL 時為 "#列號"），其餘為 None。
+# 候選文章以 LSH 的段落鍵值查詢，再以簽章估計的相似度確認，不需要兩兩比較所有文章。
+# 「較早」以索引中的登錄順序判斷：已登錄的文章早於新文章，同一批新文章則依 `df` 的順序，
+# 因此重新分析時結果不變，也不會把原文判為轉載的重複。
+#
+# 參數:
+# `df`: 含有 Content 欄位的 DataFrame，有 URL 欄位時才會登錄到 `index`。
+# `index`: 持久化的 LSH 索引（例如 `database.DedupIndex`）；指定時新文章也會與歷史文章比對，並在比對後登錄。
+#          None 時只比對 `df` 內的文章。
+# `threshold`: 估計相似度達到這個值才視為重複。
+# `hasher`: `MinHasher`，None 代表使用預設參數。
+def find_near_duplicates(df, index=None, threshold=DUPLICATE_THRESHOLD, hasher=None):
+    hasher = hasher or get_minhasher()
+    if 'URL' in df.columns:
+        urls = [url if isinstance(url, str) else None for url in df['URL'].tolist()]
+    else:
+        urls = [None] * len(df)
+    signatures = [hasher.signature(text) for text in df['Content'].tolist()]
+    keys = [hasher.band_keys(signature) if signature is not None else [] for signature in signatures]
+
+    stored, order, stored_signatures = {}, {}, {}
+    if index is not None:
+        stored = index.candidates([key for article_keys in keys for key in article_keys])
+        order = index.lookup([url for url in urls if url])
+        stored_signatures = index.signatures({entry_id for entries in stored.values() for entry_id, _ in entries})
+
+    # 排序鍵：已登錄的文章依登錄編號，新文章排在所有已登錄的文章之後並依 df 的順序
+    def rank(position):
+        url = urls[position]
+        return (0, order[url]) if url in order else (1, position)
+
+    duplicate_of = [None] * len(df)
+    local = {}
+    for position, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        own_rank, own_url = rank(position), urls[position]
+        candidates = {}
+        for key in keys[position]:
+            for entry_id, url in stored.get(key, ()):
+                if url != own_url and (0, entry_id) < own_rank:
+                    candidates[url] = ((0, entry_id), stored_signatures[entry_id])
+            for other in local.get(key, ()):
+                other_url = urls[other] or f"#{other}"
+                if urls[other] != own_url or own_url is None:
+                    candidates.setdefault(other_url, (rank(other), signatures[other]))
+        matches = [(other_rank, url) for url, (other_rank, other_signature) in candidates.items()
+                   if other_rank < own_rank and estimate_similarity(signature, other_signature) >= threshold]
+        if matches:
+            duplicate_of[position] = min(matches)[1]
+        for key in keys[position]:
+            local.setdefault(key, []).append(position)
+
+    if index is not None:
+        index.add([(url, signature, article_keys) for url, signature, article_keys in zip(urls, signatures, keys)
+                   if url and signature is not None], hasher.version)
+    return pd.Series(duplicate_of, index=df.index, dtype=object)
+
+
+# `drop_near_duplicates` 移除 `find_near_duplicates` 判定為重複的文章，參數相同。
+#
+# 回傳:
+# `(DataFrame, DataFrame)`: 保留的文章，以及被移除的文章（加上 `DuplicateOf` 欄位）。
+def drop_near_duplicates(df, index=None, threshold=DUPLICATE_THRESHOLD, hasher=None):
+    duplicate_of = find_near_duplicates(df, index=index, threshold=threshold, hasher=hasher)
+    mask = duplicate_of.notna()
+    removed = df[mask].assign(DuplicateOf=duplicate_of[mask])
+    return df[~mask], removed
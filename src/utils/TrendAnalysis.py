@@ -0,0 +1,119 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .EntityTable import EntityTable
+
+# 趨勢關鍵字的方向，+1 代表正面、-1 代表負面；沒有列出的關鍵字（例如 "營收"、"股價"）視為中性，
+# 只計入頻率不影響分數。在 stock_dict.txt 新增趨勢詞時，若有明確方向也在這裡加上
+TREND_POLARITY = {
+    **dict.fromkeys(['上漲', '上升', '上揚', '飆升', '上行', '獲利', '盈利', '淨利', '增長', '增大', '增幅',
+                     '攀升', '回升', '反彈', '暴漲', '高點', '漲停', '穩步', '漲勢', '買盤', '資金流入',
+                     '淨流入'], 1),
+    **dict.fromkeys(['下跌', '下降', '下滑', '走低', '回落', '虧損', '虧空', '虧本', '損失', '減少', '縮減',
+                     '暴跌', '低點', '跌停', '跌勢', '賣盤', '資金流出', '淨流出'], -1),
+}
+
+# 彙總的週期：'D' 為每日，'W' 為每週（週一開始）
+ROLLUP_FREQS = ('D', 'W')
+
+
+def _period_start(dates, freq):
+    days = pd.to_datetime(dates, errors='coerce').dt.normalize()
+    if freq == 'D':
+        return days
+    if freq == 'W':
+        return days - pd.to_timedelta(days.dt.dayofweek, unit='D')
+    raise ValueError(f"未知的彙總週期：{freq}，可用的週期有 {', '.join(ROLLUP_FREQS)}")
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [item for item in value if isinstance(item, str)]
+    return []
+
+
+# `score_articles` 以每篇文章的趨勢關鍵字計算分數，並填入 `StockContent` 與 `Score` 欄位。
+# 分數是 (正面詞數 - 負面詞數) / (正面詞數 + 負面詞數)，介於 -1 與 1 之間，沒有方向性的詞時為 0。
+# 關鍵字轉成 `EntityTable`，每個詞的方向只查一次，再以 `np.bincount` 依文章加總，不逐篇迴圈。
+#
+# 回傳:
+# `DataFrame`: `StockContent` 為提到的公司清單，`Score` 為文章分數。
+def score_articles(df):
+    df = df.copy()
+    trends = EntityTable.from_series(df['Trend'])
+    polarity = np.array([TREND_POLARITY.get(word, 0) for word in trends.vocabulary], dtype=np.int8)[trends.values]
+    row_ids = trends.row_ids()
+    positive = np.bincount(row_ids, weights=polarity > 0, minlength=len(df))
+    negative = np.bincount(row_ids, weights=polarity < 0, minlength=len(df))
+    total = positive + negative
+    score = np.divide(positive - negative, total, out=np.zeros(len(df)), where=total > 0)
+
+    df['StockContent'] = pd.Series(df['Companies_Content'].map(_as_list).to_numpy(), index=df.index, dtype=object)
+    df['Score'] = score
+    return df
+
+
+# `company_rollup` 依週期彙總每家公司被提及的文章數與分數。
+# `score_sum` 可以直接相加，新的文章只需加到既有的彙總上；平均分數為 `score_sum / mentions`。
+#
+# 參數:
+# `df`: 經過 `score_articles` 的 DataFrame，需要 Date、StockContent 與 Score 欄位。
+# `freq`: 'D' 為每日，'W' 為每週。
+#
+# 回傳:
+# `DataFrame`: 欄位為 period、company、mentions、score_sum、mean_score。
+def company_rollup(df, freq='D'):
+    companies = EntityTable.from_series(df['StockContent'])
+    rollup = companies.rollup(_period_start(df['Date'], freq), weights=df['Score'].to_numpy())
+    rollup = rollup.rename(columns={'key': 'period', 'term': 'company', 'count': 'mentions', 'weight_sum': 'score_sum'})
+    rollup['mean_score'] = rollup['score_sum'] / rollup['mentions']
+    return rollup
+
+
+# `trend_rollup` 依週期彙總每個趨勢關鍵字出現的文章數。
+#
+# 回傳:
+# `DataFrame`: 欄位為 period、keyword、count。
+def trend_rollup(df, freq='D'):
+    trends = EntityTable.from_series(df['Trend'])
+    return trends.rollup(_period_start(df['Date'], freq)).rename(columns={'key': 'period', 'term': 'keyword'})
+
+
+def _article_key(url, content):
+    if isinstance(url, str) and url:
+        return url
+    if isinstance(content, str):
+        return 'sha1:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+    return None
+
+
+# `article_contributions` 將每篇文章整理成彙總用的資料：鍵值（URL，沒有 URL 時為內文雜湊值）、
+# 日期、分數、公司與趨勢關鍵字。`RollupStore` 以鍵值記錄哪些文章已經計入彙總。
+def article_contributions(df):
+    urls = df['URL'] if 'URL' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    contributions = pd.DataFrame({
+        'key': [_article_key(url, content) for url, content in zip(urls, df['Content'])],
+        'day': _period_start(df['Date'], 'D').to_numpy(),
+        'score': df['Score'].to_numpy(),
+        'companies': df['StockContent'].map(_as_list).to_numpy(),
+        'trends': df['Trend'].map(_as_list).to_numpy(),
+    })
+    contributions = contributions.dropna(subset=['key', 'day'])
+    return contributions.drop_duplicates('key', keep='last').reset_index(drop=True)
+
+
+# `analysis` 是「文本分析」步驟：為每篇文章計算分數，並將結果累加到彙總資料庫。
+#
+# 參數:
+# `df`: 經過 `segment_articles` 的 DataFrame，需要 Companies_Content 與 Trend 欄位。
+# `store`: 彙總資料庫（例如 `database.RollupStore`）；None 時只計算文章分數。
+#
+# 回傳:
+# `DataFrame`: 填入 `StockContent` 與 `Score` 的 DataFrame。
+def analysis(df, store=None):
+    df = score_articles(df)
+    if store is not None:
+        store.add(article_contributions(df))
+    return df
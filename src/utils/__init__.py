@@ -1,6 +1,40 @@
-from .DataCleaner import clean_data
-from .ContentAnalysis import analysis
+from .DataCleaner import clean_data, iter_clean_chunks, clean_csv
+from .TrendAnalysis import (analysis, score_articles, company_rollup, trend_rollup, article_contributions,
+                            TREND_POLARITY)
+from .CompanyMatcher import CompanyMatcher, get_company_matcher, match_companies, benchmark_matchers
+from .EntityTable import EntityTable, entity_tables
+from .NearDuplicate import (MinHasher, get_minhasher, find_near_duplicates, drop_near_duplicates,
+                            estimate_similarity)
+from .ContentAnalysis import (segment_articles, extract_entities, ENTITY_TAGS, ContentAnalyzer, get_analyzer,
+                              dictionary_version, content_hash, cache_version, create_segment_executor)
 __all__ = [
     'clean_data',
-    'analysis'
-]
\ No newline at end of file
+    'iter_clean_chunks',
+    'clean_csv',
+    'analysis',
+    'segment_articles',
+    'extract_entities',
+    'ENTITY_TAGS',
+    'ContentAnalyzer',
+    'get_analyzer',
+    'dictionary_version',
+    'content_hash',
+    'cache_version',
+    'create_segment_executor',
+    'CompanyMatcher',
+    'get_company_matcher',
+    'match_companies',
+    'benchmark_matchers',
+    'score_articles',
+    'company_rollup',
+    'trend_rollup',
+    'article_contributions',
+    'TREND_POLARITY',
+    'MinHasher',
+    'get_minhasher',
+    'find_near_duplicates',
+    'drop_near_duplicates',
+    'estimate_similarity',
+    'EntityTable',
+    'entity_tables'
+]
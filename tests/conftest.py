@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 程式碼以 src 為根目錄匯入（例如 `from scraping import ...`），與 `python -m pipeline` 相同
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
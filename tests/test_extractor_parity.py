@@ -0,0 +1,104 @@
+import glob
+import os
+
+import pytest
+
+from scraping.extractor import (HAS_LXML, extract_article_bs4, extract_article_lxml, TITLE_NOT_FOUND,
+                                DATE_NOT_FOUND, AUTHOR_NOT_FOUND, CONTENT_NOT_FOUND)
+from benchmarks.corpus import SyntheticCorpus
+
+pytestmark = pytest.mark.skipif(not HAS_LXML, reason="需要安裝 lxml")
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "technews")
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _page(meta="", title='<h1 class="entry-title">標題</h1>', body='<div class="indent"><p>內文</p></div>'):
+    return (f'<html><head><meta charset="UTF-8"></head><body><article><header class="entry-header">{title}'
+            f'<table><tr><td>{meta}</td></tr></table></header>{body}</article></body></html>')
+
+
+AUTHOR = '<span class="head">作者</span><span class="body">記者</span>'
+DATE = '<span class="head">發布日期</span><span class="body">2024 年 06 月 01 日 8:00</span>'
+
+# 各種邊界情況：缺少欄位、巢狀的作者、空的內文，以及 `string=` 與 `not(*) and string()=` 必須一致的標籤寫法
+EDGE_CASES = {
+    "missing_title": _page(AUTHOR + DATE, title=""),
+    "missing_date": _page(AUTHOR),
+    "missing_author": _page(DATE),
+    "missing_meta": _page(""),
+    "missing_body": _page(AUTHOR + DATE, body=""),
+    "empty_body": _page(AUTHOR + DATE, body='<div class="indent"></div>'),
+    "empty_paragraphs": _page(AUTHOR + DATE, body='<div class="indent"><p></p><p> </p></div>'),
+    "nested_author": _page('<span class="head">作者</span><span class="body"><b>中央社</b></span>' + DATE),
+    "nested_author_link": _page('<span class="head">作者</span>'
+                                '<span class="body"><b><a href="/author/x/">張 三</a></b> 編譯</span>' + DATE),
+    "label_with_spaces": _page('<span class="head"> 作者 </span><span class="body">記者</span>' + DATE),
+    "label_in_child": _page('<span class="head"><b>作者</b></span><span class="body">記者</span>' + DATE),
+    "label_in_grandchild": _page('<span class="head"><b><i>作者</i></b></span><span class="body">記者</span>' + DATE),
+    "label_split": _page('<span class="head"><b>作</b>者</span><span class="body">記者</span>' + DATE),
+    "label_with_comment": _page('<span class="head">作者<!-- x --></span><span class="body">記者</span>' + DATE),
+    "body_not_adjacent": _page('<span class="head">作者</span><span class="spacer">|</span>'
+                               '<span class="body">記者</span>' + DATE),
+    "extra_classes": _page('<span class="meta head">作者</span><span class="body text">記者</span>' + DATE,
+                           title='<h1 class="post entry-title">標題</h1>',
+                           body='<div class="indent clearfix"><p>內文</p></div>'),
+    "class_prefix_only": _page('<span class="header">作者</span><span class="body">記者</span>' + DATE,
+                               title='<h1 class="entry-title-small">標題</h1>',
+                               body='<div class="indented"><p>內文</p></div>'),
+    "duplicate_labels": _page(AUTHOR + '<span class="head">作者</span><span class="body">第二位</span>' + DATE),
+    "entities": _page('<span class="head">作者</span><span class="body">A&amp;B&nbsp;編輯部</span>' + DATE,
+                      body='<div class="indent"><p>&lt;測試&gt; &quot;引號&quot;</p></div>'),
+    "empty_document": "",
+    "whitespace_document": "   \n ",
+}
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=[os.path.basename(path) for path in FIXTURES])
+def test_saved_pages(path):
+    html = _read(path)
+    expected = extract_article_bs4(html)
+    assert extract_article_lxml(html) == expected
+    # 存檔的頁面都是完整的文章，每個欄位都應該找得到
+    assert TITLE_NOT_FOUND != expected['Title']
+    assert DATE_NOT_FOUND != expected['Date']
+    assert AUTHOR_NOT_FOUND != expected['Author']
+    assert CONTENT_NOT_FOUND != expected['Content']
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=[os.path.basename(path) for path in FIXTURES])
+def test_saved_pages_as_text(path):
+    html = _read(path).decode("utf-8")
+    assert extract_article_lxml(html) == extract_article_bs4(html)
+
+
+@pytest.mark.parametrize("name", list(EDGE_CASES))
+def test_edge_cases(name):
+    html = EDGE_CASES[name]
+    assert extract_article_lxml(html) == extract_article_bs4(html)
+
+
+def test_benchmark_fixture():
+    # 基準測試用的頁面範本與正式站結構相同，以合成語料產生數篇文章逐一比對
+    corpus = SyntheticCorpus(articles=5, seed=3)
+    for article in corpus.articles:
+        html = corpus.render_article(article, "https://technews.tw").encode("utf-8")
+        assert extract_article_lxml(html) == extract_article_bs4(html)
+
+
+def test_missing_fields_use_defaults():
+    result = extract_article_lxml(EDGE_CASES["missing_meta"])
+    assert result['Date'] == DATE_NOT_FOUND
+    assert result['Author'] == AUTHOR_NOT_FOUND
+    assert extract_article_lxml(EDGE_CASES["missing_body"])['Content'] == CONTENT_NOT_FOUND
+    assert extract_article_lxml(EDGE_CASES["empty_body"])['Content'] == ""
+
+
+def test_nested_author():
+    assert extract_article_lxml(EDGE_CASES["nested_author"])['Author'] == "中央社"
+    assert extract_article_lxml(EDGE_CASES["nested_author_link"])['Author'] == "張 三 編譯"
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+import requests
+
+import scraping.transport as transport
+from scraping.http_cache import HttpCache, IMMUTABLE_TTL, REVALIDATE_TTL, ttl_for_url
+from scraping.sitemap_index import month_closed_at
+
+SITEMAP = "https://technews.tw/sitemap-pt-post-2024-09.xml"
+ARTICLE = "https://technews.tw/2024/09/15/some-article/"
+
+
+def _ts(*args):
+    return datetime(*args).timestamp()
+
+
+@pytest.mark.parametrize("url", [SITEMAP, ARTICLE])
+def test_fetched_before_month_closed_is_revalidated(url):
+    # 月份還沒結束時取得的內容，不論何時查詢都不能視為不可變
+    assert ttl_for_url(url, _ts(2024, 9, 20)) == REVALIDATE_TTL
+    assert ttl_for_url(url, month_closed_at(2024, 9) - 1) == REVALIDATE_TTL
+    assert ttl_for_url(url, month_closed_at(2024, 9)) == IMMUTABLE_TTL
+
+
+def test_newer_lastmod_forces_revalidation():
+    fetched_at = _ts(2024, 10, 5)
+    assert ttl_for_url(ARTICLE, fetched_at, "2024-10-01T08:00:00+08:00") == IMMUTABLE_TTL
+    assert ttl_for_url(ARTICLE, fetched_at, "2024-10-10T08:00:00+08:00") == REVALIDATE_TTL
+    assert ttl_for_url(ARTICLE, fetched_at, "2024-10-10T00:00:00Z") == REVALIDATE_TTL
+    assert ttl_for_url(ARTICLE, fetched_at, "not a date") == IMMUTABLE_TTL
+    assert ttl_for_url("https://technews.tw/sitemap.xml", fetched_at) == REVALIDATE_TTL
+
+
+def _response(body, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers["ETag"] = '"v2"'
+    return response
+
+
+def test_cached_get_refetches_sitemap_cached_while_month_was_open(tmp_path, monkeypatch):
+    cache = HttpCache(str(tmp_path))
+    cache.store(SITEMAP, b"old", {"ETag": '"v1"'})
+    meta = cache.lookup(SITEMAP)
+    meta["fetched_at"] = _ts(2024, 9, 20)
+    cache._write_meta(cache._paths(SITEMAP)[0], meta)
+
+    requested = []
+
+    def fake_get(url, **kwargs):
+        requested.append(kwargs.get("headers"))
+        return _response(b"new")
+
+    monkeypatch.setattr(transport, "get_cache", lambda: cache)
+    monkeypatch.setattr(transport, "http_get", fake_get)
+    assert transport.cached_get(SITEMAP).content == b"new"
+    assert requested == [{"If-None-Match": '"v1"'}]
+
+    # 月份結束之後取得的內容才直接從快取回傳，不再發出請求
+    assert transport.cached_get(SITEMAP).content == b"new"
+    assert len(requested) == 1
+
+    # 呼叫端知道內容在快取之後被修改時，一定會重新驗證
+    assert transport.cached_get(SITEMAP, lastmod="2999-01-01T00:00:00Z").content == b"new"
+    assert len(requested) == 2
@@ -0,0 +1,64 @@
+import scraping.scraper as scraper
+from database import ArticleStore
+
+ENTRIES = [
+    ("https://technews.tw/2024/06/01/a/", "2024-06-01T08:00:00+08:00"),
+    ("https://technews.tw/2024/06/02/b/", "2024-06-02T08:00:00+08:00"),
+]
+
+
+class _FakeStream:
+    entries = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def estimated_total(self):
+        return len(self.entries)
+
+
+def _run(tmp_path, store, **kwargs):
+    return scraper.run_scraper("https://technews.tw/sitemap.xml", "2024-06-01", "2024-06-30", incremental=True,
+                               requests_per_second=1000, store=store,
+                               index_path=str(tmp_path / "crawl_index.sqlite3"),
+                               sitemap_index_path=str(tmp_path / "sitemap_index.sqlite3"), **kwargs)
+
+
+def test_first_run_with_nothing_pending(tmp_path, monkeypatch):
+    # 第一次執行且範圍內沒有文章時，不應因為缺少 URL 欄位而失敗
+    monkeypatch.setattr(scraper, "ArticleUrlStream", _FakeStream)
+    with ArticleStore(str(tmp_path / "articles.sqlite3")) as store:
+        df = _run(tmp_path, store)
+    assert len(df) == 0
+    assert 'URL' in df.columns
+
+
+def test_only_new_or_updated_articles_are_scraped(tmp_path, monkeypatch):
+    scraped = []
+
+    def fake_scrape(url, backend=None, lastmod=None):
+        scraped.append(url)
+        return {'Title': url[-2], 'Date': '2024 年 06 月 01 日 8:00', 'Author': '記者', 'Content': '內文'}
+
+    monkeypatch.setattr(scraper, "ArticleUrlStream", type("Stream", (_FakeStream,), {'entries': ENTRIES}))
+    monkeypatch.setattr(scraper, "scrape_article", fake_scrape)
+    with ArticleStore(str(tmp_path / "articles.sqlite3")) as store:
+        first = _run(tmp_path, store)
+        assert sorted(scraped) == sorted(url for url, _ in ENTRIES)
+        assert store.count() == 2
+
+        # 第二次執行沒有任何變動，不下載任何文章，結果直接從資料庫取出
+        scraped.clear()
+        second = _run(tmp_path, store)
+        assert scraped == []
+        assert sorted(second['URL']) == sorted(first['URL'])
+
+        # sitemap 的 <lastmod> 改變的文章才重新下載
+        updated = [ENTRIES[0], (ENTRIES[1][0], "2024-06-03T08:00:00+08:00")]
+        monkeypatch.setattr(scraper, "ArticleUrlStream", type("Stream", (_FakeStream,), {'entries': updated}))
+        scraped.clear()
+        _run(tmp_path, store)
+        assert scraped == [ENTRIES[1][0]]
@@ -0,0 +1,18 @@
+import pipeline.steps as steps
+from pipeline import PipelineRunner
+
+
+def test_stop_before_run_is_honoured(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("流程在開始前已被停止，不應該開始爬蟲")
+
+    monkeypatch.setattr(steps, "run_scraper", fail)
+    messages = []
+    for staged in (False, True):
+        runner = PipelineRunner("2024/06/01", "2024/06/01", staged=staged, resume=False, log=messages.append)
+        runner.stop()
+        assert runner.run() is None
+        assert not runner.running
+        # 停止的要求只對那一次執行有效
+        assert not runner.cancel_event.is_set()
+    assert "流程在開始前已被停止\n" in messages
@@ -0,0 +1,48 @@
+import cProfile
+import os
+import threading
+
+import pytest
+
+import metrics.profiling as profiling
+from metrics import Profiler
+
+
+class _SingleProfiler(cProfile.Profile):
+    # 模擬 Python 3.12 以後的 cProfile：同一時間只能啟用一個 profile
+    active = None
+
+    def enable(self, *args, **kwargs):
+        if _SingleProfiler.active is not None and _SingleProfiler.active is not self:
+            raise ValueError("Another profiling tool is already active")
+        _SingleProfiler.active = self
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        if _SingleProfiler.active is self:
+            _SingleProfiler.active = None
+        super().disable()
+
+
+def _busy():
+    return sum(i * i for i in range(1000))
+
+
+@pytest.mark.parametrize("per_thread", [True, False])
+def test_threads_run_while_profiling(tmp_path, monkeypatch, per_thread):
+    monkeypatch.setattr(profiling.cProfile, "Profile", _SingleProfiler)
+    monkeypatch.setattr(profiling, "PER_THREAD_PROFILES", per_thread)
+    ran = []
+
+    with Profiler(output_dir=str(tmp_path)) as profiler:
+        threads = [threading.Thread(target=lambda: ran.append(_busy())) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # profile 無法啟用時執行緒仍然要執行，結束時也只合併有記錄的 profile
+    assert len(ran) == 3
+    assert os.path.exists(os.path.join(profiler.path, "cpu.prof"))
+    with open(os.path.join(profiler.path, "cpu.txt"), encoding="utf-8") as f:
+        assert f.readline() == "合併 1 個 profile 的記錄\n"
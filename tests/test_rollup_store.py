@@ -0,0 +1,25 @@
+import pandas as pd
+
+from database import RollupStore
+
+
+def _contributions(*rows):
+    return pd.DataFrame(rows, columns=['key', 'day', 'score', 'companies', 'trends'])
+
+
+def _rows(store, table):
+    with store.lock:
+        return sorted(store.conn.execute(f"SELECT * FROM {table}").fetchall())
+
+
+def test_updated_article_removes_only_rows_that_reach_zero(tmp_path):
+    with RollupStore(str(tmp_path / "rollups.sqlite3")) as store:
+        store.add(_contributions(('a', '2024-01-01', 1.0, ['台積電', '鴻海'], ['AI']),
+                                 ('b', '2024-01-01', 0.5, ['台積電', '聯發科'], ['AI', '晶片'])))
+
+        # 文章 a 改寫後不再提到鴻海與 AI：被扣到零的列要刪除，其他列保留
+        result = store.add(_contributions(('a', '2024-01-01', 1.0, ['台積電'], ['晶片'])))
+        assert result == {'added': 0, 'updated': 1, 'unchanged': 0}
+        assert _rows(store, 'company_daily') == [('2024-01-01', '台積電', 2, 1.5), ('2024-01-01', '聯發科', 1, 0.5)]
+        assert _rows(store, 'trend_daily') == [('2024-01-01', 'AI', 1), ('2024-01-01', '晶片', 2)]
+        assert _rows(store, 'company_pairs_daily') == [('2024-01-01', '台積電', '聯發科', 1)]
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from utils import company_rollup, trend_rollup
+
+
+def _reference_company_rollup(df):
+    # 改用 EntityTable 之前以 explode/groupby 計算的結果，欄位與型別都必須相同
+    base = pd.DataFrame({
+        'period': df['Date'].dt.normalize().to_numpy(),
+        'company': df['StockContent'].to_numpy(),
+        'score': df['Score'].to_numpy(),
+    }).explode('company').dropna(subset=['period', 'company'])
+    rollup = (base.groupby(['period', 'company'], sort=True)
+                  .agg(mentions=('score', 'size'), score_sum=('score', 'sum'))
+                  .reset_index())
+    rollup['mean_score'] = rollup['score_sum'] / rollup['mentions']
+    return rollup
+
+
+FRAMES = {
+    "normal": pd.DataFrame({'Date': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02']),
+                            'Score': [1.0, -0.5, 0.25],
+                            'StockContent': [['台積電', '鴻海'], ['台積電'], ['鴻海']],
+                            'Trend': [['AI'], [], ['AI', '晶片']]}),
+    "all_empty_lists": pd.DataFrame({'Date': pd.to_datetime(['2024-01-01', '2024-01-02']), 'Score': [1.0, -0.5],
+                                     'StockContent': [[], []], 'Trend': [[], []]}),
+}
+FRAMES["no_rows"] = FRAMES["normal"].iloc[:0]
+
+
+@pytest.mark.parametrize("name", list(FRAMES))
+def test_company_rollup_matches_reference(name):
+    df = FRAMES[name]
+    pd.testing.assert_frame_equal(company_rollup(df), _reference_company_rollup(df))
+
+
+@pytest.mark.parametrize("name", list(FRAMES))
+def test_trend_rollup_dtypes(name):
+    rollup = trend_rollup(FRAMES[name])
+    assert list(rollup.columns) == ['period', 'keyword', 'count']
+    assert rollup['count'].dtype == 'int64'